@@ -1,4 +1,6 @@
 import datetime
+import os
+import time
 import streamlit as st
 
 # Optional dependency
@@ -9,10 +11,32 @@ except Exception:  # pragma: no cover
         return None
 
 import lunch_bot as bot
+import changefeed
 import db
+import db_profile
+
+
+def _setting_flag(name: str) -> bool:
+    """True when secrets/env set name to "1"."""
+    try:
+        v = st.secrets.get(name)
+    except Exception:
+        v = None
+    v = v or os.environ.get(name)
+    return str(v or "").strip() == "1"
+
+
+# Opt-in db call profiling per rerun (admin panel + one JSON log line per rerun)
+DB_PROFILE = _setting_flag("LUNCH_DB_PROFILE")
+if DB_PROFILE:
+    db_profile.enable()
+    db_profile.start_rerun("admin" if str(st.query_params.get("admin") or "") == "1" else "app")
 
 # --- Init ---
 db.init_db()
+# Background Telegram sender (outbox) and /start poller (one each per server process)
+bot.start_notification_worker()
+bot.start_update_consumer()
 
 # Use KST date to avoid UTC drift on Streamlit Cloud
 today_str = db.kst_today_iso()
@@ -24,36 +48,118 @@ APP_VERSION = "2026-02-21.13"
 st.set_page_config(page_title=f"Lunch Buddy 🍱 ({today_str})", layout="wide")
 
 
-def _auto_login_from_query():
-    """MVP convenience: if ?emp=sl12345 exists and user exists, auto-enter.
-
-    NOTE: This bypasses PIN on refresh. OK for MVP/internal use.
-    """
-    if "user" in st.session_state:
-        return
-
-    emp = st.query_params.get("emp")
-    if not emp:
-        return
-
-    u = db.get_user_by_employee_id(str(emp).strip().lower())
-    if not u:
-        return
-
-    user_id, username, telegram_chat_id, team, mbti, age, years, emp_id, *_ = u
-    st.session_state["user"] = {
+def _session_user(row) -> dict:
+    user_id, username, telegram_chat_id, team, mbti, age, years, emp_id = row
+    rec = db.get_user_record(user_id)
+    return {
         "user_id": user_id,
         "username": username,
+        "english_name": rec.english_name if rec else "",
         "employee_id": emp_id,
         "telegram_chat_id": telegram_chat_id,
         "team": team,
+        "role": rec.role if rec else None,
         "mbti": mbti,
         "age": age,
         "years": years,
     }
 
 
-_auto_login_from_query()
+AUTH_COOKIE = "lunch_sid"
+
+
+def _auto_login():
+    """Restore login from the session token (checked every rerun).
+
+    The token lives in session_state for this tab and in the lunch_sid cookie for page
+    reloads (st.context.cookies: the cookies of the tab's initial request); it never
+    goes in the URL. The lookup is an in-process cache hit on the hot path; an expired
+    or revoked token logs the browser out. Old ?sid= / ?emp= links are stripped unused:
+    the first leaked a token into history, the second skipped the PIN.
+    """
+    for key in ("sid", "emp"):
+        if key in st.query_params:
+            del st.query_params[key]
+
+    if "auth_token" in st.session_state:
+        token = st.session_state["auth_token"]  # "" once logged out or found invalid
+    else:
+        token = st.context.cookies.get(AUTH_COOKIE, "")
+    if not token:
+        return
+
+    row = db.get_user_by_session_token(str(token))
+    if not row:
+        st.session_state.pop("user", None)
+        st.session_state["auth_token"] = ""
+        return
+    st.session_state["auth_token"] = token
+    if st.session_state.get("user", {}).get("user_id") != row[0]:
+        st.session_state["user"] = _session_user(row)
+
+
+def _sync_auth_cookie():
+    """Write (or expire) the lunch_sid cookie when this tab's token differs from it.
+
+    st.context.cookies is read-only, so a zero-height component sets it on the page;
+    the same markup on every rerun keeps the iframe from reloading.
+    """
+    token = st.session_state.get("auth_token")
+    if token is None or token == st.context.cookies.get(AUTH_COOKIE, ""):
+        return
+    max_age = db.SESSION_TTL_SECONDS if token else 0
+    st.components.v1.html(
+        f"""<script>
+        const secure = window.parent.location.protocol === 'https:' ? '; Secure' : '';
+        window.parent.document.cookie = '{AUTH_COOKIE}={token}; Max-Age={max_age}; Path=/; SameSite=Strict' + secure;
+        </script>""",
+        height=0,
+    )
+
+
+_auto_login()
+_sync_auth_cookie()
+
+
+def _push_refresh_enabled() -> bool:
+    """Opt-in push refresh (LUNCH_PUSH_REFRESH=1 in secrets/env) instead of 3 s polling."""
+    return _setting_flag("LUNCH_PUSH_REFRESH") and hasattr(st, "fragment")
+
+
+PUSH_REFRESH = _push_refresh_enabled()
+
+if PUSH_REFRESH:
+    @st.fragment(run_every=1.0)
+    def _push_refresh_watch(scopes: tuple[str, ...]):
+        """Rerun the page only when one of the viewer's scopes changed.
+
+        Compares in-memory counters from the process-wide change feed, so a tick
+        costs no SQL no matter how many sessions are open.
+        """
+        current = changefeed.get_feed().versions(scopes)
+        if current != st.session_state.get("_push_seen"):
+            st.session_state["_push_seen"] = current
+            st.rerun()
+
+
+# Chat messages loaded per page ("이전 대화 더보기" loads one more page)
+CHAT_PAGE_SIZE = 80
+
+
+def _cached_view(name: str, version, loader):
+    """Return loader() as computed for this data version (per session).
+
+    version is built from db.get_board_version(); while the parts a view depends on are
+    unchanged nothing it shows has been written, so autorefresh ticks (and writes to
+    unrelated scopes) reuse the last loaded value.
+    """
+    cache = st.session_state.get("_view_cache")
+    if cache is None:
+        cache = st.session_state["_view_cache"] = {}
+    hit = cache.get(name)
+    if hit is None or hit[0] != version:
+        hit = cache[name] = (version, loader())
+    return hit[1]
 
 
 def main():
@@ -92,6 +198,15 @@ def main():
 
     meal = st.session_state["meal"]
     is_p_mode = meal.endswith("_p")
+
+    # One tiny indexed read per rerun; the queries wrapped in view() below only run when
+    # something for today's meal (or users/friends) was written since the last render.
+    _viewer_id = (st.session_state.get("user") or {}).get("user_id")
+    meal_v, users_v, friends_v = db.get_board_version(meal)
+    versions = {"meal": meal_v, "users": users_v, "friends": friends_v}
+
+    def view(name, loader, *, depends=("meal", "users", "friends")):
+        return _cached_view(name, (today_str, meal, _viewer_id) + tuple(versions[d] for d in depends), loader)
     base_label = "점심" if "lunch" in meal else "저녁"
     meal_label = f"{base_label}({'🔒' if is_p_mode else '🔓'})"
 
@@ -319,24 +434,25 @@ def main():
                     emp_id = u.get("employee_id")
                     
                     if bot_username and emp_id:
+                        # One-time code per tab, reissued before it expires
+                        code, issued_at = st.session_state.get("tg_link_code") or (None, 0.0)
+                        if not code or time.monotonic() - issued_at > db.TELEGRAM_LINK_CODE_TTL_SECONDS / 2:
+                            code, issued_at = db.create_telegram_link_code(int(u["user_id"])), time.monotonic()
+                            st.session_state["tg_link_code"] = (code, issued_at)
                         st.link_button(
                             "텔레그램 연동하기(봇 열기)",
-                            f"https://t.me/{bot_username}?start={emp_id}",
+                            f"https://t.me/{bot_username}?start={code}",
                             use_container_width=True,
                         )
                         st.caption("버튼 클릭 → 텔레그램에서 '시작(Start)'만 누르면 됩니다")
 
                         if st.button("연동 확인", use_container_width=True):
-                            ok2, err2, chat_id = bot.try_register_chat_id_for_employee(emp_id)
+                            ok2, err2, _chat_id = bot.try_register_chat_id_for_employee(emp_id)
                             if not ok2:
                                 st.error(err2 or "연동 확인 실패")
                             else:
-                                ok3, err3 = db.update_user_chat_id_by_employee_id(emp_id, chat_id)
-                                if ok3:
-                                    st.success("연동 완료! 이제 초대/수락 알림이 텔레그램으로 와요.")
-                                    st.rerun()
-                                else:
-                                    st.error(err3 or "DB 저장 실패")
+                                st.success("연동 완료! 이제 초대/수락 알림이 텔레그램으로 와요.")
+                                st.rerun()
                     else:
                         if not bot_username:
                             st.error("⚠️ 텔레그램 봇 아이디(USERNAME)가 설정되지 않았습니다. (Streamlit Secrets 확인 필요)")
@@ -346,7 +462,7 @@ def main():
                 st.markdown("---")
             st.subheader("👤 내 프로필")
             with st.expander("프로필 수정 (사번 제외)", expanded=False):
-                urow = db.get_user_by_id(int(u["user_id"]))
+                urow = view("profile_row", lambda: db.get_user_by_id(int(u["user_id"])), depends=("users",))
                 if urow:
                     _uid, uname, ename, _chat, team, role, _mbti, _age, years, emp, _salt, _ph = urow
                     with st.form("profile_edit_form"):
@@ -382,13 +498,23 @@ def main():
             st.markdown("---")
             st.subheader(f"📚 {base_label} 기록")
             sidebar_user_id = u["user_id"]
-            dates = db.list_my_group_dates(sidebar_user_id, meal=meal)
+            # Past dates only change when the day does; today's entry and group come from
+            # the same view the status tab renders.
+            past_dates = view("history_dates", lambda: db.list_my_group_dates(sidebar_user_id, meal=meal), depends=())
+            today_groups = view("my_groups", lambda: db.get_groups_for_user_today(sidebar_user_id, meal=meal))
+            dates = ([today_str] if today_groups else []) + [d for d in past_dates if d != today_str]
             if dates:
                 sel = st.selectbox("날짜 선택", dates, index=0)
-                groups = db.get_groups_for_user_on_date(sidebar_user_id, sel, meal=meal)
+                if sel == today_str:
+                    groups = today_groups
+                else:
+                    groups = view(f"history_groups_{sel}", lambda: db.get_groups_for_user_on_date(sidebar_user_id, sel, meal=meal), depends=("users",))
                 if groups:
                     gid, gdate, host_uid, host_name, member_names, seats_left, menu, payer_name, _g_kind = groups[0]
-                    members = db.list_group_members(host_uid, sel, meal=meal)
+                    if sel == today_str:
+                        members = view(f"members_{host_uid}", lambda: db.list_group_members(host_uid, today_str, meal=meal))
+                    else:
+                        members = view(f"history_members_{sel}", lambda: db.list_group_members(host_uid, sel, meal=meal), depends=("users",))
                     st.write(f"**{sel} {base_label} 기록**")
                     st.write(f"멤버: {', '.join([db.format_name(n, en) for _uid, n, en in members]) if members else (member_names or '-')}")
                     st.write(f"메뉴: {menu or '-'}")
@@ -401,6 +527,9 @@ def main():
                 st.caption("아직 기록이 없어요.")
 
             if st.button("로그아웃"):
+                if st.session_state.get("auth_token"):
+                    db.delete_auth_session(str(st.session_state["auth_token"]))
+                st.session_state["auth_token"] = ""
                 st.query_params.clear()
                 del st.session_state["user"]
                 st.rerun()
@@ -429,8 +558,8 @@ def main():
                             "age": age,
                             "years": years,
                         }
-                        # Safari-safe persistence via URL
-                        st.query_params["emp"] = emp_id
+                        # Kept in session_state; _sync_auth_cookie persists it for reloads
+                        st.session_state["auth_token"] = db.create_auth_session(int(user_id))
                         st.rerun()
 
             with tab_signup:
@@ -505,17 +634,17 @@ def main():
             st.stop()
 
         st.success("관리자 모드")
-        # Refresh snapshot and show analytics
-        try:
-            db.refresh_match_events_today()
-        except Exception:
-            pass
+        # match_events is kept current by DB triggers; the rebuild is only a repair tool.
 
         # Filters
         sel_date = st.date_input("날짜", value=datetime.date.fromisoformat(today_str), key="admin_date")
         sel_meal = st.selectbox("Meal", ["all", "lunch", "dinner", "lunch_p", "dinner_p"], index=0, key="admin_meal")
         meal_filter = None if sel_meal == "all" else sel_meal
 
+        if st.button("🔧 매칭 기록 재계산(복구용)", key="admin_rebuild_matches"):
+            fixed = db.rebuild_match_events(str(sel_date))
+            st.info(f"{fixed}건 갱신")
+
         rows = db.list_match_events(str(sel_date), meal=meal_filter, limit=300)
         st.caption(f"총 {len(rows)}건")
 
@@ -527,14 +656,22 @@ def main():
         st.metric("총 참여 인원(중복 포함)", total_people)
 
         # Table view
-        table_rows = []
+        parsed_rows = []
+        all_ids = set()
         for d, m, host_uid, member_ids, member_count, kind, updated_at in rows:
             try:
                 ids = [int(x) for x in (member_ids or "").split(",") if x.strip()]
             except Exception:
                 ids = []
-            host_name = db.get_display_name(int(host_uid))
-            member_names = ", ".join([db.get_display_name(i) for i in ids]) if ids else ""
+            parsed_rows.append((d, m, host_uid, ids, member_count, kind, updated_at))
+            all_ids.add(int(host_uid))
+            all_ids.update(ids)
+        names = db.resolve_display_names(all_ids)
+
+        table_rows = []
+        for d, m, host_uid, ids, member_count, kind, updated_at in parsed_rows:
+            host_name = names[int(host_uid)]
+            member_names = ", ".join([names[i] for i in ids]) if ids else ""
             table_rows.append(
                 {
                     "date": d,
@@ -561,39 +698,123 @@ def main():
                     if r["kind"]:
                         st.caption("타입: " + ("🍻 술" if r["kind"] == "drink" else "🍚 밥"))
 
+        # Period analytics from the daily/monthly rollups
+        st.subheader("📈 기간 통계")
+        today_d = datetime.date.fromisoformat(today_str)
+        pc1, pc2, pc3 = st.columns(3)
+        with pc1:
+            range_start = st.date_input("시작일", value=today_d - datetime.timedelta(days=90), key="admin_stats_start")
+        with pc2:
+            range_end = st.date_input("종료일", value=today_d, key="admin_stats_end")
+        with pc3:
+            granularity = st.selectbox(
+                "단위", list(db.MATCH_STATS_GRANULARITIES), index=1, key="admin_stats_granularity",
+                format_func=lambda g: {"day": "일", "week": "주", "month": "월", "quarter": "분기"}[g],
+            )
+        periods = db.get_match_stats(range_start, range_end, granularity)
+        m1, m2, m3 = st.columns(3)
+        m1.metric("매칭 그룹 수", sum(p["groups"] for p in periods))
+        m2.metric("총 참여 인원(중복 포함)", sum(p["participants"] for p in periods))
+        m3.metric("타 팀 페어 수", sum(p["cross_team_pairs"] for p in periods))
+        st.dataframe(
+            [
+                {
+                    "기간": p["period"],
+                    "그룹": p["groups"],
+                    "참여 인원": p["participants"],
+                    "타 팀 페어": p["cross_team_pairs"],
+                    "공개": p["public_groups"],
+                    "비공개": p["private_groups"],
+                    "점심": p["by_meal"].get("lunch", 0) + p["by_meal"].get("lunch_p", 0),
+                    "저녁": p["by_meal"].get("dinner", 0) + p["by_meal"].get("dinner_p", 0),
+                    "🍚 밥": p["by_kind"].get("meal", 0),
+                    "🍻 술": p["by_kind"].get("drink", 0),
+                }
+                for p in periods
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+        if DB_PROFILE:
+            st.subheader("🧪 DB 프로파일 (최근 rerun)")
+            recent = db_profile.recent_reruns(50)
+            if not recent:
+                st.caption("아직 기록된 rerun이 없어요.")
+            else:
+                slowest = max(recent, key=lambda r: r["wall_ms"])
+                p1, p2, p3 = st.columns(3)
+                p1.metric("rerun 수", len(recent))
+                p2.metric("평균 SQL 문 / rerun", f"{sum(r['statements'] for r in recent) / len(recent):.1f}")
+                p3.metric("가장 느린 rerun", f"{slowest['wall_ms']:.0f} ms")
+                st.dataframe(db_profile.summarize_functions(recent), use_container_width=True, hide_index=True)
+                st.dataframe(
+                    [
+                        {
+                            "시각": datetime.datetime.fromtimestamp(r["ts"]).strftime("%H:%M:%S"),
+                            "구분": r["label"],
+                            "전체 ms": r["wall_ms"],
+                            "db ms": r["db_ms"],
+                            "db 호출": r["calls"],
+                            "SQL 문": r["statements"],
+                            "새 연결": r["connections_opened"],
+                            "가장 비싼 호출": next(iter(r["functions"]), ""),
+                        }
+                        for r in recent
+                    ],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+
         st.stop()
 
     # global auto refresh (invites + colleagues)
     # Pause refresh while a confirmation dialog is open (otherwise it disappears)
     if not st.session_state.get("pause_refresh", False):
-        st_autorefresh(interval=3000, key="global_refresh")
+        if PUSH_REFRESH:
+            push_scopes = changefeed.viewer_scopes(meal, private=is_p_mode)
+            st.session_state["_push_seen"] = changefeed.get_feed().versions(push_scopes)
+            _push_refresh_watch(push_scopes)
+        else:
+            st_autorefresh(interval=3000, key="global_refresh")
 
     user_id = st.session_state["user"]["user_id"]
     current_user = st.session_state["user"]["username"]
 
-    # Priority: accepted -> Booked
-    db.reconcile_user_today(user_id, meal=meal)
+    # Reads shared by both tabs and the reconcile check below
+    def board_view():
+        return view("board", lambda: db.get_board_snapshot(user_id, meal=meal, private=is_p_mode))
 
-    # Admin analytics snapshot (best-effort)
-    try:
-        db.refresh_match_events_today()
-    except Exception:
-        pass
+    def request_views():
+        return (
+            view("incoming", lambda: db.list_incoming_requests(user_id, meal=meal)),
+            view("outgoing", lambda: db.list_outgoing_requests(user_id, meal=meal)),
+        )
+
+    fixed_up = []
+
+    def _reconcile():
+        # Checked against what the tabs load anyway, so a consistent state costs no reads.
+        board = board_view()
+        incoming, outgoing = request_views()
+        if board["my_status"] != "Booked" and any(r[3] == "accepted" for r in incoming + outgoing):
+            # Priority: accepted -> Booked
+            db.update_status(user_id, "Booked", meal=meal)
+            fixed_up.append(True)
+        elif board["my_status"] == "Hosting" and not board["host_group"]:
+            # Defensive cleanup: if status says Hosting but group row is missing, show (미정)
+            db.clear_status_today(user_id, meal=meal)
+            fixed_up.append(True)
+        return True
+
+    # Only needed when something changed; after a fix-up write, render from fresh reads
+    view("reconcile", _reconcile)
+    if fixed_up:
+        st.rerun()
 
     # Time-out logic: if meal is expired, Free/Hosting statuses are hidden from board.
     expired = db.is_meal_expired(meal)
 
-    # Defensive cleanup: if status says Hosting but group row is missing, show (미정)
-    if db.get_status_today(user_id, meal=meal) == "Hosting" and not db.get_group_by_host_today(user_id, meal=meal):
-        db.clear_status_today(user_id, meal=meal)
-
-    # Prepare friend list for private filtering
-    my_friends_ids = None
-    if is_p_mode:
-        my_friends_ids = db.list_friends(user_id)
-        # Always include myself in the filter so I can see my own status/group
-        my_friends_ids.append(user_id)
-
     tab_my, tab_board = st.tabs([
         f"🍱 오늘 나의 {base_label} 현황",
         f"📌 {base_label}찾기 게시판",
@@ -606,13 +827,12 @@ def main():
             
             f_tab1, f_tab2 = st.tabs(["내 친구", "요청"])
             with f_tab1:
-                fids = db.list_friends(user_id)
+                fids = view("friends", lambda: db.list_friends(user_id), depends=("friends",))
                 if not fids:
                     st.caption("아직 밥친구가 없어요.")
                 else:
                     for fid in fids:
-                        f_row = db.get_user_by_id(fid)
-                        if f_row:
+                        if db.get_user_record(fid):
                             col_a, col_b = st.columns([3, 1])
                             col_a.write(db.get_display_name(fid))
                             if col_b.button("삭제", key=f"del_f_{fid}"):
@@ -632,7 +852,7 @@ def main():
                             else: st.error(err)
 
             with f_tab2:
-                pending = db.list_pending_requests(user_id)
+                pending = view("friend_requests", lambda: db.list_pending_requests(user_id), depends=("friends", "users"))
                 if not pending:
                     st.caption("받은 요청이 없어요.")
                 else:
@@ -649,7 +869,8 @@ def main():
     with tab_my:
             # --- My status ---
             st.subheader("🙋 내 현황")
-            my_status, my_kind = db.get_status_row_today(user_id, meal=meal)
+            my_board = board_view()
+            my_status, my_kind = my_board["my_status"], my_board["my_kind"]
 
             if my_status == "Booked":
                 st.markdown("## 점약 있어요 🎉")
@@ -759,7 +980,7 @@ def main():
             show_detail = True
 
             if show_detail:
-                my_groups_today = db.get_groups_for_user_today(user_id, meal=meal)
+                my_groups_today = view("my_groups", lambda: db.get_groups_for_user_today(user_id, meal=meal))
 
                 # If status is Booked but membership rows are missing (legacy), recover from accepted group request
                 if (not my_groups_today) and my_status == "Booked":
@@ -776,7 +997,7 @@ def main():
                     st.markdown("**오늘 점약 상세**" if my_status == "Booked" else "**오늘 같이 먹는 멤버**")
                     if (meal == "dinner") and g_kind:
                         st.caption("타입: " + ("🍻 술" if g_kind == "drink" else "🍚 밥"))
-                    members = db.list_group_members(host_uid, today_str, meal=meal)
+                    members = view(f"members_{host_uid}", lambda: db.list_group_members(host_uid, today_str, meal=meal))
                     st.write(", ".join([db.format_name(name, en) for _uid, name, en in members]) if members else (member_names or "-"))
                     # Menu editable box
                     with st.expander("🍽️ 메뉴/쏘는사람 수정", expanded=False):
@@ -799,23 +1020,54 @@ def main():
                         # If user is typing, don't autorefresh (it disrupts input)
                         typing_key = f"chat_msg_{host_uid}_{meal}"
                         is_typing = bool(st.session_state.get(typing_key, ""))
-                        if realtime and (not is_typing):
+                        # (push refresh already reruns on new messages)
+                        if realtime and (not is_typing) and (not PUSH_REFRESH):
                             st_autorefresh(interval=3000, key=f"chat_refresh_{host_uid}_{meal}")
 
                         # Defensive: ensure I'm registered as a member of this group (fixes "그룹 멤버만" send failures)
-                        try:
-                            db.ensure_member_in_group(int(host_uid), int(user_id), today_str, meal=meal)
-                        except Exception:
-                            pass
+                        def _ensure_me_in_group():
+                            try:
+                                db.ensure_member_in_group(int(host_uid), int(user_id), today_str, meal=meal)
+                            except Exception:
+                                pass
+                            return True
+
+                        # my_groups_today is read through group_members, so once per group is enough
+                        view(f"ensure_member_{host_uid}", _ensure_me_in_group, depends=())
+
+                        # Session-side append-only buffer: first render loads the latest page,
+                        # later reruns fetch only messages after the newest id we hold. Keyed by
+                        # the group id: a rebooked group (same host/day/meal) starts a cleared chat.
+                        chat_key = (today_str, meal, int(host_uid), int(gid))
+                        chat_buf = st.session_state.get("chat_buf")
+                        if chat_buf is None or chat_buf["key"] != chat_key:
+                            first_page = db.list_group_chat_before(host_uid, today_str, meal=meal, limit=CHAT_PAGE_SIZE)
+                            chat_buf = {"key": chat_key, "rows": first_page, "has_older": len(first_page) == CHAT_PAGE_SIZE}
+                            st.session_state["chat_buf"] = chat_buf
+
+                        def _fetch_new_chat():
+                            last_id = chat_buf["rows"][-1][0] if chat_buf["rows"] else 0
+                            chat_buf["rows"].extend(db.list_group_chat_since(host_uid, today_str, meal=meal, after_id=last_id))
+                            return True
+
+                        view(f"chat_since_{host_uid}", _fetch_new_chat)
+
+                        if chat_buf["has_older"] and chat_buf["rows"]:
+                            if st.button("⬆️ 이전 대화 더보기", key=f"chat_older_{host_uid}_{meal}"):
+                                older = db.list_group_chat_before(
+                                    host_uid, today_str, meal=meal, before_id=chat_buf["rows"][0][0], limit=CHAT_PAGE_SIZE
+                                )
+                                chat_buf["rows"][:0] = older
+                                chat_buf["has_older"] = len(older) == CHAT_PAGE_SIZE
 
-                        chat_rows = db.list_group_chat(host_uid, today_str, meal=meal, limit=200)
+                        chat_rows = chat_buf["rows"]
                         if not chat_rows:
                             st.caption("아직 대화가 없어요.")
                         else:
                             # Scroll to bottom on each rerun (JS inside iframe)
                             import html as _html
                             items = []
-                            for _uid, uname, msg, ts in chat_rows[-80:]:
+                            for _mid, _uid, uname, msg, ts in chat_rows:
                                 items.append(
                                     f"<div class='lb-chat-item'>"
                                     f"<div class='lb-chat-meta'><b>{_html.escape(str(uname))}</b> · {_html.escape(str(ts))}</div>"
@@ -873,6 +1125,8 @@ def main():
                         with chat_col2:
                             st.button("전송", key=f"send_{host_uid}_{meal}", on_click=on_chat_submit, use_container_width=True)
                 else:
+                    # No group → no chat; drop any buffer from a cancelled/previous group
+                    st.session_state.pop("chat_buf", None)
                     # 1:1 booked detail (no group) → auto-create a 1:1 group so details can be stored/shown
                     if my_status == "Booked":
                         d = db.get_latest_accepted_1to1_detail_today(user_id, meal=meal)
@@ -913,7 +1167,7 @@ def main():
             is_lunch = ("lunch" in meal)
 
             # Sender lock: if I have a pending outgoing invite, I shouldn't set myself to Free.
-            base_free_disabled = db.get_status_today(user_id, meal=meal) in ("Booked", "Planning")
+            base_free_disabled = my_status in ("Booked", "Planning")
 
             with c1:
                 if is_lunch:
@@ -947,7 +1201,7 @@ def main():
                     if st.button(
                         "🙅 오늘은 넘어갈게요 (미참여)",
                         use_container_width=True,
-                        disabled=(db.get_status_today(user_id, meal=meal) == "Booked"),
+                        disabled=(my_status == "Booked"),
                     ):
                         if my_status == "Hosting":
                             confirm_hosting_cancel("Skip")
@@ -979,7 +1233,7 @@ def main():
 
                     st.rerun()
 
-            if db.get_status_today(user_id, meal=meal) == "Planning":
+            if my_status == "Planning":
                 st.caption("(초대 보낸 상태라서, 초대 철회 전까지는 '불러주세요'로 바꿀 수 없어요)")
 
             # Hosting inputs (open only when user toggles it)
@@ -1068,8 +1322,7 @@ def main():
                     return "취소됨"
                 return status
 
-            incoming = db.list_incoming_requests(user_id, meal=meal)
-            outgoing = db.list_outgoing_requests(user_id, meal=meal)
+            incoming, outgoing = request_views()
 
             confirmed = [r for r in incoming if r[3] == "accepted"] + [r for r in outgoing if r[3] == "accepted"]
             st.subheader(f"📊 오늘 {base_label} 성사")
@@ -1082,7 +1335,7 @@ def main():
                 for req_id, from_uid, from_name, status, ts, group_host_user_id, req_kind in incoming:
                     with st.container(border=True):
                         if group_host_user_id:
-                            g = db.get_group_by_host_today(int(group_host_user_id), meal=meal)
+                            g = view(f"group_{group_host_user_id}", lambda: db.get_group_by_host_today(int(group_host_user_id), meal=meal))
                             st.write(f"**{from_name}** → 나 (그룹 합류 초대)")
                             if g:
                                 _gid, _d, _host_uid, host_name, member_names, seats_left, menu, payer_name, g_kind = g
@@ -1097,11 +1350,14 @@ def main():
                         if status == "pending":
                             # Accept should be possible even if I'm Booked when I'm the host receiving join requests
                             is_join_to_my_group = bool(group_host_user_id) and int(group_host_user_id) == int(user_id)
-                            accept_disabled = (db.get_status_today(user_id, meal=meal) == "Booked") and (not is_join_to_my_group)
+                            accept_disabled = (my_status == "Booked") and (not is_join_to_my_group)
                             a, b = st.columns(2)
                             with a:
                                 if st.button("✅ 수락", key=f"acc_{req_id}", use_container_width=True, disabled=accept_disabled):
-                                    db.update_request_status(req_id, "accepted")
+                                    # The sender's Telegram notice is queued with the status change
+                                    # and sent by the background worker (never blocks this click).
+                                    accept_notice = f"✅ [Lunch Buddy] {current_user}님이 점심 초대를 수락했어요."
+                                    accepted = True
 
                                     if group_host_user_id:
                                         host_id = int(group_host_user_id)
@@ -1115,12 +1371,22 @@ def main():
                                             target_uid = int(user_id)
                                             target_name = current_user
 
-                                        ok_add, err_add = db.accept_group_join(host_id, target_uid, target_name, meal=meal)
+                                        # The seat is taken first; the request flips to accepted (and the
+                                        # notice is queued) only with it, so losing a full-group race
+                                        # leaves the invite pending.
+                                        ok_add, err_add = db.accept_group_join(
+                                            host_id, target_uid, target_name, meal=meal,
+                                            request_id=req_id, notify_user_id=int(from_uid), notify_text=accept_notice,
+                                        )
                                         if ok_add:
                                             db.set_booked_for_group(host_id, meal=meal)
                                         else:
+                                            accepted = False
                                             st.warning(err_add or "그룹 합류 처리 실패")
                                     else:
+                                        db.update_request_status(
+                                            req_id, "accepted", notify_user_id=int(from_uid), notify_text=accept_notice
+                                        )
                                         # 1:1 accept.
                                         # Keep both as Booked, and allow multiple accepts to form a natural group.
                                         db.update_status(user_id, "Booked", meal=meal)
@@ -1141,12 +1407,9 @@ def main():
                                         # (optional) also ensure legacy 1:1 group exists for detail compatibility
                                         db.ensure_1to1_group_today(user_id, from_uid, meal=meal, kind=my_kind)
 
-                                    sender = db.get_user_by_id(from_uid)
-                                    if sender and sender[2]:
-                                        bot.send_telegram_msg(sender[2], f"✅ [Lunch Buddy] {current_user}님이 점심 초대를 수락했어요.")
-
-                                    st.success("🍚👏 우리 같이 먹어요")
-                                    st.rerun()
+                                    if accepted:
+                                        st.success("🍚👏 우리 같이 먹어요")
+                                        st.rerun()
                             with b:
                                 if st.button("❌ 거절", key=f"dec_{req_id}", use_container_width=True):
                                     db.update_request_status(req_id, "declined")
@@ -1187,21 +1450,28 @@ def main():
 
             st.subheader(f"👀 동료들의 {meal_label} 현황")
 
-            my_status_board, my_kind_board = db.get_status_row_today(user_id, meal=meal)
+            # Single read for the whole tab (statuses, groups, my status, my hosting group)
+            board = board_view()
+            my_status_board, my_kind_board = board["my_status"], board["my_kind"]
+            i_am_booked = (my_status_board == "Booked")
 
-            all_statuses = db.get_all_statuses(meal=meal, viewer_friends_ids=my_friends_ids)
+            all_statuses = board["statuses"]
+            status_by_uid = {s[0]: s[2] for s in all_statuses}
             others = [s for s in all_statuses if s[0] != user_id]
 
             st.markdown(f"### 🧑‍🍳 오늘 {meal_label} 같이 하실분?")
-            groups = db.get_groups_today(meal=meal, viewer_friends_ids=my_friends_ids)
+            groups = board["groups"]
             # rows: (gid, host_uid, host_name, member_names, seats_left, menu, payer_name, kind)
             joinable = [] if expired else [g for g in groups if g[4] is None or int(g[4]) > 0]
+            # include me too, so I can confirm my status is visible
+            free_people = [] if expired else [s for s in all_statuses if s[2] == "Free"]
+            names = db.resolve_display_names([g[1] for g in joinable] + [s[0] for s in free_people])
             if not joinable:
                 st.caption("아직 모집 중인 팀이 없어요." if not expired else "타임아웃 이후에는 새 합류/모집이 마감돼요.")
             else:
                 for gid, host_uid, host_name, member_names, seats_left, menu, payer_name, g_kind in joinable:
                     with st.container(border=True):
-                        st.write(f"**호스트:** {db.get_display_name(host_uid)}")
+                        st.write(f"**호스트:** {names[host_uid]}")
                         if (meal == "dinner") and g_kind:
                             st.caption("타입: " + ("🍻 술" if g_kind == "drink" else "🍚 밥"))
                         st.write(f"**현재 멤버:** {member_names or '-'}")
@@ -1215,7 +1485,7 @@ def main():
                                 "🙋 저요!저요!",
                                 key=f"join_{gid}",
                                 use_container_width=True,
-                                disabled=(db.get_status_today(user_id, meal=meal) == "Booked"),
+                                disabled=i_am_booked,
                             ):
                                 req_id, err = db.create_request(
                                     user_id,
@@ -1234,10 +1504,8 @@ def main():
 
             st.markdown("### 🙇‍♂️ 불러주세요")
 
-            host_group = db.get_group_by_host_today(user_id, meal=meal)
+            host_group = board["host_group"]
 
-            # include me too, so I can confirm my status is visible
-            free_people = [] if expired else [s for s in all_statuses if s[2] == "Free"]
             if not free_people:
                 st.caption("지금 '불러주세요' 상태인 사람이 없어요." if not expired else "타임아웃 이후에는 '불러주세요'를 표시하지 않아요.")
             else:
@@ -1246,7 +1514,7 @@ def main():
                     is_me = (uid == user_id)
                     with cols[i % 4]:
                         with st.container(border=True):
-                            disp = db.get_display_name(uid)
+                            disp = names[uid]
                             st.markdown(f"### {disp}" + (" (나)" if is_me else ""))
 
                             if (meal == "dinner") and u_kind:
@@ -1259,7 +1527,7 @@ def main():
                             if host_group and not is_me:
                                 _gid, _d, _host_uid, _host_name, member_names, seats_left, menu, payer_name, g_kind = host_group
                                 invite_label = "🍽️ 우리랑 같이 먹을래요?" if meal == "lunch" else "🌙 우리랑 같이 할래요?"
-                                invite_disabled = (db.get_status_today(uid, meal=meal) == "Booked") or (int(seats_left or 0) <= 0)
+                                invite_disabled = (status_by_uid.get(uid) == "Booked") or (int(seats_left or 0) <= 0)
                                 if st.button(invite_label, key=f"invite_group_{uid}", use_container_width=True, disabled=invite_disabled):
                                     req_id, err = db.create_request(
                                         user_id,
@@ -1278,7 +1546,7 @@ def main():
                             # 2) Regular 1:1 invite
                             if not is_me:
                                 invite_1to1 = "🍚 밥 먹자고 찌르기!" if meal == "lunch" else "🌙 같이 하자고 찌르기!"
-                                if st.button(invite_1to1, key=f"req_{uid}", use_container_width=True, disabled=(db.get_status_today(user_id, meal=meal) == "Booked")):
+                                if st.button(invite_1to1, key=f"req_{uid}", use_container_width=True, disabled=i_am_booked):
                                     req_id, err = db.create_request(
                                         user_id,
                                         uid,
@@ -1309,4 +1577,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # st.stop()/st.rerun() end a run by raising, so close the profile here.
+        if DB_PROFILE:
+            db_profile.finish_rerun()
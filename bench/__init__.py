@@ -0,0 +1,5 @@
+"""Benchmarks for the Lunch Buddy data layer.
+
+Run from the repository root, e.g. ``python -m bench.init_db``. Every script works on a
+throwaway SQLite file, never on lunch_mate.db.
+"""
@@ -0,0 +1,72 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import db
+
+
+@contextlib.contextmanager
+def temp_db(name: str = "bench.db"):
+    """Point db.DB_NAME at a fresh file for the duration of the block."""
+    tmp = tempfile.mkdtemp(prefix="lunch-bench-")
+    old = db.DB_NAME
+    db.DB_NAME = os.path.join(tmp, name)
+    try:
+        yield db.DB_NAME
+    finally:
+        db.close_all_connections()
+        db._schema_ready.discard(db.DB_NAME)
+        db.DB_NAME = old
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples_s: list[float]) -> dict:
+    """Latency summary in milliseconds."""
+    xs = sorted(samples_s)
+    n = len(xs)
+    return {
+        "n": n,
+        "mean_ms": (sum(xs) / n * 1000) if n else 0.0,
+        "p50_ms": percentile(xs, 0.50) * 1000,
+        "p95_ms": percentile(xs, 0.95) * 1000,
+        "p99_ms": percentile(xs, 0.99) * 1000,
+        "max_ms": (xs[-1] * 1000) if n else 0.0,
+    }
+
+
+def time_calls(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def print_report(title: str, results: dict[str, dict]):
+    print(title)
+    width = max([len(k) for k in results] + [10])
+    print(f"  {'case':<{width}}  {'n':>6}  {'mean ms':>9}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}")
+    for name, r in results.items():
+        print(
+            f"  {name:<{width}}  {r['n']:>6}  {r['mean_ms']:>9.3f}  {r['p50_ms']:>9.3f}  {r['p95_ms']:>9.3f}  {r['p99_ms']:>9.3f}"
+        )
+
+
+def dump_json(path: str | None, payload: dict):
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
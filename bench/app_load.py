@@ -0,0 +1,396 @@
+"""Multi-session load test: how many 3 s-autorefresh sessions can one server sustain?
+
+Starts app.py under a real `streamlit run` (child process, headless, synthetic org in
+a temp DB) and drives simulated browsers over Streamlit's websocket protocol, the
+same BackMsg/ForwardMsg stream a tab uses. AppTest can't be used here: it shares one
+global runtime and can't run sessions concurrently.
+
+Each simulated user logs in through the login form, then reruns the script every
+`--interval` seconds like st_autorefresh does, and on the way clicks what a person
+would: "불러주세요" (Free), an invite button on the board, "✅ 수락" on an incoming
+invite, and sends a chat message once in a group. Widget ids are taken from the
+last render, so the clicks go through app.py's own callbacks.
+
+For each session count in `--sessions` (run one after another on the same server):
+  - rerun latency (send -> script finished) split by login / tick / action
+  - server CPU (% of one core, and per session) and RSS growth per session,
+    sampled from /proc/<pid> (Linux)
+  - SQLite write-lock wait: a probe thread takes BEGIN IMMEDIATE on the DB file
+    every 100 ms and times how long it waits for the app's writers
+A level is "sustained" when tick p95 stays under the interval with no errors.
+App exceptions or dropped sessions exit 1.
+
+    python -m bench.app_load
+    python -m bench.app_load --sessions 10,25,50,100 --duration 60 --json load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import db
+from bench._common import dump_json, summarize, temp_db
+from bench.synth_org import PIN, employee_id, generate_org
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+
+FREE_LABELS = ("불러주세요", "저녁 밥 가능")
+CHAT_LINES = ["어디서 볼까요?", "1층 로비에서 만나요", "5분 늦어요 🙏", "좋아요!"]
+
+
+def serve(db_path: str, port: int):
+    """Child process: run app.py against db_path (the parent waits on /_stcore/health)."""
+    db.DB_NAME = db_path
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", APP_PATH, "--server.headless=true", f"--server.port={port}",
+        "--server.enableXsrfProtection=false", "--server.fileWatcherType=none",
+        "--browser.gatherUsageStats=false", "--logger.level=error",
+    ]
+    cli.main()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(db_path: str, port: int, timeout: float = 60) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.pop("LUNCH_DB_PROFILE", None)
+    env.pop("TELEGRAM_BOT_TOKEN", None)  # synthetic chat ids must never reach the real API
+    env["TELEGRAM_API_BASE"] = "http://127.0.0.1:9"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.app_load", "--serve", db_path, "--port", str(port)],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("streamlit did not come up")
+
+
+class ProcStats:
+    """CPU seconds and RSS of one process from /proc (no psutil)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.hz = os.sysconf("SC_CLK_TCK")
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.hz  # utime + stime
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+
+class LockProbe(threading.Thread):
+    """Times BEGIN IMMEDIATE on the app's DB: how long a writer waits for the lock."""
+
+    def __init__(self, path: str, every: float = 0.1):
+        super().__init__(daemon=True)
+        self.path = path
+        self.every = every
+        self.waits: list[float] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        while not self._stop_event.is_set():
+            t0 = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            self.waits.append(time.perf_counter() - t0)
+            conn.execute("ROLLBACK")
+            self._stop_event.wait(self.every)
+        conn.close()
+
+    def stop(self) -> list[float]:
+        self._stop_event.set()
+        self.join()
+        return self.waits
+
+
+class Browser:
+    """One tab on the websocket stream; rerun() returns after the script finishes."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ws = None
+        self.query_string = ""
+        self.widgets: dict[str, tuple[str, str, bool]] = {}  # id -> (type, label, disabled)
+        self.exceptions: list[str] = []
+
+    async def connect(self):
+        import websockets
+
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def rerun(self, states=()) -> float:
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        msg.rerun_script.widget_states.widgets.extend(states)
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        widgets = {}
+        while True:
+            fm = ForwardMsg()
+            fm.ParseFromString(await self.ws.recv())
+            kind = fm.WhichOneof("type")
+            if kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                el = fm.delta.new_element
+                etype = el.WhichOneof("type")
+                if etype == "exception":
+                    self.exceptions.append(el.exception.message)
+                    continue
+                w = getattr(el, etype)
+                if getattr(w, "id", ""):
+                    widgets[w.id] = (etype, getattr(w, "label", ""), getattr(w, "disabled", False))
+            elif kind == "page_info_changed":
+                self.query_string = fm.page_info_changed.query_string
+            elif kind == "script_finished":
+                # st.rerun() ends the first pass early and starts another
+                if fm.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+                widgets = {}
+        self.widgets = widgets
+        return time.perf_counter() - t0
+
+    def find(self, etype: str, *, key_prefix: str = "", label_has: tuple[str, ...] = ()) -> list[str]:
+        """Enabled widget ids by key prefix (keyed ids end in -<key>) or label substring."""
+        out = []
+        for wid, (t, label, disabled) in self.widgets.items():
+            if t != etype or disabled:
+                continue
+            key = wid.rsplit("-", 1)[-1]
+            if (key_prefix and key.startswith(key_prefix)) or (label_has and any(s in label for s in label_has)):
+                out.append(wid)
+        return out
+
+
+def _string(wid: str, value: str):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    s = WidgetState()
+    s.id = wid
+    s.string_value = value
+    return s
+
+
+def _trigger(wid: str):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    s = WidgetState()
+    s.id = wid
+    s.trigger_value = True
+    return s
+
+
+class SimUser:
+    """Login, then autorefresh ticks with the occasional click."""
+
+    def __init__(self, user_id: int, url: str, rng: random.Random, stats: dict):
+        self.user_id = user_id
+        self.browser = Browser(url)
+        self.rng = rng
+        self.stats = stats
+        self.goes_free = rng.random() < 0.6
+        self.invites_left = 1 if rng.random() < 0.5 else 0
+        self.chats_left = 1
+
+    async def _timed(self, kind: str, states=()):
+        self.stats[kind].append(await self.browser.rerun(states))
+
+    async def _login(self):
+        b = self.browser
+        await self._timed("first_load")
+        emp, pin = b.find("text_input", key_prefix="login_emp"), b.find("text_input", key_prefix="login_pin")
+        submit = b.find("button", label_has=("로그인",))
+        if not (emp and pin and submit):
+            raise RuntimeError("login form not rendered")
+        await self._timed("login", [_string(emp[0], employee_id(self.user_id)), _string(pin[0], PIN), _trigger(submit[0])])
+        if not b.find("button", label_has=("로그아웃",)):
+            raise RuntimeError(f"login failed for {employee_id(self.user_id)}")
+
+    def _next_action(self):
+        b = self.browser
+        accept = b.find("button", key_prefix="acc_")
+        if accept and self.rng.random() < 0.5:
+            return "accept", [_trigger(self.rng.choice(accept))]
+        send = b.find("button", key_prefix="send_")
+        box = b.find("text_input", key_prefix="chat_msg_")
+        if send and box and self.chats_left and self.rng.random() < 0.3:
+            self.chats_left -= 1
+            return "chat", [_string(box[0], self.rng.choice(CHAT_LINES)), _trigger(send[0])]
+        if self.goes_free:
+            free = b.find("button", label_has=FREE_LABELS)
+            if free:
+                self.goes_free = False
+                return "free", [_trigger(free[0])]
+        invite = b.find("button", key_prefix="req_")
+        if invite and self.invites_left and self.rng.random() < 0.3:
+            self.invites_left -= 1
+            return "invite", [_trigger(self.rng.choice(invite))]
+        return None
+
+    async def run(self, until: float, interval: float):
+        try:
+            await self.browser.connect()
+            await self._login()
+            while time.monotonic() < until:
+                started = time.monotonic()
+                action = self._next_action() if self.rng.random() < 0.25 else None
+                if action:
+                    name, states = action
+                    self.stats["actions"][name] = self.stats["actions"].get(name, 0) + 1
+                    await self._timed("action", states)
+                else:
+                    await self._timed("tick")
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except Exception as e:  # a dropped socket or a broken page
+            self.stats["errors"].append(f"user {self.user_id}: {type(e).__name__}: {e}")
+        finally:
+            self.stats["exceptions"].extend(self.browser.exceptions)
+            await self.browser.close()
+
+
+async def _drive(url: str, users: list[int], duration: float, interval: float, ramp: float, seed: int) -> dict:
+    stats = {"first_load": [], "login": [], "tick": [], "action": [], "errors": [], "exceptions": [], "actions": {}}
+    rng = random.Random(seed)
+    until = time.monotonic() + duration
+
+    async def start(i, uid):
+        await asyncio.sleep(ramp * i / max(1, len(users)))
+        await SimUser(uid, url, random.Random(rng.random()), stats).run(until, interval)
+
+    await asyncio.gather(*(start(i, uid) for i, uid in enumerate(users)))
+    return stats
+
+
+def _pick_users(org: dict, count: int, rng: random.Random) -> list[int]:
+    leaders = {members[0] for members in org["team_members"].values()}  # 팀장 can't go Free at lunch
+    pool = [uid for uid in range(1, org["users"] + 1) if uid not in leaders]
+    return rng.sample(pool, min(count, len(pool)))
+
+
+def _run_level(url: str, proc: ProcStats, db_path: str, users: list[int], args) -> dict:
+    probe = LockProbe(db_path)
+    rss0, cpu0, t0 = proc.rss_mb(), proc.cpu_seconds(), time.monotonic()
+    probe.start()
+    stats = asyncio.run(_drive(url, users, args.duration, args.interval, args.ramp, args.seed + len(users)))
+    waits = probe.stop()
+    elapsed = time.monotonic() - t0
+    cpu = proc.cpu_seconds() - cpu0
+    rss = proc.rss_mb()
+    n = len(users)
+    latency = {k: summarize(stats[k]) for k in ("first_load", "login", "tick", "action")}
+    reruns = sum(r["n"] for r in latency.values())
+    sustained = latency["tick"]["p95_ms"] < args.interval * 1000 and not stats["errors"] and not stats["exceptions"]
+    return {
+        "sessions": n, "seconds": elapsed, "reruns": reruns, "reruns_per_s": reruns / elapsed if elapsed else 0.0,
+        "latency": latency, "cpu_pct": 100 * cpu / elapsed if elapsed else 0.0,
+        "cpu_ms_per_rerun": 1000 * cpu / reruns if reruns else 0.0,
+        "cpu_pct_per_session": 100 * cpu / elapsed / n if elapsed and n else 0.0,
+        "rss_mb": rss, "rss_mb_per_session": (rss - rss0) / n if n else 0.0,
+        "actions": stats["actions"], "lock_wait": summarize(waits), "errors": stats["errors"], "exceptions": stats["exceptions"],
+        "sustained": sustained,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=1000, help="synthetic org size")
+    ap.add_argument("--days", type=int, default=20, help="days of history")
+    ap.add_argument("--sessions", default="10,25,50", help="comma-separated concurrent session counts")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    ap.add_argument("--interval", type=float, default=3.0, help="autorefresh interval (s)")
+    ap.add_argument("--ramp", type=float, default=3.0, help="seconds to spread logins over")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--serve", metavar="DB", help=argparse.SUPPRESS)
+    ap.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    levels = [int(x) for x in args.sessions.split(",") if x.strip()]
+    rng = random.Random(args.seed)
+    with temp_db() as path:
+        org = generate_org(args.users, days=args.days)
+        db.close_all_connections()
+        port = _free_port()
+        server = _start_server(path, port)
+        try:
+            proc = ProcStats(server.pid)
+            url = f"ws://127.0.0.1:{port}/_stcore/stream"
+            results = []
+            for n in levels:
+                # a fresh set of people per level; earlier sessions have disconnected
+                results.append(_run_level(url, proc, path, _pick_users(org, n, rng), args))
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print(f"{org['users']} users, {args.days} days history, {args.duration:.0f}s per level, {args.interval:g}s autorefresh")
+    print(f"{'sessions':>8} {'rerun/s':>8} {'tick p50':>9} {'tick p95':>9} {'tick p99':>9} {'act p95':>8} {'login p95':>9}"
+          f" {'cpu %':>6} {'cpu%/ses':>8} {'MB/ses':>7} {'lock p95':>9} {'lock max':>9}")
+    for r in results:
+        lat = r["latency"]
+        print(f"{r['sessions']:>8} {r['reruns_per_s']:>8.1f} {lat['tick']['p50_ms']:>9.1f} {lat['tick']['p95_ms']:>9.1f}"
+              f" {lat['tick']['p99_ms']:>9.1f} {lat['action']['p95_ms']:>8.1f} {lat['login']['p95_ms']:>9.1f}"
+              f" {r['cpu_pct']:>6.1f} {r['cpu_pct_per_session']:>8.2f} {r['rss_mb_per_session']:>7.2f}"
+              f" {r['lock_wait']['p95_ms']:>9.2f} {r['lock_wait']['max_ms']:>9.2f}"
+              f"{'' if r['sustained'] else '  NOT SUSTAINED'}")
+    sustained = [r["sessions"] for r in results if r["sustained"]]
+    print(f"largest sustained level: {max(sustained) if sustained else 'none'} sessions"
+          f" (tick p95 < {args.interval * 1000:.0f} ms, no errors)")
+
+    dump_json(args.json, {
+        "benchmark": "app_load", "users": org["users"], "days": args.days, "interval_s": args.interval,
+        "duration_s": args.duration, "levels": results,
+    })
+    failures = [(r["sessions"], e) for r in results for e in r["errors"] + r["exceptions"]]
+    if failures:
+        for n, e in failures[:20]:
+            print(f"  [{n} sessions] {e}")
+        print(f"FAILED: {len(failures)} errors")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
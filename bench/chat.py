@@ -0,0 +1,107 @@
+"""Group chat reads/writes per second, before and after the hot-path cleanup.
+
+before: the old helpers - a new connection per call, PRAGMA table_info(group_chat) on
+        every read and write, a separate connection for the membership check, and a
+        full re-read of up to 200 messages ordered by timestamp on every refresh.
+after:  add_group_chat() (one INSERT ... WHERE EXISTS on the pooled connection) and
+        list_group_chat_since() (id cursor, only new rows).
+"""
+import argparse
+import sqlite3
+import time
+
+import db
+from bench._common import dump_json, temp_db
+
+
+def _legacy_connect():
+    return sqlite3.connect(db.DB_NAME)
+
+
+def _legacy_probe(conn):
+    c = conn.cursor()
+    c.execute("PRAGMA table_info(group_chat)")
+    {r[1] for r in c.fetchall()}
+
+
+def _legacy_add(host, uid, name, msg, date_str, meal):
+    conn = _legacy_connect()
+    c = conn.cursor()
+    c.execute(
+        "SELECT 1 FROM group_members WHERE date=? AND meal=? AND host_user_id=? AND user_id=? LIMIT 1",
+        (date_str, meal, host, uid),
+    )
+    member = c.fetchone()
+    conn.close()
+    if not member:
+        return
+    conn = _legacy_connect()
+    _legacy_probe(conn)
+    conn.execute(
+        "INSERT INTO group_chat(date, meal, host_user_id, user_id, username, message, timestamp) VALUES (?,?,?,?,?,?,?)",
+        (date_str, meal, host, uid, name, msg, db.kst_now_str()),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _legacy_list(host, date_str, meal):
+    conn = _legacy_connect()
+    _legacy_probe(conn)
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT user_id, username, message, timestamp
+        FROM group_chat
+        WHERE date=? AND meal=? AND host_user_id=?
+        ORDER BY timestamp ASC
+        LIMIT 200
+        """,
+        (date_str, meal, host),
+    )
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def _rate(fn, seconds: float) -> float:
+    n = 0
+    deadline = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    while time.perf_counter() < deadline:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seconds", type=float, default=2.0, help="duration of each case")
+    ap.add_argument("--history", type=int, default=300, help="messages already in the chat")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = {}
+    with temp_db():
+        db.init_db()
+        db.register_user(username="호스트", english_name="Host", team="T", role="팀원", mbti="", age=0, years=1, employee_id="bh00001", pin="1234")
+        db.ensure_fixed_group_today(1)
+        today = db.kst_today_iso()
+        for i in range(args.history):
+            db.add_group_chat(1, 1, "호스트", f"history {i}", today)
+
+        results["write/s before"] = _rate(lambda: _legacy_add(1, 1, "호스트", "hi", today, "lunch"), args.seconds)
+        results["write/s after"] = _rate(lambda: db.add_group_chat(1, 1, "호스트", "hi", today), args.seconds)
+
+        results["refresh/s before"] = _rate(lambda: _legacy_list(1, today, "lunch"), args.seconds)
+        last_id = db.list_group_chat_before(1, today, limit=1)[-1][0]
+        results["refresh/s after"] = _rate(lambda: db.list_group_chat_since(1, today, after_id=last_id), args.seconds)
+
+    print("group chat throughput (ops/s, single thread)")
+    for name, rate in results.items():
+        print(f"  {name:<18} {rate:>10.0f}")
+    dump_json(args.json, {"benchmark": "chat", "results": results})
+
+
+if __name__ == "__main__":
+    main()
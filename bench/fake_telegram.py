@@ -0,0 +1,219 @@
+"""Local stand-in for the Telegram Bot API (sendMessage, getMe, getUpdates).
+
+Serves /bot<token>/<method> like api.telegram.org, with configurable response
+latency, random 429 (retry_after) and 5xx responses, an optional per-second send
+limit and a share of permanently undeliverable chats (400 "chat not found").
+Point lunch_bot at it with the TELEGRAM_API_BASE setting:
+
+    python -m bench.fake_telegram --port 8081 --latency-ms 40 --throttle-ratio 0.01
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=x python lunch_bot.py
+
+Benchmarks use FakeTelegram in-process and read .delivered / .counters afterwards.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_USERNAME = "lunch_buddy_bench_bot"
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_ratio: float = 0.0,
+        retry_after: int = 1,
+        error_ratio: float = 0.0,
+        undeliverable_ratio: float = 0.0,
+        limit_per_second: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self.throttle_ratio = throttle_ratio
+        self.retry_after = retry_after
+        self.error_ratio = error_ratio
+        self.undeliverable_ratio = undeliverable_ratio
+        self.limit_per_second = limit_per_second
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window: list[float] = []
+        self._updates: list[dict] = []
+        self._next_update_id = 1
+        self._updates_cond = threading.Condition(self._lock)
+
+        # (epoch seconds, chat_id, text) for every accepted sendMessage
+        self.delivered: list[tuple[float, str, str]] = []
+        self.counters: dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegram":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def push_update(self, chat_id: int, text: str) -> int:
+        """Queue an incoming message (e.g. '/start ab12345') for getUpdates."""
+        with self._updates_cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append({
+                "update_id": update_id,
+                "message": {"message_id": update_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}, "text": text},
+            })
+            self._updates_cond.notify_all()
+        return update_id
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def _over_limit(self) -> bool:
+        if self.limit_per_second <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if t > now - 1.0]
+            if len(self._window) >= self.limit_per_second:
+                return True
+            self._window.append(now)
+            return False
+
+    # --- methods: each returns (http_status, body) ---
+
+    def send_message(self, params: dict) -> tuple[int, dict]:
+        time.sleep(max(0.0, self.latency_s + self._rng.uniform(-self.jitter_s, self.jitter_s)))
+        roll = self._rng.random()
+        if self._over_limit() or roll < self.throttle_ratio:
+            return 429, {
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+        if roll < self.throttle_ratio + self.error_ratio:
+            return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+        chat_id = str(params.get("chat_id") or "")
+        # Decided per chat, so retries of an undeliverable chat keep failing.
+        if not chat_id or random.Random(chat_id).random() < self.undeliverable_ratio:
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+        with self._lock:
+            self.delivered.append((time.time(), chat_id, str(params.get("text") or "")))
+            message_id = len(self.delivered)
+        return 200, {"ok": True, "result": {"message_id": message_id, "chat": {"id": chat_id}, "text": params.get("text")}}
+
+    def get_me(self, _params: dict) -> tuple[int, dict]:
+        return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Lunch Buddy", "username": BOT_USERNAME}}
+
+    def get_updates(self, params: dict) -> tuple[int, dict]:
+        offset = int(params.get("offset") or 0)
+        deadline = time.monotonic() + min(float(params.get("timeout") or 0), 50.0)
+        with self._updates_cond:
+            # Like Telegram: an offset confirms (drops) every earlier update.
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_cond.wait(deadline - time.monotonic())
+            result = list(self._updates[:100])
+        return 200, {"ok": True, "result": result}
+
+
+def _handler_for(fake: FakeTelegram):
+    methods = {"sendMessage": fake.send_message, "getMe": fake.get_me, "getUpdates": fake.get_updates}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+        # Headers and body go out in separate writes; without TCP_NODELAY, Nagle plus
+        # the client's delayed ACK adds ~40ms to every response.
+        disable_nagle_algorithm = True
+
+        def _dispatch(self, body: bytes = b""):
+            url = urlsplit(self.path)
+            parts = url.path.strip("/").split("/")
+            params = dict(parse_qsl(url.query))
+            if body:
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    params.update(json.loads(body))
+                else:
+                    params.update(parse_qsl(body.decode()))
+
+            method = parts[1] if len(parts) == 2 and parts[0].startswith("bot") else ""
+            handler = methods.get(method)
+            if handler is None:
+                status, payload = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+            else:
+                status, payload = handler(params)
+            fake._count(f"{method or 'unknown'}:{status}")
+
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self._dispatch(self.rfile.read(length) if length else b"")
+
+        def log_message(self, *_args):
+            pass
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--throttle-ratio", type=float, default=0.0, help="share of sendMessage calls answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="retry_after seconds sent with 429")
+    ap.add_argument("--error-ratio", type=float, default=0.0, help="share of sendMessage calls answered with 502")
+    ap.add_argument("--undeliverable-ratio", type=float, default=0.0, help="share of chats answered with 400")
+    ap.add_argument("--limit-per-second", type=float, default=30.0, help="429 above this many sends per second (0 = off)")
+    args = ap.parse_args()
+
+    fake = FakeTelegram(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        throttle_ratio=args.throttle_ratio, retry_after=args.retry_after, error_ratio=args.error_ratio,
+        undeliverable_ratio=args.undeliverable_ratio, limit_per_second=args.limit_per_second,
+    )
+    print(f"fake Telegram Bot API on {fake.base_url} (set TELEGRAM_API_BASE to this)")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._server.server_close()
+        print(f"delivered={len(fake.delivered)} responses={fake.counters}")
+
+
+if __name__ == "__main__":
+    main()
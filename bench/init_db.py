@@ -0,0 +1,80 @@
+"""Per-rerun cost of db.init_db().
+
+before:  what every rerun used to do - a fresh connection running the whole
+         baseline schema check (PRAGMA table_info/index_list + CREATE ... IF NOT EXISTS).
+after (cold process): first init_db() in a new process; only PRAGMA user_version is read.
+after (warm): every later rerun; the process-level guard returns without touching SQLite.
+"""
+import argparse
+import sqlite3
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db, time_calls
+
+
+def _count_statements(fn) -> int:
+    n = 0
+
+    def _trace(_sql):
+        nonlocal n
+        n += 1
+
+    conn = db.get_connection()
+    conn.set_trace_callback(_trace)
+    try:
+        fn()
+    finally:
+        conn.set_trace_callback(None)
+        conn.close()
+    return n
+
+
+def _legacy_rerun():
+    # Old init_db(): new connection + full schema probe on every rerun.
+    conn = sqlite3.connect(db.DB_NAME)
+    db._migration_1_baseline(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def _legacy_rerun_pooled():
+    conn = db.get_connection()
+    db._migration_1_baseline(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def _cold_process():
+    db._schema_ready.discard(db.DB_NAME)
+    db.init_db()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=500)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    with temp_db():
+        db.init_db()
+        results = {
+            "before": summarize(time_calls(_legacy_rerun, args.repeat)),
+            "after (cold process)": summarize(time_calls(_cold_process, args.repeat)),
+            "after (warm)": summarize(time_calls(db.init_db, args.repeat)),
+        }
+        statements = {
+            "before": _count_statements(_legacy_rerun_pooled),
+            "after (cold process)": _count_statements(_cold_process),
+            "after (warm)": _count_statements(db.init_db),
+        }
+
+    for name, count in statements.items():
+        results[name]["sql_statements"] = count
+    print_report("init_db() per rerun", results)
+    for name, count in statements.items():
+        print(f"  {name}: {count} SQL statements")
+    dump_json(args.json, {"benchmark": "init_db", "results": results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Concurrency check for db.create_request: fire hundreds of simultaneous invites.
+
+Every sender/target starts Free and all invites are released at once by a barrier
+(each pair is fired twice). Afterwards no sender may hold more than one pending 1:1
+invite and no pair may have two pending rows - anything else is a double booking.
+Exits with status 1 when the invariant is violated.
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+
+import db
+from bench._common import dump_json, summarize, temp_db
+
+
+def _seed(n_users: int):
+    for i in range(n_users):
+        db.register_user(
+            username=f"user{i}", english_name="", team=f"team{i % 7}", role="팀원", mbti="", age=0, years=1,
+            employee_id=f"ir{i:05d}", pin="1234",
+        )
+        db.update_status(i + 1, "Free")
+
+
+def _violations() -> list[str]:
+    today = db.kst_today_iso()
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT from_user_id, COUNT(*) FROM requests
+            WHERE date=? AND meal='lunch' AND status='pending' AND group_host_user_id IS NULL
+            GROUP BY from_user_id HAVING COUNT(*) > 1
+            """,
+            (today,),
+        )
+        out = [f"sender {uid} holds {n} pending invites" for uid, n in c.fetchall()]
+        c.execute(
+            """
+            SELECT from_user_id, to_user_id, COUNT(*) FROM requests
+            WHERE date=? AND meal='lunch' AND status='pending'
+            GROUP BY from_user_id, to_user_id HAVING COUNT(*) > 1
+            """,
+            (today,),
+        )
+        out += [f"pair {a}->{b} has {n} pending rows" for a, b, n in c.fetchall()]
+        c.execute(
+            """
+            SELECT r.from_user_id FROM requests r
+            LEFT JOIN daily_status ds ON ds.date=r.date AND ds.meal=r.meal AND ds.user_id=r.from_user_id
+            WHERE r.date=? AND r.meal='lunch' AND r.status='pending' AND COALESCE(ds.status,'') != 'Planning'
+            """,
+            (today,),
+        )
+        out += [f"sender {uid} has a pending invite but is not Planning" for (uid,) in c.fetchall()]
+        return out
+    finally:
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--senders", type=int, default=15)
+    ap.add_argument("--targets", type=int, default=15)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    with temp_db():
+        db.init_db()
+        _seed(args.senders + args.targets)
+        pairs = [(s + 1, args.senders + t + 1) for s in range(args.senders) for t in range(args.targets)] * 2
+        barrier = threading.Barrier(len(pairs))
+        lock = threading.Lock()
+        outcome = {"created": 0, "rejected": 0, "lock_errors": 0}
+        latencies = []
+
+        def fire(sender, target):
+            barrier.wait()
+            t0 = time.perf_counter()
+            try:
+                req_id, _err = db.create_request(sender, target)
+                key = "created" if req_id else "rejected"
+            except sqlite3.OperationalError:
+                key = "lock_errors"
+            dt = time.perf_counter() - t0
+            with lock:
+                outcome[key] += 1
+                latencies.append(dt)
+
+        threads = [threading.Thread(target=fire, args=p) for p in pairs]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        problems = _violations()
+
+    print(f"{len(pairs)} simultaneous invites in {elapsed:.2f}s: {outcome}")
+    lat = summarize(latencies)
+    print(f"  create_request latency p50={lat['p50_ms']:.1f}ms p95={lat['p95_ms']:.1f}ms p99={lat['p99_ms']:.1f}ms")
+    for p in problems:
+        print("  DOUBLE BOOKING:", p)
+    dump_json(args.json, {"benchmark": "invite_race", "invites": len(pairs), "outcome": outcome, "latency": lat, "violations": problems})
+    if problems or outcome["created"] != args.senders:
+        print("FAILED")
+        sys.exit(1)
+    print("OK: every sender holds exactly one pending invite")
+
+
+if __name__ == "__main__":
+    main()
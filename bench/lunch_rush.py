@@ -0,0 +1,307 @@
+"""Lunch rush replay: 11:30-12:00 of status changes, invites, accepts, joins and chat.
+
+Builds a synthetic org (bench.synth_org, or a copy of --org-db) and replays a
+compressed lunch rush against it. Active users arrive on a ramp that peaks around
+11:45, open the app (one "rerun": session lookup, board version + snapshot, own
+invites and groups), then act like the UI does: post a recruiting group, go Free
+and invite a Free friend or teammate, ask to join a group with seats, answer their
+invites (1:1 and group accepts), chat, and poll while they wait.
+
+Events run on a thread pool as they come due (open loop): when the DB falls behind,
+queueing shows up as latency and lateness instead of slowing the schedule. Every db
+call is timed; the report gives n, calls/s and p50/p95/p99 per db function. --json
+writes it for comparing versions, and --baseline prints p95 ratios against an
+earlier --json. Exits with status 1 if any db call raised.
+"""
+import argparse
+import heapq
+import json
+import random
+import shutil
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db
+from bench.synth_org import MENUS, CHAT_LINES, generate_org
+
+RUSH_SECONDS = 30 * 60  # 11:30 - 12:00
+
+
+class Rush:
+    def __init__(self, org: dict, rng: random.Random, *, active: float, duration: float, poll_seconds: float, max_polls: int):
+        self.rng = rng
+        self.scale = duration / RUSH_SECONDS
+        self.poll_seconds = poll_seconds
+        self.max_polls = max_polls
+        self.today = db.kst_today_iso()
+        self.names = org["names"]
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.lateness: list[float] = []
+        self.errors: Counter = Counter()
+        self.actions: Counter = Counter()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._heap: list[tuple[float, int, int, str]] = []
+        self._seq = 0
+        self._in_flight = 0
+
+        team_of = {uid: members for members in org["team_members"].values() for uid in members}
+        conn = db.get_connection()
+        friends = defaultdict(list)
+        for a, b in conn.execute("SELECT user_id, friend_id FROM friend_edges WHERE status='accepted'"):
+            friends[a].append(b)
+        conn.close()
+
+        plans = ("host", "invite", "invite", "invite", "join", "join", "free", "free", "skip")
+        self.users = {}
+        for uid in rng.sample(range(1, org["users"] + 1), int(org["users"] * active)):
+            self.users[uid] = {
+                "plan": rng.choice(plans),
+                "circle": set(friends[uid]) | set(team_of.get(uid, ())),
+                "token": db.create_auth_session(uid),
+                "polls": 0,
+                "chat_after": 0,
+                "chat_left": rng.choice((0, 1, 2, 3)),
+            }
+            # Triangular arrivals: quiet at 11:30, busiest around 11:45.
+            self.schedule(rng.triangular(0, RUSH_SECONDS * 0.8, RUSH_SECONDS * 0.5), uid, "open")
+
+    # --- plumbing ---
+
+    def call(self, name: str, *args, **kwargs):
+        fn = getattr(db, name)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self.samples[name].append(dt)
+
+    def schedule(self, rush_t: float, uid: int, action: str):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (rush_t, self._seq, uid, action))
+            self._cond.notify()
+
+    def run(self, threads: int) -> float:
+        self._start = time.perf_counter()
+        pool = [threading.Thread(target=self._worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return time.perf_counter() - self._start
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    if not self._in_flight:
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait()
+                rush_t, _seq, uid, action = heapq.heappop(self._heap)
+                self._in_flight += 1
+            due = self._start + rush_t * self.scale
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                with self._lock:
+                    self.lateness.append(max(0.0, -delay))
+                    self.actions[action] += 1
+                getattr(self, f"_{action}")(uid, rush_t)
+            except Exception as e:
+                with self._lock:
+                    self.errors[f"{action}: {type(e).__name__}: {e}"] += 1
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    # --- what one app rerun reads ---
+
+    def rerun(self, uid: int) -> dict:
+        self.call("get_user_by_session_token", self.users[uid]["token"])
+        self.call("get_board_version", "lunch")
+        snap = self.call("get_board_snapshot", uid)
+        snap["incoming"] = self.call("list_incoming_requests", uid)
+        self.call("list_outgoing_requests", uid)
+        snap["my_groups"] = self.call("get_groups_for_user_today", uid)
+        return snap
+
+    # --- actions (rush_t = seconds since 11:30) ---
+
+    def _open(self, uid: int, rush_t: float):
+        self.rerun(uid)
+        self.schedule(rush_t + self.rng.uniform(10, 90), uid, "act")
+
+    def _act(self, uid: int, rush_t: float):
+        user = self.users[uid]
+        plan = user["plan"]
+        if plan == "skip":
+            self.call("update_status", uid, "Skip")
+            self.rerun(uid)
+            return
+        if plan == "host":
+            self.call("update_status", uid, "Hosting")
+            self.call("upsert_group", uid, self.names[uid], self.rng.randint(2, 4), self.rng.choice(MENUS))
+        elif plan in ("invite", "free"):
+            self.call("update_status", uid, "Free")
+        snap = self.rerun(uid)
+        if plan == "invite":
+            free = [row[0] for row in snap["statuses"] if row[2] == "Free" and row[0] != uid and row[0] in user["circle"]]
+            if free:
+                self.call("create_request", uid, self.rng.choice(free))
+        elif plan == "join":
+            open_groups = [g[1] for g in snap["groups"] if (g[4] or 0) > 0 and g[1] != uid]
+            if open_groups:
+                host = self.rng.choice(open_groups)
+                self.call("create_request", uid, host, host)
+        self.schedule(rush_t + self.poll_seconds, uid, "poll")
+
+    def _poll(self, uid: int, rush_t: float):
+        user = self.users[uid]
+        user["polls"] += 1
+        snap = self.rerun(uid)
+        pending = [r for r in snap["incoming"] if r[3] == "pending"]
+        # Hosts still take join requests once Booked; everyone else answers while open.
+        joins_to_mine = [r for r in pending if r[5] and int(r[5]) == uid]
+        if joins_to_mine or (pending and snap["my_status"] != "Booked"):
+            req = (joins_to_mine or pending)[0]
+            if self.rng.random() < 0.75:
+                self._accept(uid, req)
+                snap = self.rerun(uid)
+            else:
+                self.call("update_request_status", req[0], "declined")
+
+        if snap["my_groups"]:
+            host = int(snap["my_groups"][0][2])
+            rows = self.call("list_group_chat_since", host, self.today, after_id=user["chat_after"])
+            if rows:
+                user["chat_after"] = rows[-1][0]
+            if user["chat_left"] > 0:
+                user["chat_left"] -= 1
+                self.call("add_group_chat", host, uid, self.names[uid], self.rng.choice(CHAT_LINES), self.today)
+
+        done = snap["my_groups"] and user["chat_left"] == 0 and snap["my_status"] == "Booked"
+        if not done and user["polls"] < self.max_polls and rush_t < RUSH_SECONDS:
+            self.schedule(rush_t + self.poll_seconds * self.rng.uniform(0.8, 1.2), uid, "poll")
+
+    def _accept(self, uid: int, req):
+        """The '✅ 수락' handler in app.py."""
+        req_id, from_uid, from_name, _status, _ts, group_host_user_id, _kind = req
+        self.call(
+            "update_request_status", req_id, "accepted",
+            notify_user_id=int(from_uid), notify_text=f"✅ [Lunch Buddy] {self.names[uid]}님이 점심 초대를 수락했어요.",
+        )
+        if group_host_user_id:
+            host_id = int(group_host_user_id)
+            target_uid, target_name = (int(from_uid), from_name) if host_id == uid else (uid, self.names[uid])
+            ok, _err = self.call("accept_group_join", host_id, target_uid, target_name)
+            if ok:
+                self.call("set_booked_for_group", host_id)
+            return
+        self.call("update_status", uid, "Booked")
+        self.call("update_status", from_uid, "Booked")
+        my_groups = self.call("get_groups_for_user_today", uid)
+        if my_groups:
+            self.call("add_member_fixed_group", int(my_groups[0][2]), int(from_uid), from_name)
+        else:
+            self.call("clear_group_chat", uid, self.today)
+            self.call("ensure_fixed_group_today", uid)
+            self.call("add_member_fixed_group", uid, int(from_uid), from_name)
+        self.call("ensure_1to1_group_today", uid, from_uid)
+
+
+def _outcome() -> dict:
+    today = db.kst_today_iso()
+    conn = db.get_connection()
+    try:
+        statuses = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM daily_status WHERE date=? AND meal='lunch' GROUP BY status", (today,)
+        ).fetchall())
+        requests = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM requests WHERE date=? AND meal='lunch' GROUP BY status", (today,)
+        ).fetchall())
+        groups = conn.execute("SELECT COUNT(*) FROM lunch_groups WHERE date=? AND meal='lunch'", (today,)).fetchone()[0]
+        chat = conn.execute("SELECT COUNT(*) FROM group_chat WHERE date=? AND meal='lunch'", (today,)).fetchone()[0]
+    finally:
+        conn.close()
+    return {"statuses": statuses, "requests": requests, "groups": groups, "chat_messages": chat}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=5000)
+    ap.add_argument("--days", type=int, default=60, help="weekdays of history to generate")
+    ap.add_argument("--org-db", help="start from a copy of this bench.synth_org --out file instead of generating")
+    ap.add_argument("--active", type=float, default=0.4, help="share of users taking part in the rush")
+    ap.add_argument("--duration", type=float, default=60.0, help="wall seconds the 30-minute rush is compressed into")
+    ap.add_argument("--poll-seconds", type=float, default=60.0, help="rush seconds between a waiting user's reruns")
+    ap.add_argument("--max-polls", type=int, default=10)
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--baseline", help="earlier --json output to compare p95 against")
+    args = ap.parse_args()
+
+    with temp_db() as path:
+        if args.org_db:
+            shutil.copyfile(args.org_db, path)
+            db.init_db()
+            conn = db.get_connection()
+            n_users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            names = [""] + [r[0] for r in conn.execute("SELECT username FROM users ORDER BY user_id")]
+            teams = defaultdict(list)
+            for uid, team in conn.execute("SELECT user_id, team FROM users"):
+                teams[team].append(uid)
+            conn.close()
+            org = {"users": n_users, "names": names, "team_members": teams, "days": None, "rows": {}}
+        else:
+            org = generate_org(args.users, days=args.days, seed=args.seed)
+            print(f"generated {org['users']} users / {org['days']} days of history in {org['seconds']:.1f}s")
+
+        rush = Rush(org, random.Random(args.seed), active=args.active, duration=args.duration,
+                    poll_seconds=args.poll_seconds, max_polls=args.max_polls)
+        elapsed = rush.run(args.threads)
+        outcome = _outcome()
+
+    functions = {}
+    for name, xs in sorted(rush.samples.items(), key=lambda kv: -sum(kv[1])):
+        functions[name] = {**summarize(xs), "per_s": len(xs) / elapsed, "total_s": sum(xs)}
+    calls = sum(f["n"] for f in functions.values())
+    late = summarize(rush.lateness)
+
+    print_report(f"{len(rush.users)} active users, {calls} db calls in {elapsed:.1f}s ({calls / elapsed:.0f} calls/s)", functions)
+    print(f"  events={dict(rush.actions)} lateness p50={late['p50_ms']:.0f}ms p99={late['p99_ms']:.0f}ms")
+    print(f"  outcome={outcome}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            before = json.load(f).get("functions", {})
+        print("p95 vs baseline:")
+        for name, r in functions.items():
+            if name in before and before[name]["p95_ms"]:
+                print(f"  {name:<28} {before[name]['p95_ms']:>8.2f} -> {r['p95_ms']:>8.2f} ms  (x{r['p95_ms'] / before[name]['p95_ms']:.2f})")
+    for err, n in rush.errors.most_common():
+        print(f"  ERROR x{n}: {err}")
+
+    dump_json(args.json, {
+        "benchmark": "lunch_rush",
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "org": {"users": org["users"], "days": org["days"], "rows": org["rows"]},
+        "active_users": len(rush.users), "elapsed_s": elapsed, "db_calls": calls, "calls_per_s": calls / elapsed,
+        "events": dict(rush.actions), "lateness": late, "functions": functions, "outcome": outcome,
+        "errors": dict(rush.errors),
+    })
+    if rush.errors:
+        print("FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
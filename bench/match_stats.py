@@ -0,0 +1,100 @@
+"""Admin analytics over long history: db.get_match_stats vs. per-day match_events scans.
+
+Seeds years of match_events (one row per group, several groups per meal per day),
+closes the days into match_daily_stats once, then times week/month/quarter range
+queries. "before" is what the admin tab used to do: list_match_events per day and
+sum in Python.
+"""
+import argparse
+import datetime
+import random
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db, time_calls
+
+MEALS = ("lunch", "dinner", "lunch_p", "dinner_p")
+
+
+def _seed(days: int, groups_per_meal: int, n_users: int, end: datetime.date):
+    rng = random.Random(7)
+    for i in range(n_users):
+        db.register_user(
+            username=f"user{i:04d}", english_name="", team=f"team{i % 12}", role="팀원", mbti="", age=0, years=1,
+            employee_id=f"ms{i:05d}", pin="1234",
+        )
+    rows = []
+    for d in range(days):
+        day = (end - datetime.timedelta(days=d + 1)).isoformat()
+        for meal in MEALS:
+            for _ in range(groups_per_meal):
+                members = sorted(rng.sample(range(1, n_users + 1), rng.randint(2, 5)))
+                kind = rng.choice(("meal", "drink")) if meal.startswith("dinner") else None
+                rows.append((day, meal, members[0], ",".join(map(str, members)), len(members), kind))
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO match_events(date, meal, host_user_id, member_user_ids, member_count, kind) VALUES (?,?,?,?,?,?)",
+            rows,
+        )
+    return len(rows)
+
+
+def _legacy_range_totals(start: datetime.date, end: datetime.date):
+    totals = {"groups": 0, "participants": 0}
+    day = start
+    while day <= end:
+        rows = db.list_match_events(day.isoformat(), limit=300)
+        totals["groups"] += len(rows)
+        totals["participants"] += sum(int(r[4] or 0) for r in rows)
+        day += datetime.timedelta(days=1)
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--years", type=int, default=3)
+    ap.add_argument("--groups-per-meal", type=int, default=6)
+    ap.add_argument("--users", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    today = datetime.date.fromisoformat(db.kst_today_iso())
+    with temp_db():
+        db.init_db()
+        n_events = _seed(args.years * 365, args.groups_per_meal, args.users, today)
+        closed = db.close_match_days()
+        print(f"{n_events} match_events over {closed} closed days")
+
+        quarter_start = today - datetime.timedelta(days=90)
+        year_start = today - datetime.timedelta(days=365)
+        results = {
+            "before: 90 days via list_match_events": summarize(
+                time_calls(lambda: _legacy_range_totals(quarter_start, today), max(1, args.repeat // 10))
+            ),
+            "after: 90 days by week": summarize(
+                time_calls(lambda: db.get_match_stats(quarter_start, today, "week"), args.repeat)
+            ),
+            "after: 1 year by month": summarize(
+                time_calls(lambda: db.get_match_stats(year_start, today, "month"), args.repeat)
+            ),
+            f"after: {args.years} years by quarter": summarize(
+                time_calls(
+                    lambda: db.get_match_stats(today - datetime.timedelta(days=365 * args.years), today, "quarter"),
+                    args.repeat,
+                )
+            ),
+        }
+        legacy = _legacy_range_totals(quarter_start, today)
+        new = db.get_match_stats(quarter_start, today, "day")
+        same = legacy == {
+            "groups": sum(b["groups"] for b in new),
+            "participants": sum(b["participants"] for b in new),
+        }
+
+    print_report("get_match_stats latency (ms)", results)
+    print(f"  90-day totals match the per-day scan: {same}")
+    dump_json(args.json, {"benchmark": "match_stats", "events": n_events, "results": results, "totals_match": same})
+
+
+if __name__ == "__main__":
+    main()
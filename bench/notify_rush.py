@@ -0,0 +1,148 @@
+"""Notification rush: 1,000 invites accepted at once, delivered through the outbox.
+
+Each accept runs db.update_request_status(..., notify_user_id=...) from a pool of
+threads (like many users clicking at lunch time). A real lunch_bot.NotificationWorker
+drains the outbox over HTTP into bench/fake_telegram.py, so the measurement covers
+the enqueue transaction, claiming, rate limiting, retries and the Bot API round trip.
+Reports throughput and accept-to-delivery latency. Exits with status 1 when a message
+is not delivered before --timeout or is delivered twice.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import db
+import lunch_bot as bot
+from bench._common import dump_json, summarize, temp_db
+from bench.fake_telegram import FakeTelegram
+
+
+def _seed(n: int) -> list[tuple[int, int, str]]:
+    """n sender/receiver pairs, each with one pending invite. Returns (request_id, sender_id, chat_id)."""
+    for i in range(2 * n):
+        db.register_user(
+            username=f"user{i:04d}", english_name="", team=f"team{i % 11}", role="팀원", mbti="", age=0, years=1,
+            employee_id=f"nr{i:05d}", pin="1234",
+        )
+    today = db.kst_today_iso()
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET telegram_chat_id = CAST(700000 + user_id AS TEXT)")
+        conn.executemany(
+            "INSERT INTO requests (from_user_id, to_user_id, date, meal, status) VALUES (?, ?, ?, 'lunch', 'pending')",
+            [(s, n + s, today) for s in range(1, n + 1)],
+        )
+        rows = conn.execute("SELECT id, from_user_id FROM requests ORDER BY id").fetchall()
+    return [(rid, sender, str(700000 + sender)) for rid, sender in rows]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--invites", type=int, default=1000)
+    ap.add_argument("--accepters", type=int, default=16, help="threads accepting invites concurrently")
+    ap.add_argument("--rate", type=float, default=bot.SEND_RATE_PER_SECOND, help="worker send rate (msg/s)")
+    ap.add_argument("--latency-ms", type=float, default=40.0, help="fake sendMessage latency")
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--throttle-ratio", type=float, default=0.0, help="share of sends answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--error-ratio", type=float, default=0.0, help="share of sends answered with 502")
+    ap.add_argument("--limit-per-second", type=float, default=30.0, help="fake API 429s above this rate (0 = off)")
+    ap.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for every delivery")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    fake = FakeTelegram(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, throttle_ratio=args.throttle_ratio,
+        retry_after=args.retry_after, error_ratio=args.error_ratio, limit_per_second=args.limit_per_second, seed=1,
+    )
+    os.environ["TELEGRAM_API_BASE"] = fake.base_url
+    os.environ["TELEGRAM_BOT_TOKEN"] = "12345:bench"
+    bot.clear_config_cache()
+
+    with fake, temp_db():
+        db.init_db()
+        invites = _seed(args.invites)
+        accepted_at: dict[str, float] = {}
+        accept_latencies = []
+        lock = threading.Lock()
+
+        worker = bot.NotificationWorker(rate_per_second=args.rate)
+        worker.start()
+
+        def accept(shard):
+            for rid, sender, chat_id in shard:
+                t0 = time.perf_counter()
+                wall = time.time()
+                db.update_request_status(
+                    rid, "accepted", notify_user_id=sender, notify_text=f"✅ [Lunch Buddy] 초대 #{rid} 수락",
+                )
+                dt = time.perf_counter() - t0
+                with lock:
+                    accepted_at[chat_id] = wall
+                    accept_latencies.append(dt)
+
+        shards = [invites[i::args.accepters] for i in range(args.accepters)]
+        threads = [threading.Thread(target=accept, args=(s,)) for s in shards]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        accept_elapsed = time.time() - start
+
+        deadline = time.monotonic() + args.timeout
+        while len(fake.delivered) < args.invites and time.monotonic() < deadline:
+            counts = db.get_notification_counts()
+            if not counts.get("pending") and not counts.get("sending"):
+                break
+            time.sleep(0.1)
+        worker.stop()
+        worker.join(timeout=5)
+        counts = db.get_notification_counts()
+
+    delivered = list(fake.delivered)
+    per_chat: dict[str, int] = {}
+    for _t, chat_id, _text in delivered:
+        per_chat[chat_id] = per_chat.get(chat_id, 0) + 1
+    first_delivery = {}
+    for t, chat_id, _text in delivered:
+        first_delivery.setdefault(chat_id, t)
+    e2e = [first_delivery[c] - accepted_at[c] for c in first_delivery if c in accepted_at]
+    drain_s = (max(first_delivery.values()) - start) if first_delivery else 0.0
+
+    problems = []
+    missing = args.invites - len(first_delivery)
+    if missing:
+        problems.append(f"{missing} notifications not delivered within {args.timeout:.0f}s (outbox: {counts})")
+    dupes = sum(1 for n in per_chat.values() if n > 1)
+    if dupes:
+        problems.append(f"{dupes} chats received the notification more than once")
+
+    lat = summarize(e2e)
+    acc = summarize(accept_latencies)
+    throughput = len(first_delivery) / drain_s if drain_s else 0.0
+    print(f"{args.invites} accepts by {args.accepters} threads in {accept_elapsed:.2f}s "
+          f"(update_request_status p50={acc['p50_ms']:.1f}ms p99={acc['p99_ms']:.1f}ms)")
+    print(f"  delivered {len(first_delivery)} in {drain_s:.1f}s -> {throughput:.1f} msg/s (worker rate cap {args.rate:g}/s)")
+    print(f"  accept->delivery p50={lat['p50_ms']:.0f}ms p95={lat['p95_ms']:.0f}ms p99={lat['p99_ms']:.0f}ms max={lat['max_ms']:.0f}ms")
+    print(f"  worker={worker.stats} api={fake.counters}")
+    for p in problems:
+        print("  VIOLATION:", p)
+    dump_json(args.json, {
+        "benchmark": "notify_rush", "invites": args.invites, "accepters": args.accepters, "rate": args.rate,
+        "fake_api": {
+            "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "throttle_ratio": args.throttle_ratio,
+            "error_ratio": args.error_ratio, "limit_per_second": args.limit_per_second, "responses": fake.counters,
+        },
+        "accept_elapsed_s": accept_elapsed, "accept_latency": acc, "drain_s": drain_s, "throughput_per_s": throughput,
+        "end_to_end_latency": lat, "worker_stats": worker.stats, "outbox": counts, "violations": problems,
+    })
+    if problems:
+        print("FAILED")
+        sys.exit(1)
+    print("OK: every accepted invite notified exactly once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Private-mode board read for a viewer with 1k/5k friends.
+
+before: list_friends via the old UNION over friends, then statuses/groups filtered
+        with a Python-built IN (?,?,...) list (one bound variable per friend).
+after:  db.get_board_snapshot(private=True) - the friend filter is a subquery on
+        friend_edges evaluated inside SQLite.
+Both paths must return the same rows.
+"""
+import argparse
+import random
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db, time_calls
+
+VIEWER = 1
+
+
+def _seed(n_friends: int, n_others: int, active_share: float):
+    rng = random.Random(3)
+    n_users = 1 + n_friends + n_others
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users(user_id, username, english_name, team, role, employee_id) VALUES (?,?,?,?,?,?)",
+            [(i, f"user{i:05d}", "", f"team{i % 20}", "팀원", f"pb{i:05d}") for i in range(1, n_users + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO friends(requester_id, target_id, status) VALUES (?,?,'accepted')",
+            [((VIEWER, f) if f % 2 else (f, VIEWER)) for f in range(2, n_friends + 2)],
+        )
+        today = db.kst_today_iso()
+        active = [u for u in range(1, n_users + 1) if rng.random() < active_share]
+        conn.executemany(
+            "INSERT INTO daily_status(date, meal, user_id, status) VALUES (?, 'lunch_p', ?, ?)",
+            [(today, u, rng.choice(("Free", "Planning", "Hosting"))) for u in active],
+        )
+        hosts = [u for u in active if u % 5 == 0]
+        conn.executemany(
+            "INSERT INTO lunch_groups(date, meal, host_user_id, member_names, member_user_ids, seats_left, menu, payer_name) VALUES (?, 'lunch_p', ?, '', '', 3, '', '')",
+            [(today, h) for h in hosts],
+        )
+
+
+def _legacy_board():
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT requester_id FROM friends WHERE target_id=? AND status='accepted'
+            UNION
+            SELECT target_id FROM friends WHERE requester_id=? AND status='accepted'
+            """,
+            (VIEWER, VIEWER),
+        )
+        ids = [r[0] for r in c.fetchall()] + [VIEWER]
+        placeholders = ",".join(["?"] * len(ids))
+        today = db.kst_today_iso()
+        c.execute(db._BOARD_STATUS_SQL + f" AND u.user_id IN ({placeholders})", [today, "lunch_p", *ids])
+        statuses = c.fetchall()
+        c.execute(
+            f"""
+            SELECT g.id, g.host_user_id, u.username, g.member_names, g.seats_left, g.menu, g.payer_name, g.kind
+            FROM lunch_groups g JOIN users u ON u.user_id = g.host_user_id
+            WHERE g.date=? AND g.meal=? AND g.host_user_id IN ({placeholders}) ORDER BY g.id DESC
+            """,
+            [today, "lunch_p", *ids],
+        )
+        return statuses, c.fetchall()
+    finally:
+        conn.close()
+
+
+def _new_board():
+    snap = db.get_board_snapshot(VIEWER, meal="lunch_p", private=True)
+    return snap["statuses"], snap["groups"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--friends", type=int, nargs="+", default=[1000, 5000])
+    ap.add_argument("--others", type=int, default=2000, help="non-friend users")
+    ap.add_argument("--active", type=float, default=0.3, help="share of users with a status today")
+    ap.add_argument("--repeat", type=int, default=100)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results, same = {}, {}
+    for n in args.friends:
+        with temp_db():
+            db.init_db()
+            _seed(n, args.others, args.active)
+            legacy, new = _legacy_board(), _new_board()
+            same[n] = sorted(legacy[0]) == sorted(new[0]) and legacy[1] == new[1]
+            results[f"{n} friends: before (IN list)"] = summarize(time_calls(_legacy_board, args.repeat))
+            results[f"{n} friends: after (friend_edges)"] = summarize(time_calls(_new_board, args.repeat))
+
+    print_report("private board read (ms)", results)
+    for n, ok in same.items():
+        print(f"  {n} friends: identical rows = {ok}")
+    dump_json(args.json, {"benchmark": "private_board", "results": results, "identical": same})
+
+
+if __name__ == "__main__":
+    main()
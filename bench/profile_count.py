@@ -0,0 +1,98 @@
+"""Self-check for db_profile's statement counter.
+
+The per-rerun budgets (bench.rerun_budget) and the admin panel are only as good as
+this count, so it is pinned down here on a fresh DB:
+  - N identical db calls inside one rerun count N times as many statements as one
+    call (the N+1 repeats the panel exists to catch)
+  - a write whose triggers run more SQL counts as one statement
+  - executemany() counts once, whatever the row count
+  - a nested db call's statements are charged to both the caller and the callee
+transaction()'s own BEGIN is a statement too; the write checks subtract it.
+Any mismatch exits 1.
+
+    python -m bench.profile_count
+"""
+import argparse
+import sys
+
+import db
+import db_profile
+from bench._common import dump_json, temp_db
+
+
+def _rerun(fn) -> dict:
+    db_profile.start_rerun("check")
+    fn()
+    return db_profile.finish_rerun(log=False)
+
+
+def _checks(repeat: int):
+    db.register_user(
+        username="카운트", english_name="", team="t", role="팀원", mbti="", age=0, years=1,
+        employee_id="pc00001", pin="1234",
+    )
+    one = _rerun(lambda: db.get_status_today(1))["statements"]
+    yield "one get_status_today issues SQL", one, ">= 1", one >= 1
+
+    many = _rerun(lambda: [db.get_status_today(1) for _ in range(repeat)])
+    yield f"{repeat} identical calls", many["statements"], f"== {repeat * one}", many["statements"] == repeat * one
+    per_fn = many["functions"]["get_status_today"]["statements"]
+    yield "  charged to get_status_today", per_fn, f"== {repeat * one}", per_fn == repeat * one
+
+    def empty_tx():
+        with db.transaction():
+            pass
+
+    base = _rerun(empty_tx)["statements"]  # transaction()'s own BEGIN
+
+    def trigger_write():
+        # daily_status triggers bump data_versions and queue match events
+        with db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO daily_status(user_id, date, meal, status) VALUES (1, ?, 'lunch', 'Free')",
+                (db.kst_today_iso(),),
+            )
+
+    n = _rerun(trigger_write)["statements"] - base
+    yield "one INSERT that fires triggers", n, "== 1", n == 1
+
+    def bulk():
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO app_state(key, value) VALUES (?, ?)", [(f"k{i}", "v") for i in range(50)])
+
+    n = _rerun(bulk)["statements"] - base
+    yield "executemany of 50 rows", n, "== 1", n == 1
+
+    # get_status_today -> get_status_row_today: both see the nested statement
+    rec = _rerun(lambda: db.get_status_today(1))["functions"]
+    outer, inner = rec["get_status_today"]["statements"], rec["get_status_row_today"]["statements"]
+    yield "nested call charged to caller and callee", (outer, inner), "equal", outer == inner == one
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    db_profile.enable()
+    try:
+        with temp_db():
+            db.init_db()
+            results = [
+                {"check": name, "got": got, "want": want, "ok": ok} for name, got, want, ok in _checks(args.repeat)
+            ]
+    finally:
+        db_profile.disable()
+
+    for r in results:
+        print(f"{'ok  ' if r['ok'] else 'FAIL'} {r['check']:42} {str(r['got']):>8}  {r['want']}")
+    dump_json(args.json, {"benchmark": "profile_count", "results": results})
+    if not all(r["ok"] for r in results):
+        print("FAILED")
+        sys.exit(1)
+    print("OK: statements are counted per execute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Query-plan regression check: EXPLAIN QUERY PLAN for every SQL statement the app issues.
+
+Builds a synthetic org (bench.synth_org) and runs a workload while a sqlite3 trace
+callback records every statement together with the outermost public db.py /
+mprs_db.py function that issued it. The workload is a short lunch-rush replay plus a
+call to each remaining public function. Trigger bodies (which run on every write)
+are checked too. Each distinct statement is then explained against the populated
+database.
+
+A plan is flagged when it scans a table (SCAN without a search key, including full
+index scans), sorts or groups through a temp B-tree, or builds an automatic index.
+Flags in HOT_PATHS fail the run (exit 1); elsewhere they are listed for information.
+ALLOWED lists the intended ones: index-order reads of whole lists and sorts bounded
+to one group or one user-day.
+"""
+import argparse
+import inspect
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import types
+from collections import defaultdict
+
+import db
+import mprs_db
+from bench._common import dump_json, temp_db
+from bench.lunch_rush import Rush
+from bench.synth_org import generate_org
+
+# Functions behind every rerun, every rush action, or background loops.
+HOT_PATHS = {
+    "db": {
+        "get_user_by_session_token", "get_board_version", "get_board_snapshot", "get_all_statuses",
+        "get_groups_today", "get_status_row_today", "get_status_today", "reconcile_user_today",
+        "has_accepted_today", "list_incoming_requests", "list_outgoing_requests", "get_groups_for_user_today",
+        "get_groups_for_user_on_date", "get_group_by_host_today", "get_group_by_host_on_date", "list_group_members",
+        "is_member_of_group", "get_accepted_partners_today", "get_latest_accepted_group_host_today",
+        "get_latest_accepted_1to1_detail_today", "has_pending_outgoing_today", "get_pending_request_between",
+        "list_group_chat", "list_group_chat_since", "list_group_chat_before", "add_group_chat", "clear_group_chat",
+        "update_status", "clear_status_today", "set_planning", "upsert_group", "delete_group", "create_request",
+        "update_request_status", "cancel_request", "cancel_pending_requests_for_user", "reserve_group_seat",
+        "accept_group_join", "add_member_to_group", "set_booked_for_group", "ensure_member_in_group",
+        "ensure_fixed_group_today", "add_member_fixed_group", "ensure_1to1_group_today", "remove_member_from_group",
+        "cancel_booking_for_user", "cancel_accepted_for_users", "list_my_group_dates", "search_users",
+        "get_friend_set", "list_friends", "list_pending_requests", "send_friend_request", "claim_notifications",
+        "mark_notification_sent", "reschedule_notification", "get_user_by_id",
+        "get_user_by_employee_id", "verify_login", "acquire_lease",
+        "get_app_state", "set_app_state", "cleanup_expired_sessions",
+    },
+    "mprs_db": {
+        "get_all_feedback", "get_ai_suggestions", "get_todo_items", "get_todo_vote_counts", "has_voted_todo",
+        "get_state", "set_state", "get_action_items", "upsert_action_item", "vote_todo", "add_vote",
+    },
+}
+# (owner or "*", SQL fragment, plan detail prefix, reason): flags that are intended.
+ALLOWED = [
+    ("*", "group_concat(name, ', ')", "USE TEMP B-TREE FOR ORDER BY", "sorts one group's members by name"),
+    ("*", "ORDER BY u.username", "USE TEMP B-TREE FOR ORDER BY", "sorts one group's members by name"),
+    ("*", "(from_user_id=", "USE TEMP B-TREE FOR ORDER BY", "one user's requests for one day (from OR to)"),
+    ("*", "r.from_user_id=", "USE TEMP B-TREE FOR ORDER BY", "one user's requests for one day (from OR to)"),
+    ("mprs_db:get_todo_vote_counts", "GROUP BY todo_key", "SCAN todo_votes USING COVERING INDEX", "counts for every todo, index-only"),
+    ("mprs_db:get_all_feedback", "", "SCAN feedback USING INDEX idx_feedback_rank", "whole board, read in index order"),
+    ("mprs_db:get_ai_suggestions", "", "SCAN ai_suggestions USING INDEX idx_ai_suggestions_rank", "whole list, read in index order"),
+    ("mprs_db:get_todo_items", "", "SCAN todo_items USING INDEX idx_todo_items_order", "whole list, read in index order"),
+    ("mprs_db:get_action_items", "", "SCAN action_items USING INDEX idx_action_items_rank", "facilitator view of every item, in index order"),
+]
+_PLUMBING = {"get_connection", "connection", "transaction", "release_connection", "close_all_connections", "init_db"}
+# Public functions that never touch SQLite, or that only reset/seed whole databases.
+_NO_SQL = {"kst_today", "kst_today_iso", "kst_now_str", "format_name", "meal_version_scope", "is_meal_expired",
+           "get_schema_version", "reset_all_data", "reset_today_data", "register_user"}
+_DML_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\b", re.I)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_CTE_RE = re.compile(r"(?:CO-ROUTINE|MATERIALIZE) (\S+)")
+
+
+class Collector:
+    def __init__(self):
+        self.statements: dict[tuple[str, str], dict] = {}  # (owner, normalized) -> info
+        self.active = False
+        self.seen: set[str] = set()  # every public function that issued SQL, nested or not
+
+    def _owner(self) -> str | None:
+        owner = None
+        frame = sys._getframe(2)
+        while frame is not None:
+            g = frame.f_globals
+            name = frame.f_code.co_name
+            if g is vars(db) or g is vars(mprs_db):
+                if name not in _PLUMBING and not name.startswith(("<", "_")):
+                    owner = f"{g['__name__']}:{name}"
+                    self.seen.add(owner)
+            frame = frame.f_back
+        return owner
+
+    def trace(self, sql: str):
+        if not self.active or not _DML_RE.match(sql):
+            return
+        owner = self._owner()
+        if owner is None:
+            return
+        key = (owner, " ".join(_LITERAL_RE.sub("?", sql).split()))
+        info = self.statements.get(key)
+        if info is None:
+            self.statements[key] = {"owner": owner, "sql": sql, "count": 1}
+        else:
+            info["count"] += 1
+
+    def traced(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        conn.set_trace_callback(self.trace)
+        return conn
+
+
+def _plan(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def _flags(plan: list[str]) -> list[str]:
+    ctes = {m.group(1) for line in plan for m in [_CTE_RE.match(line)] if m}
+    out = []
+    for line in plan:
+        if line.startswith("SCAN "):
+            target = line.split()[1]
+            if "VIRTUAL TABLE" in line or line == "SCAN CONSTANT ROW" or target in ctes or target.startswith("("):
+                continue
+            out.append(line)
+        elif "TEMP B-TREE" in line or "AUTOMATIC" in line:
+            out.append(line)
+    return out
+
+
+def _trigger_statements(conn: sqlite3.Connection) -> list[tuple[str, str]]:
+    out = []
+    for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' ORDER BY name"):
+        body = sql[sql.upper().index("BEGIN") + 5: sql.upper().rindex("END")]
+        for stmt in body.split(";"):
+            if stmt.strip():
+                out.append((f"trigger:{name}", re.sub(r"\b(?:NEW|OLD)\.\w+", "NULL", stmt)))
+    return out
+
+
+def _db_workload(org: dict, collector: Collector):
+    """Rush replay for the interactive paths, then every other public function once."""
+    rush = Rush(org, __import__("random").Random(3), active=0.15, duration=3.0, poll_seconds=90.0, max_polls=3)
+    rush.run(8)
+
+    today = db.kst_today_iso()
+    conn = db.get_connection()
+    host, member = conn.execute(
+        "SELECT host_user_id, user_id FROM group_members WHERE date=? AND meal='lunch' AND user_id != host_user_id LIMIT 1", (today,)
+    ).fetchone()
+    last_day = conn.execute("SELECT MAX(date) FROM group_members WHERE date < ?", (today,)).fetchone()[0]
+    old_host = conn.execute("SELECT host_user_id FROM lunch_groups WHERE date=? LIMIT 1", (last_day,)).fetchone()[0]
+    req_id = conn.execute("SELECT MAX(id) FROM requests WHERE date=?", (today,)).fetchone()[0]
+    conn.close()
+    u1, u2, u3 = org["users"] - 2, org["users"] - 1, org["users"]
+    emp = db.get_user_by_id(u1)[9]
+
+    calls = [
+        (db.verify_login, (emp, "1234")), (db.get_user_by_employee_id, (emp,)), (db.get_user_record_by_employee_id, (emp,)),
+        (db.update_user_profile, (), {"user_id": u1, "username": "테스트", "english_name": "", "team": "데이터1팀", "years": 3}),
+        (db.update_user_chat_id, (u1, "123")), (db.link_telegram_chat, (db.create_telegram_link_code(u1), "124")),
+        (db.list_team_members, ("데이터1팀",)), (db.resolve_display_names, ([u1, u2, host],)),
+        (db.get_display_name, (u2,)), (db.set_planning, (u1,)), (db.has_accepted_today, (member,)),
+        (db.reconcile_user_today, (member,)), (db.clear_status_today, (u1,)), (db.get_all_statuses, ()),
+        (db.get_all_statuses, (), {"private_viewer_id": u2}), (db.get_groups_today, ()),
+        (db.get_groups_today, (), {"viewer_friends_ids": [u1, u2, host]}),
+        (db.get_board_snapshot, (u2,), {"private": True}),
+        (db.get_group_by_host_on_date, (old_host, last_day)), (db.update_group_menu_payer, (host, today, "국밥", None)),
+        (db.get_group_by_host_today, (host,)), (db.is_member_of_group, (host, member, today)),
+        (db.list_group_members, (host, today)), (db.ensure_member_in_group, (host, member, today)), (db.add_member_to_group, (host, u3, "누군가")),
+        (db.remove_member_from_group, (host, u3, today)), (db.get_accepted_partners_today, (member,)),
+        (db.get_latest_accepted_group_host_today, (member,)), (db.get_latest_accepted_1to1_detail_today, (member,)),
+        (db.list_group_chat, (host, today)), (db.list_group_chat_before, (host, today)),
+        (db.list_group_chat_before, (host, today), {"before_id": 10 ** 9}), (db.list_my_group_dates, (member,)),
+        (db.get_groups_for_user_on_date, (old_host, last_day)), (db.delegate_host, (today, "lunch", host, member)),
+        (db.delegate_host, (today, "lunch", member, host)), (db.cancel_booking_for_user, (u2,)),
+        (db.cancel_accepted_for_users, ([u2, u3],)), (db.has_pending_outgoing_today, (u1,)),
+        (db.get_pending_request_between, (u1, u2)), (db.cancel_pending_requests_for_user, (u1,)),
+        (db.cancel_request, (req_id,)), (db.set_app_state, ("bench", "1")), (db.get_app_state, ("bench",)),
+        (db.acquire_lease, ("bench", "me", 10)), (db.enqueue_notification, (u1, "hi")), (db.claim_notifications, ()),
+        (db.get_notification_counts, ()), (db.purge_notifications, ()), (db.cleanup_expired_sessions, ()),
+        (db.delete_auth_session, ("nope",)), (db.search_users, ("김", u1)), (db.search_users, ("데이", u1)),
+        (db.search_users, ("ㄱㅁ", u1)), (db.search_users, ("Jen", u1)), (db.get_friend_set, (u1,)),
+        (db.send_friend_request, (u1, u3)), (db.list_pending_requests, (u3,)), (db.accept_friend_request, (u3, u1)),
+        (db.list_friends, (u3,)), (db.remove_friend, (u1, u3)), (db.list_match_events, (last_day,)),
+        (db.list_match_events, (), {"meal": "lunch", "limit": 50}), (db.rebuild_match_events, (last_day,)),
+        (db.refresh_match_events_today, ()), (db.close_match_days, ()),
+        (db.get_match_stats, (last_day[:8] + "01", today, "day")), (db.get_match_stats, ("2020-01-01", today, "month")),
+        (db.get_match_stats, ("2020-01-01", today, "quarter")),
+    ]
+    errors = []
+    for fn, args, *kw in calls:
+        try:
+            fn(*args, **(kw[0] if kw else {}))
+        except Exception as e:
+            errors.append(f"{fn.__name__}: {type(e).__name__}: {e}")
+    # Outbox rows go through their whole lifecycle.
+    db.enqueue_notification(u1, "a")
+    db.enqueue_notification(u1, "b")
+    first, second = [r[0] for r in db.claim_notifications()][-2:]
+    db.reschedule_notification(first, 0.0)
+    db.mark_notification_sent(second)
+    for nid, *_rest in db.claim_notifications():
+        db.mark_notification_failed(nid, "bench")
+    return errors + [f"rush: {e}" for e in rush.errors]
+
+
+def _mprs_workload(path: str, collector: Collector) -> list[str]:
+    real_sqlite3 = mprs_db.sqlite3
+    mprs_db.DB_PATH = path
+    mprs_db.sqlite3 = types.SimpleNamespace(connect=lambda *a, **k: collector.traced(real_sqlite3.connect(*a, **k)))
+    errors = []
+    try:
+        mprs_db.init_db()
+        for i in range(300):
+            mprs_db.add_feedback(f"팀{i % 9}", f"팀{i % 5}", "협업", f"내용 {i}", severity=i % 3 + 1)
+            mprs_db.add_ai_suggestion(f"제안 {i}", "...")
+            mprs_db.upsert_todo_item(f"t{i}", f"그룹{i % 7}", f"할 일 {i}", i)
+            mprs_db.vote_todo(f"t{i % 40}", f"v{i}")
+            mprs_db.upsert_action_item(i, f"a{i % 20}", "협업", "A", "B", "요약", i % 9)
+        calls = [
+            (mprs_db.get_all_feedback, ()), (mprs_db.add_vote, (3,)), (mprs_db.get_ai_suggestions, ()),
+            (mprs_db.vote_ai_suggestion, (3,)), (mprs_db.get_todo_items, ()), (mprs_db.get_todo_vote_counts, ()),
+            (mprs_db.has_voted_todo, ("t1", "v1")), (mprs_db.set_state, ("phase", "2")), (mprs_db.get_state, ("phase",)),
+            (mprs_db.get_action_items, ()), (mprs_db.get_action_items, ("a3",)), (mprs_db.upsert_action_item, (3, "a3", "x", "A", "B", "s", 1)),
+            (mprs_db.clear_ai_suggestions, ()), (mprs_db.clear_todos, ()), (mprs_db.clear_action_items, ()), (mprs_db.clear_db, ()),
+        ]
+        for fn, args in calls:
+            try:
+                fn(*args)
+            except Exception as e:
+                errors.append(f"mprs_db.{fn.__name__}: {type(e).__name__}: {e}")
+    finally:
+        mprs_db.sqlite3 = real_sqlite3
+    return errors
+
+
+def _allowed(owner: str, sql: str, flag: str) -> bool:
+    return any(o in ("*", owner) and frag in sql and flag.startswith(prefix) for o, frag, prefix, _why in ALLOWED)
+
+
+def _check(conn: sqlite3.Connection, module: str, items: list[tuple[str, str, int]]) -> list[dict]:
+    results = []
+    for owner, sql, count in items:
+        try:
+            plan = _plan(conn, sql)
+        except sqlite3.Error as e:
+            plan, flags = [f"EXPLAIN failed: {e}"], []
+        else:
+            flags = [f for f in _flags(plan) if not _allowed(owner, sql, f)]
+        fn = owner.split(":", 1)[1]
+        hot = owner.startswith("trigger:") or fn in HOT_PATHS.get(module, ())
+        results.append({"owner": owner, "hot": hot, "count": count, "sql": " ".join(sql.split()), "plan": plan, "flags": flags})
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=3000)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--verbose", action="store_true", help="print every plan, not only flagged ones")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    collector = Collector()
+    with temp_db():
+        org = generate_org(args.users, days=args.days)
+        db.close_all_connections()
+        real_open = db._open_connection
+        db._open_connection = lambda path: collector.traced(real_open(path))
+        collector.active = True
+        try:
+            errors = _db_workload(org, collector)
+        finally:
+            collector.active = False
+            db._open_connection = real_open
+        conn = db.get_connection()
+        items = [(i["owner"], i["sql"], i["count"]) for i in collector.statements.values() if i["owner"].startswith("db:")]
+        items += [(owner, sql, 0) for owner, sql in _trigger_statements(conn)]
+        results = _check(conn, "db", items)
+        conn.close()
+
+    with tempfile.TemporaryDirectory(prefix="lunch-bench-") as tmp:
+        path = os.path.join(tmp, "mprs.db")
+        collector.active = True
+        errors += _mprs_workload(path, collector)
+        collector.active = False
+        mconn = sqlite3.connect(path)
+        items = [(i["owner"], i["sql"], i["count"]) for i in collector.statements.values() if i["owner"].startswith("mprs_db:")]
+        results += _check(mconn, "mprs_db", items)
+        mconn.close()
+
+    by_owner = defaultdict(list)
+    for r in results:
+        by_owner[r["owner"]].append(r)
+    hot_flags = [r for r in results if r["hot"] and r["flags"]]
+    cold_flags = [r for r in results if not r["hot"] and r["flags"]]
+    uncovered = sorted(
+        f"{mod.__name__}:{n}" for mod in (db, mprs_db) for n, f in vars(mod).items()
+        if inspect.isfunction(f) and f.__module__ == mod.__name__ and not n.startswith("_")
+        and n not in _PLUMBING and n not in _NO_SQL and f"{mod.__name__}:{n}" not in collector.seen
+    )
+
+    print(f"{len(results)} distinct statements from {len(by_owner)} functions/triggers; "
+          f"{len(hot_flags)} flagged on hot paths, {len(cold_flags)} elsewhere")
+    for r in hot_flags + (cold_flags if args.verbose else []):
+        print(f"\n[{'HOT' if r['hot'] else 'cold'}] {r['owner']}  (x{r['count']})\n  {r['sql'][:300]}")
+        for line in r["plan"]:
+            print(f"    {'!!' if line in r['flags'] else '  '} {line}")
+    if cold_flags and not args.verbose:
+        print("\nflagged outside hot paths (see --verbose): " + ", ".join(sorted({r['owner'] for r in cold_flags})))
+    if uncovered:
+        print("\nissued no SQL during the workload (cached or not reached): " + ", ".join(uncovered))
+    for e in errors:
+        print("  WORKLOAD ERROR:", e)
+
+    dump_json(args.json, {
+        "benchmark": "query_plans", "statements": len(results), "hot_violations": len(hot_flags),
+        "cold_flags": len(cold_flags), "uncovered": uncovered, "errors": errors, "results": results,
+    })
+    if hot_flags or errors:
+        print("FAILED")
+        sys.exit(1)
+    print("OK: no scans or temp B-trees on hot paths")
+
+
+if __name__ == "__main__":
+    main()
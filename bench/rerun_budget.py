@@ -0,0 +1,180 @@
+"""SQL statement / connection budgets per app.py rerun, rendered headlessly with AppTest.
+
+Seeds a synthetic org (bench.synth_org) plus a busy "today", logs in with a session
+token like a reloaded browser tab (app._auto_login) and renders app.py with
+LUNCH_DB_PROFILE=1, so every rerun is counted by db_profile (statements as
+execute()/executemany() calls, so repeated identical reads each count; new connections
+via the pool). Streamlit executes every st.tabs body on each rerun, so the status and
+board tabs are always measured together; the scenarios vary what they have to show: a
+first load, an idle autorefresh tick, a refresh after someone else's write, a member
+of a group with chat, private mode with the friends panel, and the admin page.
+
+Each scenario has a budget; going over any of them exits 1 and prints which db
+functions issued the statements.
+
+    python -m bench.rerun_budget
+    python -m bench.rerun_budget --users 2000 --json budgets.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sys
+
+import db
+import db_profile
+from bench._common import dump_json, temp_db
+from bench.synth_org import generate_org
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# scenario -> (max statements, max connections opened) for that one rerun.
+# The largest count seen over several runs plus 1-2 statements of headroom. An idle
+# tick is one version read, plus the session lookup when its 60 s cache entry lapses
+# (SESSION_CACHE_TTL_SECONDS), which can land on any rerun.
+BUDGETS = {
+    "status/first load": (16, 1),
+    "status/idle refresh": (2, 0),
+    "board/refresh after a colleague's change": (10, 0),
+    "board/refresh after an invite to me": (10, 0),
+    "status/group member first load": (18, 1),
+    "status/group refresh after new chat": (12, 0),
+    "friends/private mode on": (16, 0),
+    "friends/idle refresh": (2, 0),
+    "friends/refresh after a friend request": (11, 0),
+    "admin/first load": (15, 1),
+    "admin/idle refresh": (7, 0),
+}
+
+
+def _app_meal() -> str:
+    """The meal app.py picks for a new session (dinner from 14:00 KST)."""
+    now_kst = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=9)
+    return "dinner" if now_kst.hour >= 14 else "lunch"
+
+
+def _seed_today(org: dict, meal: str) -> dict:
+    """A busy board: Free colleagues, open groups, a booked group with chat, invites."""
+    names = org["names"]
+    n = org["users"]
+    viewer, member, host = 1, 2, 3
+    for uid in range(10, min(n, 80)):
+        db.update_status(uid, "Free", meal=meal)
+    for h in range(80, min(n, 95), 3):
+        db.update_status(h, "Hosting", meal=meal)
+        db.upsert_group(h, names[h], 3, "국밥", meal=meal)
+    # host + member form a booked 1:1 group with some chat
+    db.update_status(host, "Booked", meal=meal)
+    db.update_status(member, "Booked", meal=meal)
+    db.ensure_fixed_group_today(host, meal=meal)
+    db.add_member_fixed_group(host, member, names[member], meal=meal)
+    today = db.kst_today_iso()
+    for i in range(12):
+        who = (host, member)[i % 2]
+        db.add_group_chat(host, who, names[who], f"메시지 {i}", today, meal=meal)
+    # the viewer has a couple of pending invites
+    for frm in (10, 11):
+        db.create_request(frm, viewer, meal=meal)
+    return {"viewer": viewer, "member": member, "host": host, "today": today}
+
+
+class Session:
+    """One browser tab: an AppTest with a login token; run() returns the rerun's profile."""
+
+    def __init__(self, user_id: int, *, admin: bool = False, timeout: float = 60):
+        from streamlit import logger
+        from streamlit.testing.v1 import AppTest
+
+        logger.set_log_level("error")  # deprecation notices from app.py's widgets
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.session_state["auth_token"] = db.create_auth_session(user_id)
+        if admin:
+            self.at.query_params["admin"] = "1"
+            self.at.session_state["is_admin"] = True
+
+    def run(self, action=None) -> dict:
+        out = io.StringIO()  # app.py logs one JSON line per rerun
+        with contextlib.redirect_stdout(out):
+            (action(self.at) if action else self.at).run()
+        if self.at.exception:
+            raise RuntimeError(f"app.py raised: {self.at.exception[0].message}")
+        return db_profile.recent_reruns(1)[0]
+
+
+def _scenarios(org: dict, seeded: dict, meal: str):
+    """Yields (name, profile record) in order; scenarios share sessions like real tabs do."""
+    viewer, member, host, today = seeded["viewer"], seeded["member"], seeded["host"], seeded["today"]
+    names = org["names"]
+
+    s = Session(viewer)
+    yield "status/first load", s.run()
+    yield "status/idle refresh", s.run()
+    db.update_status(12, "Skip", meal=meal)
+    yield "board/refresh after a colleague's change", s.run()
+    db.create_request(13, viewer, meal=meal)
+    yield "board/refresh after an invite to me", s.run()
+
+    g = Session(member)
+    yield "status/group member first load", g.run()
+    db.add_group_chat(host, host, names[host], "곧 출발해요", today, meal=meal)
+    yield "status/group refresh after new chat", g.run()
+
+    yield "friends/private mode on", s.run(lambda at: at.toggle(key="privacy_toggle").set_value(True))
+    yield "friends/idle refresh", s.run()
+    db.send_friend_request(14, viewer)
+    yield "friends/refresh after a friend request", s.run()
+
+    a = Session(viewer, admin=True)
+    yield "admin/first load", a.run()
+    yield "admin/idle refresh", a.run()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--days", type=int, default=10)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ["LUNCH_DB_PROFILE"] = "1"
+    meal = _app_meal()
+    results, over = [], []
+    with temp_db():
+        org = generate_org(args.users, days=args.days)
+        seeded = _seed_today(org, meal)
+        for name, rec in _scenarios(org, seeded, meal):
+            max_statements, max_connections = BUDGETS[name]
+            ok = rec["statements"] <= max_statements and rec["connections_opened"] <= max_connections
+            results.append({
+                "scenario": name, "statements": rec["statements"], "statement_budget": max_statements,
+                "connections": rec["connections_opened"], "connection_budget": max_connections,
+                "db_calls": rec["calls"], "db_ms": rec["db_ms"], "wall_ms": rec["wall_ms"], "ok": ok,
+                "functions": rec["functions"],
+            })
+            if not ok:
+                over.append(results[-1])
+    db_profile.disable()
+
+    print(f"{org['users']} users, meal={meal}")
+    print(f"{'scenario':44} {'stmts':>11} {'conns':>7} {'calls':>6} {'db ms':>8} {'wall ms':>8}")
+    for r in results:
+        print(f"{r['scenario']:44} {r['statements']:>5} / {r['statement_budget']:<3}"
+              f" {r['connections']:>2} / {r['connection_budget']:<2} {r['db_calls']:>6} {r['db_ms']:>8.1f} {r['wall_ms']:>8.1f}"
+              f"{'' if r['ok'] else '  OVER BUDGET'}")
+    for r in over:
+        print(f"\n{r['scenario']}: statements by db function")
+        for fn, f in sorted(r["functions"].items(), key=lambda kv: -kv[1]["statements"]):
+            if f["statements"]:
+                print(f"  {fn:40} {f['statements']:>4} stmts in {f['calls']} calls")
+
+    dump_json(args.json, {"benchmark": "rerun_budget", "users": org["users"], "meal": meal, "results": results})
+    if over:
+        print("FAILED")
+        sys.exit(1)
+    print("OK: every rerun within its statement and connection budget")
+
+
+if __name__ == "__main__":
+    main()
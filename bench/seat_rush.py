@@ -0,0 +1,187 @@
+"""Seat rush: many processes accept joins into one popular group at the same moment.
+
+A host posts a group with a few seats and invites everyone; joiners spread over
+several worker processes (each with its own SQLite connections, like separate
+Streamlit servers) all press "accept" after a shared barrier - db.accept_group_join
+with their request_id and the host's notice, as app.py does. Reports throughput,
+lock errors and overbooking. Exits with status 1 when the group is overbooked,
+seats_left goes negative, the legacy display fields disagree with group_members, an
+invite is accepted (or its notice queued) without a seat or left pending with one,
+or any lock error (or any other database error) escapes.
+"""
+import argparse
+import multiprocessing as mp
+import sqlite3
+import sys
+import threading
+import time
+
+import db
+from bench._common import dump_json, summarize, temp_db
+
+HOST_ID = 1
+
+
+def _seed(n_joiners: int, seats: int):
+    for i in range(n_joiners + 1):
+        db.register_user(
+            username=f"user{i:04d}", english_name=f"U{i}" if i % 2 else "", team=f"team{i % 9}", role="팀원",
+            mbti="", age=0, years=1, employee_id=f"sr{i:05d}", pin="1234",
+            chat_id="900001" if i == 0 else None,
+        )
+    db.upsert_group(HOST_ID, "", seats, "김치찌개")
+    db.ensure_member_in_group(HOST_ID, HOST_ID, db.kst_today_iso())
+    # one pending group invite per joiner: uid -> request id
+    with db.transaction() as conn:
+        c = conn.cursor()
+        invites = {}
+        for uid in range(HOST_ID + 1, HOST_ID + 1 + n_joiners):
+            c.execute(
+                "INSERT INTO requests(from_user_id, to_user_id, group_host_user_id, date, meal, status)"
+                " VALUES (?, ?, ?, ?, 'lunch', 'pending')",
+                (HOST_ID, uid, HOST_ID, db.kst_today_iso()),
+            )
+            invites[uid] = c.lastrowid
+    return invites
+
+
+def _worker(db_path: str, joiners: list[tuple[int, int]], barrier, results):
+    db.DB_NAME = db_path
+    db.init_db()
+    lock = threading.Lock()
+    local = {"joined": 0, "full": 0, "lock_errors": 0, "db_errors": 0, "latencies": []}
+
+    def join(uid, request_id):
+        t0 = time.perf_counter()
+        try:
+            ok, _err = db.accept_group_join(
+                HOST_ID, uid, f"user{uid - 1:04d}",
+                request_id=request_id, notify_user_id=HOST_ID, notify_text=f"user{uid - 1:04d} accepted",
+            )
+            key = "joined" if ok else "full"
+        except sqlite3.OperationalError:
+            key = "lock_errors"
+        except sqlite3.Error:
+            key = "db_errors"
+        dt = time.perf_counter() - t0
+        with lock:
+            local[key] += 1
+            local["latencies"].append(dt)
+
+    barrier.wait()
+    threads = [threading.Thread(target=join, args=joiner) for joiner in joiners]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    db.close_all_connections()
+    results.put(local)
+
+
+def _check(seats: int) -> tuple[dict, list[str]]:
+    today = db.kst_today_iso()
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            "SELECT seats_left, member_user_ids FROM lunch_groups WHERE date=? AND meal='lunch' AND host_user_id=?",
+            (today, HOST_ID),
+        )
+        seats_left, member_user_ids = c.fetchone()
+        c.execute(
+            "SELECT user_id FROM group_members WHERE date=? AND meal='lunch' AND host_user_id=?",
+            (today, HOST_ID),
+        )
+        members = {r[0] for r in c.fetchall()}
+        c.execute("SELECT to_user_id, status FROM requests WHERE group_host_user_id=?", (HOST_ID,))
+        invites = dict(c.fetchall())
+        c.execute("SELECT COUNT(*) FROM notification_outbox WHERE user_id=?", (HOST_ID,))
+        notices = c.fetchone()[0]
+    finally:
+        conn.close()
+
+    joined = len(members - {HOST_ID})
+    state = {"seats_left": seats_left, "joined_members": joined, "overbooked": max(0, joined - seats)}
+    problems = []
+    if state["overbooked"]:
+        problems.append(f"{joined} joiners for {seats} seats")
+    if seats_left < 0:
+        problems.append(f"seats_left went negative ({seats_left})")
+    if joined + seats_left != seats:
+        problems.append(f"seats_left={seats_left} does not match {joined} members")
+    legacy = {int(x) for x in (member_user_ids or "").split(",") if x}
+    if legacy != members:
+        problems.append("member_user_ids out of sync with group_members")
+    accepted = {uid for uid, status in invites.items() if status == "accepted"}
+    state["accepted_invites"], state["queued_notices"] = len(accepted), notices
+    if accepted != members - {HOST_ID}:
+        problems.append(f"{len(accepted - members)} invites accepted without a seat, "
+                        f"{len(members - {HOST_ID} - accepted)} members whose invite is not accepted")
+    if any(status not in ("accepted", "pending") for status in invites.values()):
+        problems.append("a losing invite was not left pending")
+    if notices != len(accepted):
+        problems.append(f"{notices} accept notices queued for {len(accepted)} accepted invites")
+    return state, problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--joiners", type=int, default=200)
+    ap.add_argument("--seats", type=int, default=5)
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    # spawn: children must not inherit the parent's pooled SQLite connections.
+    ctx = mp.get_context("spawn")
+    with temp_db() as path:
+        db.init_db()
+        invites = _seed(args.joiners, args.seats)
+        db.close_all_connections()
+
+        joiners = sorted(invites.items())
+        shards = [joiners[i::args.procs] for i in range(args.procs)]
+        barrier = ctx.Barrier(args.procs + 1)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(path, shard, barrier, results)) for shard in shards]
+        for p in procs:
+            p.start()
+        barrier.wait()
+        t0 = time.perf_counter()
+        parts = [results.get() for _ in procs]
+        elapsed = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+
+        outcome = {k: sum(part[k] for part in parts) for k in ("joined", "full", "lock_errors", "db_errors")}
+        latencies = [x for part in parts for x in part["latencies"]]
+        state, problems = _check(args.seats)
+
+    if outcome["lock_errors"]:
+        problems.append(f"{outcome['lock_errors']} joins failed with a lock error")
+    if outcome["db_errors"]:
+        problems.append(f"{outcome['db_errors']} joins failed with another database error")
+    if outcome["joined"] != state["joined_members"]:
+        problems.append(f"{outcome['joined']} joins reported success but {state['joined_members']} members exist")
+
+    lat = summarize(latencies)
+    print(f"{args.joiners} joiners / {args.seats} seats / {args.procs} processes in {elapsed:.2f}s "
+          f"({args.joiners / elapsed:.0f} accepts/s): {outcome}")
+    print(f"  accept_group_join latency p50={lat['p50_ms']:.1f}ms p95={lat['p95_ms']:.1f}ms p99={lat['p99_ms']:.1f}ms")
+    print(f"  seats_left={state['seats_left']} joined={state['joined_members']} overbooked={state['overbooked']}"
+          f" accepted_invites={state['accepted_invites']} queued_notices={state['queued_notices']}")
+    for p in problems:
+        print("  VIOLATION:", p)
+    dump_json(args.json, {
+        "benchmark": "seat_rush", "joiners": args.joiners, "seats": args.seats, "procs": args.procs,
+        "elapsed_s": elapsed, "throughput_per_s": args.joiners / elapsed, "outcome": outcome,
+        "latency": lat, "state": state, "violations": problems,
+    })
+    if problems:
+        print("FAILED")
+        sys.exit(1)
+    print("OK: no overbooking")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Session-token resolution per rerun: SQLite join vs. the in-process session cache.
+
+before: the old lookup - auth_sessions JOIN users on the raw token, every call.
+after:  db.get_user_by_session_token (hashed token, LRU/TTL cache; hits skip SQLite).
+Also times cleanup_expired_sessions over a backlog of expired rows.
+"""
+import argparse
+import time
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db, time_calls
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5000)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    with temp_db():
+        db.init_db()
+        db.register_user(
+            username="세션테스트", english_name="", team="t", role="팀원", mbti="", age=0, years=1,
+            employee_id="ss00001", pin="1234",
+        )
+        token = db.create_auth_session(1)
+        now = int(time.time())
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO auth_sessions(token_hash, user_id, created_at, last_seen_at, expires_at) VALUES (?,1,?,?,?)",
+                [(f"expired{i}", now - 90 * 86400, now - 90 * 86400, now - 86400) for i in range(args.sessions)],
+            )
+        token_hash = db._hash_session_token(token)
+
+        def legacy():
+            conn = db.get_connection()
+            try:
+                return conn.execute(
+                    """
+                    SELECT u.user_id, u.username, u.telegram_chat_id, u.team, u.mbti, u.age, u.years, u.employee_id
+                    FROM auth_sessions s JOIN users u ON u.user_id = s.user_id
+                    WHERE s.token_hash=?
+                    """,
+                    (token_hash,),
+                ).fetchone()
+            finally:
+                conn.close()
+
+        assert db.get_user_by_session_token(token) == legacy()
+        results = {
+            "before: join per lookup": summarize(time_calls(legacy, args.repeat)),
+            "after: cached lookup": summarize(time_calls(lambda: db.get_user_by_session_token(token), args.repeat)),
+        }
+        t0 = time.perf_counter()
+        removed = db.cleanup_expired_sessions()
+        cleanup_s = time.perf_counter() - t0
+
+    print_report("session lookup (ms)", results)
+    print(f"  cleanup_expired_sessions: {removed} rows in {cleanup_s * 1000:.1f}ms")
+    dump_json(args.json, {"benchmark": "sessions", "results": results, "cleanup": {"rows": removed, "seconds": cleanup_s}})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Synthetic organization for load tests: users, teams, friends and months of history.
+
+generate_org() fills the current db.DB_NAME (normally a bench temp_db) with N users
+in teams of 6-15, a team-clustered friend graph and `days` weekdays of history in
+daily_status, requests, lunch_groups, group_members and group_chat (match_events
+follow via triggers and are rolled up like a long-running install). Today is left
+empty for the rush replay. Deterministic for a given seed.
+
+    python -m bench.synth_org --users 20000 --days 90 --out org.db
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import time
+
+import db
+from bench._common import dump_json, temp_db
+
+SURNAMES = "김이박최정강조윤장임한오서신권황안송류전홍고문양손배백허유남심노하곽성차주우구민진나지엄채원천방공현함변염여추도소석"
+GIVEN = "민서준지현우예은도윤하진수연영호성희재정혜승훈유경주원태상동혁나래보람슬기"
+FIRST_EN = ["James", "Jenny", "Chris", "Olivia", "Daniel", "Grace", "Kevin", "Sophia", "Brian", "Chloe", "Eric", "Hannah"]
+DEPTS = ["플랫폼개발", "데이터", "인사", "재무", "디자인", "마케팅", "영업", "보안", "품질", "전략기획", "고객경험", "물류"]
+ROLES = ["팀원"] * 8 + ["파트장"]
+MBTI = ["ISTJ", "ISFJ", "INFJ", "INTJ", "ISTP", "ISFP", "INFP", "INTP", "ESTP", "ESFP", "ENFP", "ENTP", "ESTJ", "ESFJ", "ENFJ", "ENTJ"]
+MENUS = ["김치찌개", "돈까스", "쌀국수", "제육볶음", "초밥", "샐러드", "햄버거", "국밥", "파스타", "비빔밥"]
+CHAT_LINES = ["어디서 볼까요?", "1층 로비에서 만나요", "5분 늦어요 🙏", "좋아요!", "메뉴 뭐로 할까요", "오늘 제가 살게요", "ㅋㅋㅋ 네"]
+EMPLOYEE_PREFIX = "so"
+PIN = "1234"
+
+
+def _weekdays_before(end: datetime.date, days: int) -> list[str]:
+    out = []
+    d = end - datetime.timedelta(days=1)
+    while len(out) < days:
+        if d.weekday() < 5:
+            out.append(d.isoformat())
+        d -= datetime.timedelta(days=1)
+    return out[::-1]
+
+
+def _insert_users(rng: random.Random, n: int) -> dict[str, list[int]]:
+    teams: dict[str, list[int]] = {}
+    users, search_rows = [], []
+    team_no, team_left = 0, 0
+    for uid in range(1, n + 1):
+        if team_left == 0:
+            team_no += 1
+            team_left = rng.randint(6, 15)
+            team = f"{DEPTS[team_no % len(DEPTS)]}{team_no // len(DEPTS) + 1}팀"
+        team_left -= 1
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2, 2, 2))))
+        english = rng.choice(FIRST_EN) if rng.random() < 0.5 else ""
+        role = "팀장" if team not in teams else rng.choice(ROLES)
+        emp = f"{EMPLOYEE_PREFIX}{uid:05d}"
+        salt = os.urandom(8).hex()
+        chat_id = str(900000 + uid) if rng.random() < 0.7 else None
+        users.append((uid, name, english, chat_id, team, role, rng.choice(MBTI), rng.randint(24, 58),
+                      rng.randint(0, 25), emp, salt, db._hash_pin(emp, PIN, salt)))
+        search_rows.append(db._user_search_row(uid, name, english, team))
+        teams.setdefault(team, []).append(uid)
+
+    with db.transaction() as conn:
+        conn.executemany(
+            """INSERT INTO users (user_id, username, english_name, telegram_chat_id, team, role, mbti, age, years,
+                                  employee_id, pin_salt, pin_hash)
+               VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
+            users,
+        )
+        conn.executemany("INSERT INTO users_search(rowid, name, english, team, chosung) VALUES (?,?,?,?,?)", search_rows)
+    return teams
+
+
+def _insert_friends(rng: random.Random, teams: dict[str, list[int]], n: int, per_user: int) -> int:
+    pairs: dict[tuple[int, int], tuple[int, int, str]] = {}
+    for members in teams.values():
+        for uid in members:
+            for _ in range(per_user // 2):
+                # Mostly teammates, some cross-team friends.
+                other = rng.choice(members) if rng.random() < 0.6 else rng.randint(1, n)
+                key = (min(uid, other), max(uid, other))
+                if other != uid and key not in pairs:
+                    status = "accepted" if rng.random() < 0.95 else "pending"
+                    pairs[key] = (uid, other, status)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO friends (requester_id, target_id, status) VALUES (?,?,?)", pairs.values())
+    return len(pairs)
+
+
+def _day_history(rng: random.Random, day: str, meal: str, teams: list[list[int]], names: list[str], rate: float, rows: dict):
+    # People eat mostly with their own team, sometimes with friends from elsewhere.
+    local, mixed = [], []
+    for members in teams:
+        for uid in members:
+            if rng.random() < rate:
+                (mixed if rng.random() < 0.3 else local).append(uid)
+    rng.shuffle(mixed)
+    going = local + mixed
+    kind = rng.choice(("meal", "drink")) if meal == "dinner" else None
+    i = 0
+    while i < len(going):
+        size = rng.choice((2, 2, 3, 3, 4, 5))
+        members = going[i:i + size]
+        i += size
+        if len(members) < 2:
+            rows["daily_status"].append((day, meal, members[0], rng.choice(("Free", "Skip")), kind))
+            continue
+        host = members[0]
+        seats = rng.choice((0, 0, 1, 2))
+        payer = names[rng.choice(members)] if rng.random() < 0.1 else ""
+        rows["lunch_groups"].append((day, meal, host, ", ".join(names[m] for m in members), ",".join(map(str, members)),
+                                     seats, rng.choice(MENUS), payer, kind))
+        for m in members:
+            rows["group_members"].append((day, meal, host, m))
+            rows["daily_status"].append((day, meal, m, "Booked", kind))
+            if m != host:
+                via_group = rng.random() < 0.4
+                rows["requests"].append((host, m, host if via_group else None, day, meal, "accepted", kind, f"{day} 11:{rng.randint(25, 59):02d}:00"))
+        # Invites that went nowhere
+        for _ in range(rng.randint(0, 2)):
+            rows["requests"].append((host, rng.choice(going), None, day, meal, rng.choice(("declined", "cancelled")), kind, f"{day} 11:{rng.randint(20, 59):02d}:00"))
+        for j in range(rng.randint(0, 6)):
+            who = rng.choice(members)
+            rows["group_chat"].append((day, meal, host, who, names[who], rng.choice(CHAT_LINES), f"{day} 11:{40 + j:02d}:{rng.randint(0, 59):02d}"))
+
+
+_HISTORY_SQL = {
+    "daily_status": "INSERT OR IGNORE INTO daily_status (date, meal, user_id, status, kind) VALUES (?,?,?,?,?)",
+    "lunch_groups": """INSERT OR IGNORE INTO lunch_groups (date, meal, host_user_id, member_names, member_user_ids, seats_left, menu, payer_name, kind)
+                       VALUES (?,?,?,?,?,?,?,?,?)""",
+    "group_members": "INSERT OR IGNORE INTO group_members (date, meal, host_user_id, user_id) VALUES (?,?,?,?)",
+    "requests": "INSERT INTO requests (from_user_id, to_user_id, group_host_user_id, date, meal, status, kind, timestamp) VALUES (?,?,?,?,?,?,?,?)",
+    "group_chat": "INSERT INTO group_chat (date, meal, host_user_id, user_id, username, message, timestamp) VALUES (?,?,?,?,?,?,?)",
+}
+
+
+def generate_org(
+    users: int = 5000,
+    *,
+    days: int = 60,
+    friends_per_user: int = 12,
+    lunch_rate: float = 0.45,
+    dinner_rate: float = 0.08,
+    seed: int = 7,
+) -> dict:
+    """Populate the current DB. Returns counts plus teams/names for replay scripts."""
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    db.init_db()
+    teams = _insert_users(rng, users)
+    friends = _insert_friends(rng, teams, users, friends_per_user)
+
+    conn = db.get_connection()
+    names = [""] + [r[0] for r in conn.execute("SELECT username FROM users ORDER BY user_id")]
+    conn.close()
+
+    team_lists = list(teams.values())
+    counts = {k: 0 for k in _HISTORY_SQL}
+    for day in _weekdays_before(datetime.date.fromisoformat(db.kst_today_iso()), days):
+        rows = {k: [] for k in _HISTORY_SQL}
+        _day_history(rng, day, "lunch", team_lists, names, lunch_rate, rows)
+        _day_history(rng, day, "dinner", team_lists, names, dinner_rate, rows)
+        with db.transaction() as conn:
+            for table, sql in _HISTORY_SQL.items():
+                conn.executemany(sql, rows[table])
+                counts[table] += len(rows[table])
+    db.close_match_days()
+
+    return {
+        "users": users, "teams": len(teams), "friend_pairs": friends, "days": days, "rows": counts,
+        "seconds": time.perf_counter() - t0, "team_members": teams, "names": names,
+    }
+
+
+def employee_id(user_id: int) -> str:
+    return f"{EMPLOYEE_PREFIX}{user_id:05d}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=5000, help="1,000-50,000")
+    ap.add_argument("--days", type=int, default=60, help="weekdays of history")
+    ap.add_argument("--friends", type=int, default=12, help="approx. friends per user")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="copy the generated DB here")
+    ap.add_argument("--json", help="write counts to this file")
+    args = ap.parse_args()
+    if not 1 <= args.users <= 99999:
+        ap.error("--users must fit the 5-digit employee id (1-99999)")
+
+    with temp_db() as path:
+        org = generate_org(args.users, days=args.days, friends_per_user=args.friends, seed=args.seed)
+        db.close_all_connections()
+        if args.out:
+            shutil.copyfile(path, args.out)
+        size_mb = os.path.getsize(path) / 1e6
+
+    summary = {k: v for k, v in org.items() if k not in ("team_members", "names")}
+    print(f"{org['users']} users / {org['teams']} teams / {org['friend_pairs']} friend pairs / {org['days']} days "
+          f"in {org['seconds']:.1f}s ({size_mb:.0f} MB)")
+    print("  rows:", org["rows"])
+    if args.out:
+        print(f"  saved to {args.out} (every PIN is {PIN}, employee ids {employee_id(1)}..{employee_id(org['users'])})")
+    dump_json(args.json, {"benchmark": "synth_org", **summary, "size_mb": size_mb})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""People search at company scale: db.search_users over N synthetic employees.
+
+before: the old LIKE '%q%' over username/english_name/team (full table scan).
+after:  FTS5 gram index (users_search) + in-process verification/ranking.
+Queries cover 1-3 syllable Korean names, English names, team names and 초성.
+"""
+import argparse
+import random
+
+import db
+from bench._common import dump_json, print_report, summarize, temp_db, time_calls
+
+SURNAMES = "김이박최정강조윤장임한오서신권황안송류전홍고문양손배백허유남심노하곽성차주우구민진나지엄채원천방공현함변염여추도소석선설마길연위표명기반왕금옥육인맹제모탁국어은편용예경봉사부가복태목형피두감호제음빈동온"
+GIVEN = "민서준지현우예은도윤하진수연영호성희재정혜승훈유경주원태상동혁나래보람슬기"
+FIRST_EN = ["James", "Jenny", "Chris", "Olivia", "Daniel", "Grace", "Kevin", "Sophia", "Brian", "Chloe", "Eric", "Hannah"]
+TEAMS = ["플랫폼개발팀", "데이터팀", "인사팀", "재무팀", "디자인팀", "마케팅팀", "영업1팀", "영업2팀", "보안팀", "품질팀", "전략기획팀", "고객경험팀"]
+
+
+def _seed(n: int, rng: random.Random) -> list[str]:
+    names = []
+    rows = []
+    for i in range(1, n + 1):
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2, 2, 2))))
+        names.append(name)
+        en = rng.choice(FIRST_EN) if rng.random() < 0.6 else ""
+        rows.append((i, name, en, f"{rng.randint(1, 40)} {rng.choice(TEAMS)}", "팀원", f"us{i:05d}"))
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO users(user_id, username, english_name, team, role, employee_id) VALUES (?,?,?,?,?,?)", rows)
+        conn.executemany(
+            "INSERT INTO users_search(rowid, name, english, team, chosung) VALUES (?,?,?,?,?)",
+            [db._user_search_row(uid, name, en, team) for uid, name, en, team, _r, _e in rows],
+        )
+    return names
+
+
+def _legacy_search(query: str, exclude_id: int):
+    conn = db.get_connection()
+    try:
+        q = f"%{query}%"
+        return conn.execute(
+            "SELECT user_id, username, english_name, team FROM users WHERE (username LIKE ? OR english_name LIKE ? OR team LIKE ?) AND user_id != ? LIMIT 20",
+            (q, q, q, exclude_id),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=50000)
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    rng = random.Random(11)
+    with temp_db():
+        db.init_db()
+        names = _seed(args.users, rng)
+        sample = rng.choice([n for n in names if len(n) == 3])
+        queries = {
+            "1 syllable": sample[0],
+            "2 syllables": sample[:2],
+            "full name": sample,
+            "english": "chris",
+            "team": "데이터",
+            "초성": db._chosung(sample),
+        }
+        db.search_users("warm-up", 0)
+        results = {}
+        found = {}
+        for label, q in queries.items():
+            results[f"before: {label} ({q})"] = summarize(time_calls(lambda: _legacy_search(q, 0), args.repeat))
+            results[f"after:  {label} ({q})"] = summarize(time_calls(lambda: db.search_users(q, 0), args.repeat))
+            found[label] = len(db.search_users(q, 0))
+
+    print_report(f"search_users over {args.users} users (ms)", results)
+    print("  results per query:", found)
+    dump_json(args.json, {"benchmark": "user_search", "users": args.users, "results": results, "found": found})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Process-wide change feed for push-style refresh (no external broker).
+
+Every write to a meal-scoped table already bumps a counter in data_versions (SQLite
+triggers, see db._migration_3_meal_versions), so the database itself is the change log.
+One watcher thread per server process polls ``PRAGMA data_version`` - a header read that
+touches no table - and only re-reads data_versions when another connection committed.
+Sessions then compare in-memory counters instead of querying SQLite on every tick.
+"""
+import threading
+
+import db
+
+POLL_INTERVAL_SECONDS = 0.25
+
+
+class ChangeFeed:
+    def __init__(self, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lunch-changefeed", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _reload(self, c):
+        c.execute("SELECT scope, version FROM data_versions")
+        versions = dict(c.fetchall())
+        with self._lock:
+            self._versions = versions
+
+    def _run(self):
+        last_data_version = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn = db.get_connection()
+                    try:
+                        c = conn.cursor()
+                        c.execute("PRAGMA data_version")
+                        data_version = c.fetchone()[0]
+                        if data_version != last_data_version:
+                            self._reload(c)
+                            last_data_version = data_version
+                    finally:
+                        conn.close()
+                except Exception as e:
+                    print(f"changefeed: {e}")
+                    last_data_version = None
+                self._stop.wait(self.poll_interval)
+        finally:
+            db.release_connection()
+
+    def versions(self, scopes) -> tuple[int, ...]:
+        with self._lock:
+            return tuple(self._versions.get(s, 0) for s in scopes)
+
+
+_feed: ChangeFeed | None = None
+_feed_lock = threading.Lock()
+
+
+def get_feed() -> ChangeFeed:
+    """The process-wide feed (started on first use)."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = ChangeFeed()
+        _feed.start()
+        return _feed
+
+
+def viewer_scopes(meal: str, *, private: bool = False) -> tuple[str, ...]:
+    """Scopes whose changes are visible to a viewer of today's meal board/chat."""
+    scopes = (db.meal_version_scope(meal), "users")
+    return scopes + ("friends",) if private else scopes
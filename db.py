@@ -1,12 +1,37 @@
 import os
+import re
 import sqlite3
 import datetime
 from datetime import timezone, timedelta
 import hashlib
+import json
 import secrets
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 
 DB_NAME = os.path.join(os.path.dirname(__file__), "lunch_mate.db")
 
+# Connection tuning (applied once per physical connection, see _open_connection)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_CACHE_SIZE_KIB = 16 * 1024
+SQLITE_MMAP_SIZE = 128 * 1024 * 1024
+# Idle connections kept per database file for the next script thread
+POOL_MAX_IDLE = 8
+# How often a process re-reads data_versions to notice writes made by other processes
+VERSION_RECHECK_SECONDS = 1.0
+# Login sessions: sliding expiry, throttled last-seen writes, in-process lookup cache
+SESSION_TTL_SECONDS = 30 * 24 * 3600
+SESSION_TOUCH_INTERVAL_SECONDS = 300
+SESSION_CACHE_TTL_SECONDS = 60
+SESSION_CACHE_MAX_ENTRIES = 4096
+SESSION_CLEANUP_INTERVAL_SECONDS = 3600
+SESSION_CLEANUP_BATCH = 500
+# One-time codes the logged-in app hands to the Telegram deep link (/start <code>)
+TELEGRAM_LINK_CODE_TTL_SECONDS = 15 * 60
+
 
 def kst_today() -> datetime.date:
     """Return today's date in Asia/Seoul (KST), independent of server timezone."""
@@ -30,10 +55,18 @@ def _hash_pin(employee_id: str, pin: str, salt_hex: str) -> str:
     # pin is 4-digit numeric string
     return _sha256_hex(f"{employee_id}:{pin}:{salt_hex}".encode("utf-8"))
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+# --- Schema migrations ---
+# PRAGMA user_version records how many entries of _MIGRATIONS a database file has been
+# through. Schema changes go in as a new function appended to _MIGRATIONS; a shipped
+# migration is never edited, since existing DBs will not run it again.
+
 
+def _migration_1_baseline(c):
+    """Create the current schema and fold in every pre-versioning legacy layout.
+
+    Safe on a fresh DB and on any older layout (UNIQUE(username) users, meal-less
+    daily_status/lunch_groups/group_members/requests/group_chat).
+    """
     # Users table (supports simple migrations)
     # NOTE: username is NOT unique (names can duplicate). employee_id is unique.
     c.execute(
@@ -88,8 +121,10 @@ def init_db():
             '''CREATE TABLE IF NOT EXISTS users_new
                      (user_id INTEGER PRIMARY KEY AUTOINCREMENT,
                       username TEXT,
+                      english_name TEXT,
                       telegram_chat_id TEXT,
                       team TEXT,
+                      role TEXT,
                       mbti TEXT,
                       age INTEGER,
                       years INTEGER,
@@ -99,8 +134,8 @@ def init_db():
         )
         c.execute(
             """
-            INSERT INTO users_new (user_id, username, telegram_chat_id, team, mbti, age, years, employee_id, pin_salt, pin_hash)
-            SELECT user_id, username, telegram_chat_id, team, mbti, age, years, employee_id, pin_salt, pin_hash
+            INSERT INTO users_new (user_id, username, english_name, telegram_chat_id, team, role, mbti, age, years, employee_id, pin_salt, pin_hash)
+            SELECT user_id, username, english_name, telegram_chat_id, team, role, mbti, age, years, employee_id, pin_salt, pin_hash
             FROM users
             """
         )
@@ -441,11 +476,646 @@ def init_db():
            ON match_events(date, meal)"""
     )
 
-    conn.commit()
+
+def _migration_2_data_versions(c):
+    """Per-scope change counters; the 'users' scope is bumped by triggers on users."""
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_users_version_{event.lower()}
+            AFTER {event} ON users
+            BEGIN
+                INSERT INTO data_versions(scope, version) VALUES ('users', 1)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END
+            """
+        )
+
+
+# Tables whose rows are keyed by (date, meal); any write bumps the "<date>:<meal>" scope.
+_MEAL_SCOPED_TABLES = ("daily_status", "lunch_groups", "group_members", "requests", "group_chat")
+
+
+def _meal_scope_sql(row: str) -> str:
+    return f"COALESCE({row}.date, '') || ':' || COALESCE({row}.meal, '')"
+
+
+def _migration_3_meal_versions(c):
+    """Bump data_versions['<date>:<meal>'] on every write to meal-scoped tables, and
+    data_versions['friends'] on friends writes."""
+    bump = """
+        INSERT INTO data_versions(scope, version) VALUES ({scope}, 1)
+        ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+    """
+    for table in _MEAL_SCOPED_TABLES:
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_insert
+            AFTER INSERT ON {table}
+            BEGIN {bump.format(scope=_meal_scope_sql("NEW"))} END
+            """
+        )
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_delete
+            AFTER DELETE ON {table}
+            BEGIN {bump.format(scope=_meal_scope_sql("OLD"))} END
+            """
+        )
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_update
+            AFTER UPDATE ON {table}
+            BEGIN
+                {bump.format(scope=_meal_scope_sql("NEW"))}
+                INSERT INTO data_versions(scope, version)
+                SELECT {_meal_scope_sql("OLD")}, 1
+                WHERE {_meal_scope_sql("OLD")} != {_meal_scope_sql("NEW")}
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+            END
+            """
+        )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_friends_version_{event.lower()}
+            AFTER {event} ON friends
+            BEGIN {bump.format(scope="'friends'")} END
+            """
+        )
+
+
+def _migration_4_group_chat_cursor(c):
+    """Index for id-cursor chat reads (list_group_chat_since/_before)."""
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_group_chat_day_host_id
+           ON group_chat(date, meal, host_user_id, id)"""
+    )
+
+
+def _migration_5_group_chat_meal_backfill(c):
+    """Messages written by the old meal-less fallback INSERT belong to lunch.
+
+    (Replaces the per-call PRAGMA table_info probe the chat helpers used to run.)
+    """
+    c.execute("UPDATE group_chat SET meal='lunch' WHERE meal IS NULL OR meal=''")
+
+
+# match_events: one row per (date, meal, host) group that ever reached >=2 members
+# (host included). Rows are upserted on membership/group writes and never deleted,
+# so a group that later shrinks keeps its last matched snapshot.
+_MATCH_EVENT_CONFLICT_SQL = """
+    ON CONFLICT(date, meal, host_user_id) DO UPDATE SET
+        member_user_ids = excluded.member_user_ids,
+        member_count = excluded.member_count,
+        kind = excluded.kind,
+        updated_at = excluded.updated_at
+    WHERE match_events.member_user_ids IS NOT excluded.member_user_ids
+       OR match_events.kind IS NOT excluded.kind
+"""
+
+
+def _match_event_upsert_sql(row: str) -> str:
+    """Recompute the match_events row for the group that {row} (NEW/OLD) belongs to."""
+    key = f"date={row}.date AND meal={row}.meal AND host_user_id={row}.host_user_id"
+    group_key = f"g.date={row}.date AND g.meal={row}.meal AND g.host_user_id={row}.host_user_id"
+    return f"""
+        INSERT INTO match_events(date, meal, host_user_id, member_user_ids, member_count, kind, updated_at)
+        SELECT g.date, g.meal, g.host_user_id, m.ids, m.n, g.kind, CURRENT_TIMESTAMP
+        FROM lunch_groups g,
+             (SELECT group_concat(user_id, ',') AS ids, COUNT(*) AS n
+              FROM (SELECT user_id FROM group_members WHERE {key} ORDER BY user_id)) m
+        WHERE {group_key} AND m.n >= 2
+        {_MATCH_EVENT_CONFLICT_SQL};
+    """
+
+
+def _migration_6_match_event_triggers(c):
+    """Keep match_events current from group_members/lunch_groups writes, then backfill."""
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_group_members_match_insert
+        AFTER INSERT ON group_members
+        BEGIN {_match_event_upsert_sql("NEW")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_group_members_match_delete
+        AFTER DELETE ON group_members
+        BEGIN {_match_event_upsert_sql("OLD")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_group_members_match_update
+        AFTER UPDATE ON group_members
+        BEGIN {_match_event_upsert_sql("OLD")} {_match_event_upsert_sql("NEW")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lunch_groups_match_insert
+        AFTER INSERT ON lunch_groups
+        BEGIN {_match_event_upsert_sql("NEW")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lunch_groups_match_update
+        AFTER UPDATE OF date, meal, host_user_id, kind ON lunch_groups
+        BEGIN {_match_event_upsert_sql("NEW")} END
+        """
+    )
+    c.execute(_REBUILD_MATCH_EVENTS_SQL)
+
+
+def _migration_7_match_rollups(c):
+    """Daily/monthly match analytics rollups plus the queue of days that need (re)rolling.
+
+    Any match_events write queues its date; get_match_stats rolls up queued days once
+    they are over, so closed days are summed from the rollup tables only.
+    """
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_daily_stats (
+            date TEXT NOT NULL,
+            meal TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT '',
+            groups INTEGER NOT NULL DEFAULT 0,
+            participants INTEGER NOT NULL DEFAULT 0,
+            cross_team_pairs INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, meal, kind)
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_monthly_stats (
+            month TEXT NOT NULL,
+            meal TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT '',
+            groups INTEGER NOT NULL DEFAULT 0,
+            participants INTEGER NOT NULL DEFAULT 0,
+            cross_team_pairs INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, meal, kind)
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute("CREATE TABLE IF NOT EXISTS match_rollup_pending (date TEXT PRIMARY KEY) WITHOUT ROWID")
+    # Upsert, not INSERT OR IGNORE: these fire under match_events upserts, whose
+    # enclosing statement's conflict policy replaces a trigger's OR IGNORE and turns
+    # an already-queued date into a UNIQUE error.
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_match_events_rollup_{event.lower()}
+            AFTER {event} ON match_events
+            BEGIN
+                INSERT INTO match_rollup_pending(date) VALUES ({row}.date) ON CONFLICT(date) DO NOTHING;
+            END
+            """
+        )
+    c.execute(
+        "INSERT OR IGNORE INTO match_rollup_pending(date) SELECT DISTINCT date FROM match_events WHERE date IS NOT NULL"
+    )
+
+
+# Symmetric view of friends: one row per direction, so "is X related to Y" and
+# "friends of X" are single primary-key range reads. status is 'accepted' if any
+# friends row for the pair is accepted, else the row's status (usually 'pending').
+def _friend_pair_sync_sql(row: str) -> str:
+    a, b = f"{row}.requester_id", f"{row}.target_id"
+    return f"""
+        DELETE FROM friend_edges WHERE (user_id={a} AND friend_id={b}) OR (user_id={b} AND friend_id={a});
+        INSERT INTO friend_edges(user_id, friend_id, status)
+        SELECT x.u, x.f, s.status
+        FROM (SELECT {a} AS u, {b} AS f UNION ALL SELECT {b}, {a}) x,
+             (SELECT CASE WHEN SUM(status='accepted') > 0 THEN 'accepted' ELSE MAX(status) END AS status
+              FROM friends
+              WHERE (requester_id={a} AND target_id={b}) OR (requester_id={b} AND target_id={a})
+              HAVING COUNT(*) > 0) s
+        WHERE x.u != x.f;
+    """
+
+
+def _migration_8_friend_edges(c):
+    """friend_edges(user_id, friend_id, status), maintained from friends by triggers."""
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS friend_edges (
+            user_id INTEGER NOT NULL,
+            friend_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            PRIMARY KEY (user_id, friend_id)
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_friends_edges_insert
+        AFTER INSERT ON friends
+        BEGIN {_friend_pair_sync_sql("NEW")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_friends_edges_delete
+        AFTER DELETE ON friends
+        BEGIN {_friend_pair_sync_sql("OLD")} END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_friends_edges_update
+        AFTER UPDATE ON friends
+        BEGIN {_friend_pair_sync_sql("OLD")} {_friend_pair_sync_sql("NEW")} END
+        """
+    )
+    c.execute("DELETE FROM friend_edges")
+    c.execute(
+        """
+        INSERT INTO friend_edges(user_id, friend_id, status)
+        SELECT u, f, CASE WHEN SUM(status='accepted') > 0 THEN 'accepted' ELSE MAX(status) END
+        FROM (
+            SELECT requester_id AS u, target_id AS f, status FROM friends
+            UNION ALL
+            SELECT target_id, requester_id, status FROM friends
+        )
+        WHERE u IS NOT NULL AND f IS NOT NULL AND u != f
+        GROUP BY u, f
+        """
+    )
+
+
+def _migration_9_users_search(c):
+    """FTS5 people search over users (1/2-gram tokens + Korean initial consonants)."""
+    c.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+            name, english, team, chosung, tokenize='unicode61'
+        )
+        """
+    )
+    c.execute("DELETE FROM users_search")
+    c.execute("SELECT user_id, username, english_name, team FROM users")
+    c.executemany(
+        "INSERT INTO users_search(rowid, name, english, team, chosung) VALUES (?,?,?,?,?)",
+        [_user_search_row(*row) for row in c.fetchall()],
+    )
+
+
+def _migration_10_auth_session_hashes(c):
+    """auth_sessions keyed by sha256(token) with last-seen/expiry (epoch seconds).
+
+    Existing raw tokens are hashed in place, so logged-in browsers stay logged in.
+    """
+    c.execute(
+        """
+        CREATE TABLE auth_sessions_new (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            last_seen_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    now = int(time.time())
+    c.execute(
+        "SELECT token, user_id, CAST(COALESCE(strftime('%s', created_at), ?) AS INTEGER) FROM auth_sessions WHERE token IS NOT NULL",
+        (now,),
+    )
+    c.executemany(
+        "INSERT OR IGNORE INTO auth_sessions_new(token_hash, user_id, created_at, last_seen_at, expires_at) VALUES (?,?,?,?,?)",
+        [
+            (_hash_session_token(token), user_id, created, now, now + SESSION_TTL_SECONDS)
+            for token, user_id, created in c.fetchall()
+        ],
+    )
+    c.execute("DROP TABLE auth_sessions")
+    c.execute("ALTER TABLE auth_sessions_new RENAME TO auth_sessions")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_auth_sessions_user ON auth_sessions(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires ON auth_sessions(expires_at)")
+
+
+def _migration_11_notification_outbox(c):
+    """Telegram messages queued in the same transaction as the change they announce."""
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            chat_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT
+        )
+        """
+    )
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+           ON notification_outbox(status, next_attempt_at)"""
+    )
+
+
+def _migration_12_app_state(c):
+    """Small key/value store for process-independent app state (offsets, leases)."""
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS app_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _migration_13_query_plan_indexes(c):
+    """Indexes that serve the hot ORDER BYs directly (found by bench.query_plans)."""
+    # Per-user request lists and the pair lookup sort newest first.
+    for name, cols in (
+        ("idx_requests_pair_day", "date, meal, from_user_id, to_user_id, timestamp"),
+        ("idx_requests_to_day", "date, meal, to_user_id, timestamp"),
+        ("idx_requests_from_day", "date, meal, from_user_id, timestamp"),
+    ):
+        c.execute(f"DROP INDEX IF EXISTS {name}")
+        c.execute(f"CREATE INDEX {name} ON requests({cols})")
+    # History dropdown: one user's dates, newest first (was a full index scan).
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_group_members_user_date
+           ON group_members(user_id, meal, date)"""
+    )
+    # The worker's claim query walks due messages in order without a sort. The old
+    # (status, next_attempt_at) index won the planner's choice but forced one, so
+    # it goes; purge gets a created_at index instead.
+    c.execute("DROP INDEX IF EXISTS idx_notification_outbox_due")
+    c.execute(
+        """CREATE INDEX IF NOT EXISTS idx_notification_outbox_queue
+           ON notification_outbox(next_attempt_at) WHERE status IN ('pending', 'sending')"""
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_created ON notification_outbox(created_at)")
+
+
+def _migration_14_telegram_link_codes(c):
+    """One-time /start codes: a chat links to whoever issued the code, not to a typed 사번."""
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS telegram_link_codes (
+            code_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_telegram_link_codes_user ON telegram_link_codes(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_telegram_link_codes_expires ON telegram_link_codes(expires_at)")
+
+
+_MIGRATIONS = (
+    _migration_1_baseline,
+    _migration_2_data_versions,
+    _migration_3_meal_versions,
+    _migration_4_group_chat_cursor,
+    _migration_5_group_chat_meal_backfill,
+    _migration_6_match_event_triggers,
+    _migration_7_match_rollups,
+    _migration_8_friend_edges,
+    _migration_9_users_search,
+    _migration_10_auth_session_hashes,
+    _migration_11_notification_outbox,
+    _migration_12_app_state,
+    _migration_13_query_plan_indexes,
+    _migration_14_telegram_link_codes,
+)
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+# DB files already checked by this process; a warm server does no schema work per rerun.
+_schema_ready: set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def get_schema_version() -> int:
+    conn = get_connection()
+    try:
+        return int(conn.execute("PRAGMA user_version").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def init_db():
+    """Apply pending migrations (at most once per process per DB file)."""
+    path = DB_NAME
+    if path in _schema_ready:
+        return
+    with _schema_lock:
+        if path in _schema_ready:
+            return
+        if get_schema_version() < SCHEMA_VERSION:
+            with transaction(immediate=True) as conn:
+                c = conn.cursor()
+                # Re-read under the write lock: another process may have migrated meanwhile.
+                c.execute("PRAGMA user_version")
+                version = int(c.fetchone()[0])
+                for number, migrate in enumerate(_MIGRATIONS[version:], start=version + 1):
+                    migrate(c)
+                    c.execute(f"PRAGMA user_version={number}")
+        _schema_ready.add(path)
+
+# --- Connection management ---
+# Each thread (one Streamlit script run) leases a single connection on first use and
+# keeps it until the thread ends; the connection then goes back to a small idle pool so
+# the next rerun skips connect() + PRAGMA setup. Helpers keep the old
+# get_connection()/close() shape: close() only returns the lease (rolling back anything
+# left uncommitted), it never closes the physical connection.
+
+_pool_lock = threading.Lock()
+_write_lock = threading.Lock()
+_idle_connections: dict[str, list[sqlite3.Connection]] = {}
+_local = threading.local()
+
+
+class _Connection(sqlite3.Connection):
+    """A plain sqlite3 connection that can be weakly referenced (db_profile tracks these)."""
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=_Connection
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KIB)}")
+    conn.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+    return conn
+
+
+def _release_connection(path: str, conn: sqlite3.Connection):
+    """Return a physical connection to the idle pool (called when its lease dies)."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.close()
+        return
+    with _pool_lock:
+        idle = _idle_connections.setdefault(path, [])
+        if len(idle) < POOL_MAX_IDLE:
+            idle.append(conn)
+            return
     conn.close()
 
+
+class _Lease:
+    """One thread's claim on a pooled connection for a given database file."""
+
+    __slots__ = ("conn", "tx_depth", "__weakref__")
+
+    def __init__(self, path: str, conn: sqlite3.Connection):
+        self.conn = conn
+        self.tx_depth = 0
+        # Runs when the owning thread's locals are torn down (or on release_connection()).
+        weakref.finalize(self, _release_connection, path, conn)
+
+
+def _lease() -> _Lease:
+    path = DB_NAME
+    leases = getattr(_local, "leases", None)
+    if leases is None:
+        leases = _local.leases = {}
+    lease = leases.get(path)
+    if lease is None:
+        with _pool_lock:
+            idle = _idle_connections.get(path)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = _open_connection(path)
+        lease = leases[path] = _Lease(path, conn)
+    return lease
+
+
+class _PooledConnection:
+    """Thin proxy handed out by get_connection().
+
+    Inside a transaction() block commit()/rollback()/close() are deferred to the
+    outermost block so helpers called from it join the same transaction.
+    """
+
+    __slots__ = ("_lease",)
+
+    def __init__(self, lease: _Lease):
+        self._lease = lease
+
+    def __getattr__(self, name):
+        return getattr(self._lease.conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        if self._lease.tx_depth == 0:
+            self._lease.conn.commit()
+
+    def rollback(self):
+        if self._lease.tx_depth == 0:
+            self._lease.conn.rollback()
+
+    def close(self):
+        lease = self._lease
+        if lease.tx_depth == 0 and lease.conn.in_transaction:
+            lease.conn.rollback()
+
+
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """Return this thread's pooled connection (call close() when done, as before)."""
+    return _PooledConnection(_lease())
+
+
+@contextmanager
+def connection():
+    """Context-manager form of get_connection(); rolls back anything left uncommitted."""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(*, immediate: bool = False):
+    """Run the block in one transaction on this thread's pooled connection.
+
+    immediate=True takes the write lock up front (BEGIN IMMEDIATE) so read-then-write
+    sequences cannot interleave with other writers. Nested blocks join the outer
+    transaction.
+    """
+    lease = _lease()
+    conn = _PooledConnection(lease)
+    # Writers in this process queue on a plain lock instead of SQLite's sleep/retry
+    # busy handler; the SQLite lock still serializes against other processes.
+    local_lock = _write_lock if (immediate and lease.tx_depth == 0) else None
+    if local_lock is not None:
+        local_lock.acquire()
+    try:
+        if lease.tx_depth == 0:
+            if lease.conn.in_transaction:
+                lease.conn.rollback()
+            lease.conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        lease.tx_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            lease.tx_depth -= 1
+            if lease.tx_depth == 0:
+                lease.conn.rollback()
+            raise
+        lease.tx_depth -= 1
+        if lease.tx_depth == 0:
+            lease.conn.commit()
+    finally:
+        if local_lock is not None:
+            local_lock.release()
+
+
+def release_connection():
+    """Give this thread's connection back to the pool now (e.g. long-lived worker threads)."""
+    leases = getattr(_local, "leases", None)
+    if leases:
+        # The lease's finalizer returns the connection once no proxy references it.
+        leases.pop(DB_NAME, None)
+
+
+def close_all_connections():
+    """Drop this thread's lease and close every idle pooled connection (tests/benchmarks)."""
+    release_connection()
+    with _pool_lock:
+        idle = [c for conns in _idle_connections.values() for c in conns]
+        _idle_connections.clear()
+    for conn in idle:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
 
 
 def reset_all_data():
@@ -457,10 +1127,12 @@ def reset_all_data():
         "friends",
         "requests",
         "auth_sessions",
+        "telegram_link_codes",
         "group_members",
         "lunch_groups",
         "daily_status",
         "users",
+        "users_search",
     ]:
         try:
             c.execute(f"DELETE FROM {tbl}")
@@ -473,6 +1145,9 @@ def reset_all_data():
     except Exception:
         pass
     conn.close()
+    _invalidate_user_directory()
+    _invalidate_friend_cache()
+    _clear_session_cache()
 
 
 def reset_today_data():
@@ -496,8 +1171,10 @@ def reset_today_data():
     for ds in sorted(date_set):
         c.execute("DELETE FROM requests WHERE date=?", (ds,))
         c.execute("DELETE FROM daily_status WHERE date=?", (ds,))
-        c.execute("DELETE FROM group_members WHERE date=?", (ds,))
+        # Groups first (as delete_group does): member deletes then find no group and
+        # leave the day's match_events snapshots alone instead of rewriting them smaller.
         c.execute("DELETE FROM lunch_groups WHERE date=?", (ds,))
+        c.execute("DELETE FROM group_members WHERE date=?", (ds,))
     conn.commit()
     conn.close()
 
@@ -521,8 +1198,6 @@ def register_user(
     employee_id = (employee_id or "").strip().lower()
 
     # employee id rule: 2 lowercase letters + 5 digits
-    import re
-
     if not re.fullmatch(r"[a-z]{2}\d{5}", employee_id):
         return False, "사번은 영문자 2개 + 숫자 5개 형식이어야 합니다. (예: sl55555)"
 
@@ -542,7 +1217,9 @@ def register_user(
             """,
             (username, (english_name or "").strip(), team, role, mbti, int(age), int(years), employee_id, salt, pin_hash, chat_id),
         )
+        _sync_user_search(c, c.lastrowid)
         conn.commit()
+        _invalidate_user_directory()
         return True, None
     except sqlite3.IntegrityError:
         return False, "이미 존재하는 사번(employee_id)입니다."
@@ -578,8 +1255,10 @@ def update_user_profile(
             int(user_id),
         ),
     )
+    _sync_user_search(c, int(user_id))
     conn.commit()
     conn.close()
+    _invalidate_user_directory()
     return True, None
 
 
@@ -606,19 +1285,47 @@ def update_user_chat_id(user_id, chat_id):
     c.execute("UPDATE users SET telegram_chat_id=? WHERE user_id=?", (chat_id, user_id))
     conn.commit()
     conn.close()
+    _invalidate_user_directory()
 
 
-def update_user_chat_id_by_employee_id(employee_id: str, chat_id: str) -> tuple[bool, str | None]:
-    employee_id = (employee_id or "").strip().lower()
-    if not employee_id:
-        return False, "employee_id가 비어있습니다."
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET telegram_chat_id=? WHERE employee_id=?", (str(chat_id), employee_id))
-    conn.commit()
-    ok = c.rowcount > 0
-    conn.close()
-    return (ok, None if ok else "해당 사번 사용자를 찾지 못했어요.")
+def _hash_link_code(code: str) -> str:
+    return _sha256_hex(f"telegram-link:{code}".encode("utf-8"))
+
+
+def create_telegram_link_code(user_id: int) -> str:
+    """Issue a one-time /start code for this user (replaces their earlier codes)."""
+    code = secrets.token_urlsafe(16)  # deep-link payloads allow A-Z a-z 0-9 _ -
+    now = int(time.time())
+    with transaction(immediate=True) as conn:
+        conn.execute("DELETE FROM telegram_link_codes WHERE user_id=? OR expires_at <= ?", (int(user_id), now))
+        conn.execute(
+            "INSERT INTO telegram_link_codes(code_hash, user_id, expires_at) VALUES (?, ?, ?)",
+            (_hash_link_code(code), int(user_id), now + TELEGRAM_LINK_CODE_TTL_SECONDS),
+        )
+    return code
+
+
+def link_telegram_chat(code: str, chat_id: str) -> tuple[bool, str | None]:
+    """Consume a /start code and store chat_id for the user who issued it.
+
+    The code is deleted in the same transaction, so a replayed or guessed /start can't
+    relink anyone's chat.
+    """
+    code = (code or "").strip()
+    if not code:
+        return False, "연동 코드가 비어있습니다."
+    with transaction(immediate=True) as conn:
+        rows = conn.execute(
+            "DELETE FROM telegram_link_codes WHERE code_hash=? AND expires_at > ? RETURNING user_id",
+            (_hash_link_code(code), int(time.time())),
+        ).fetchall()
+        row = rows[0] if rows else None
+        if row:
+            conn.execute("UPDATE users SET telegram_chat_id=? WHERE user_id=?", (str(chat_id), row[0]))
+    if not row:
+        return False, "연동 코드가 만료됐거나 이미 사용됐어요."
+    _invalidate_user_directory()
+    return True, None
 
 
 def set_planning(user_id: int, *, meal: str = "lunch"):
@@ -688,26 +1395,20 @@ def format_name(username: str, english_name: str | None) -> str:
     return f"{username} ({en})" if en else username
 
 
-def get_display_name(user_id: int) -> str:
-    """Format: {팀명} {이름 (영어이름)} {직급}.
+# --- User directory (in-process, read-mostly) ---
+# users changes rarely but is read for every card/chat line/admin row, so the display
+# fields are loaded once per process and reused until the 'users' data version moves.
 
-    Defensive cleanup:
-    - If username/team accidentally contains a leading numeric prefix (e.g., "1 김희준"), strip it.
-    """
-    u = get_user_by_id(int(user_id))
-    if not u:
-        return str(user_id)
+_LEADING_NUMBER_RE = re.compile(r"^(\[?\(?\d+\]?\)?\.?\s+)")
 
-    _uid, username, english_name, _chat, team, role, *_rest = u
 
-    import re
+def _strip_leading_number(s: str | None) -> str:
+    s = (s or "").strip()
+    # "1 김희준" or "1. 김희준" or "[1] 김희준"
+    return _LEADING_NUMBER_RE.sub("", s).strip()
 
-    def _strip_leading_number(s: str | None) -> str:
-        s = (s or "").strip()
-        # "1 김희준" or "1. 김희준" or "[1] 김희준"
-        s = re.sub(r"^(\[?\(?\d+\]?\)?\.?\s+)", "", s)
-        return s.strip()
 
+def _format_display_name(username: str | None, english_name: str | None, team: str | None, role: str | None) -> str:
     team = _strip_leading_number(team)
     username = _strip_leading_number(username)
     english_name = (english_name or "").strip()
@@ -717,47 +1418,198 @@ def get_display_name(user_id: int) -> str:
     parts = [p for p in [team, name, mapped] if p]
     return " ".join(parts) if parts else name
 
-def clear_status_today(user_id: int, *, meal: str = "lunch", clear_hosting: bool = True):
-    """Remove today's status row so UI shows 'Not Set' (per meal).
 
-    If clear_hosting=True, also remove the user's hosting listing for today+meal.
-    """
-    today = kst_today_iso()
-    meal = _norm_meal(meal)
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM daily_status WHERE date=? AND meal=? AND user_id=?", (today, meal, user_id))
-    conn.commit()
-    conn.close()
+class UserRecord:
+    """Display-safe subset of a users row (no PIN fields)."""
 
-    if clear_hosting:
-        try:
-            delete_group(user_id, meal=meal)
-        except Exception:
-            pass
+    __slots__ = ("user_id", "username", "english_name", "telegram_chat_id", "team", "role", "employee_id", "display_name")
 
+    def __init__(self, user_id, username, english_name, telegram_chat_id, team, role, employee_id):
+        self.user_id = user_id
+        self.username = username
+        self.english_name = english_name
+        self.telegram_chat_id = telegram_chat_id
+        self.team = team
+        self.role = role
+        self.employee_id = employee_id
+        self.display_name = _format_display_name(username, english_name, team, role)
 
-def update_status(user_id, status, *, meal: str = "lunch", kind: str | None = None, force: bool = False):
-    """Set today's status (per meal).
 
-    - meal: lunch | dinner
-    - kind: (dinner only) 'meal' | 'drink'
+class _UserDirectory:
+    __slots__ = ("path", "version", "checked_at", "by_id", "by_employee_id", "by_team", "_search_chars")
 
-    Rule: Booked is terminal for the day (cannot be downgraded) unless force=True.
-    """
-    today = kst_today_iso()
-    meal = _norm_meal(meal)
-    kind = _norm_kind(kind)
+    def __init__(self, path: str, version: int, records: list[UserRecord]):
+        self.path = path
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.by_id = {r.user_id: r for r in records}
+        self.by_employee_id = {r.employee_id: r for r in records if r.employee_id}
+        by_team: dict[str, list[UserRecord]] = {}
+        for r in records:
+            by_team.setdefault(_strip_leading_number(r.team), []).append(r)
+        self.by_team = {team: tuple(rs) for team, rs in by_team.items()}
+        self._search_chars: dict[str, frozenset[str]] | None = None
 
-    current = get_status_today(user_id, meal=meal)
-    if (not force) and current == "Booked" and status not in ("Booked",):
-        return
+    def search_chars(self) -> dict[str, frozenset[str]]:
+        """Characters present per users_search column, built on the first search.
 
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
+        A MATCH tier whose column lacks one of the term's characters cannot hit, yet still
+        walks the term's doclists (~1ms each at 50k users), so search_users skips it.
         """
-        INSERT OR REPLACE INTO daily_status (id, date, meal, user_id, status, kind)
+        if self._search_chars is None:
+            records = self.by_id.values()
+            self._search_chars = {
+                column: frozenset("".join({(getattr(r, attr) or "").lower() for r in records}))
+                for column, attr in (("name", "username"), ("english", "english_name"), ("team", "team"))
+            }
+        return self._search_chars
+
+
+_directory: _UserDirectory | None = None
+_directory_lock = threading.Lock()
+
+
+def _read_data_version(c, scope: str) -> int:
+    c.execute("SELECT version FROM data_versions WHERE scope=?", (scope,))
+    row = c.fetchone()
+    return int(row[0]) if row else 0
+
+
+def meal_version_scope(meal: str, date_str: str | None = None) -> str:
+    return f"{date_str or kst_today_iso()}:{_norm_meal(meal)}"
+
+
+def get_board_version(meal: str = "lunch", *, date_str: str | None = None) -> tuple[int, int, int]:
+    """Change counters for (today+meal, users, friends) in one tiny indexed read.
+
+    Every write to daily_status/lunch_groups/group_members/requests/group_chat bumps the
+    meal scope (triggers, see _migration_3_meal_versions). If the tuple is unchanged since
+    the last render, nothing the dashboard/chat shows has changed either.
+    """
+    scope = meal_version_scope(meal, date_str)
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT scope, version FROM data_versions WHERE scope IN (?, 'users', 'friends')", (scope,))
+        versions = dict(c.fetchall())
+    finally:
+        conn.close()
+    return (versions.get(scope, 0), versions.get("users", 0), versions.get("friends", 0))
+
+
+def _invalidate_user_directory():
+    global _directory
+    _directory = None
+
+
+def _user_directory(*, force_check: bool = False) -> _UserDirectory:
+    global _directory
+    d = _directory
+    if d is not None and d.path == DB_NAME and not force_check and time.monotonic() - d.checked_at < VERSION_RECHECK_SECONDS:
+        return d
+
+    with _directory_lock:
+        d = _directory
+        conn = get_connection()
+        try:
+            c = conn.cursor()
+            version = _read_data_version(c, "users")
+            if d is not None and d.path == DB_NAME and d.version == version:
+                d.checked_at = time.monotonic()
+                return d
+            c.execute("SELECT user_id, username, english_name, telegram_chat_id, team, role, employee_id FROM users")
+            d = _UserDirectory(DB_NAME, version, [UserRecord(*row) for row in c.fetchall()])
+        finally:
+            conn.close()
+        _directory = d
+        return d
+
+
+def get_user_record(user_id: int) -> UserRecord | None:
+    d = _user_directory()
+    rec = d.by_id.get(int(user_id))
+    if rec is None:
+        # Possibly registered by another process since the last version check.
+        rec = _user_directory(force_check=True).by_id.get(int(user_id))
+    return rec
+
+
+def get_user_record_by_employee_id(employee_id: str) -> UserRecord | None:
+    employee_id = (employee_id or "").strip().lower()
+    d = _user_directory()
+    rec = d.by_employee_id.get(employee_id)
+    if rec is None:
+        rec = _user_directory(force_check=True).by_employee_id.get(employee_id)
+    return rec
+
+
+def list_team_members(team: str) -> list[UserRecord]:
+    return list(_user_directory().by_team.get(_strip_leading_number(team), ()))
+
+
+def resolve_display_names(user_ids) -> dict[int, str]:
+    """Bulk get_display_name(): {user_id: display name}, str(user_id) for unknown ids."""
+    ids = {int(uid) for uid in user_ids}
+    d = _user_directory()
+    if not ids.issubset(d.by_id):
+        d = _user_directory(force_check=True)
+    out = {}
+    for uid in ids:
+        rec = d.by_id.get(uid)
+        out[uid] = rec.display_name if rec else str(uid)
+    return out
+
+
+def get_display_name(user_id: int) -> str:
+    """Format: {팀명} {이름 (영어이름)} {직급}.
+
+    Defensive cleanup:
+    - If username/team accidentally contains a leading numeric prefix (e.g., "1 김희준"), strip it.
+    """
+    rec = get_user_record(int(user_id))
+    return rec.display_name if rec else str(user_id)
+
+def clear_status_today(user_id: int, *, meal: str = "lunch", clear_hosting: bool = True):
+    """Remove today's status row so UI shows 'Not Set' (per meal).
+
+    If clear_hosting=True, also remove the user's hosting listing for today+meal.
+    """
+    today = kst_today_iso()
+    meal = _norm_meal(meal)
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("DELETE FROM daily_status WHERE date=? AND meal=? AND user_id=?", (today, meal, user_id))
+    conn.commit()
+    conn.close()
+
+    if clear_hosting:
+        try:
+            delete_group(user_id, meal=meal)
+        except Exception:
+            pass
+
+
+def update_status(user_id, status, *, meal: str = "lunch", kind: str | None = None, force: bool = False):
+    """Set today's status (per meal).
+
+    - meal: lunch | dinner
+    - kind: (dinner only) 'meal' | 'drink'
+
+    Rule: Booked is terminal for the day (cannot be downgraded) unless force=True.
+    """
+    today = kst_today_iso()
+    meal = _norm_meal(meal)
+    kind = _norm_kind(kind)
+
+    current = get_status_today(user_id, meal=meal)
+    if (not force) and current == "Booked" and status not in ("Booked",):
+        return
+
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        INSERT OR REPLACE INTO daily_status (id, date, meal, user_id, status, kind)
         VALUES ((SELECT id FROM daily_status WHERE date=? AND meal=? AND user_id=?), ?, ?, ?, ?, ?)
         """,
         (today, meal, user_id, today, meal, user_id, status, kind),
@@ -839,15 +1691,7 @@ def upsert_group(
     conn.close()
 
 
-def get_groups_today(*, meal: str = "lunch", viewer_friends_ids: list[int] | None = None):
-    """Return today's hosting groups for a meal.
-    If viewer_friends_ids is provided, only show groups hosted by those friends.
-    """
-    today = kst_today_iso()
-    meal = _norm_meal(meal)
-    conn = get_connection()
-    c = conn.cursor()
-
+def _query_groups_today(c, today: str, meal: str, viewer_friends_ids: list[int] | None, private_viewer_id: int | None = None):
     query = """
         SELECT g.id, g.host_user_id, u.username, g.member_names, g.seats_left, g.menu, g.payer_name, g.kind
         FROM lunch_groups g
@@ -856,20 +1700,30 @@ def get_groups_today(*, meal: str = "lunch", viewer_friends_ids: list[int] | Non
     """
     params = [today, meal]
 
-    if viewer_friends_ids is not None:
+    visible = _private_filter_sql("g.host_user_id", viewer_friends_ids, private_viewer_id)
+    if visible is not None:
         # Private mode filter
-        if not viewer_friends_ids:
-            conn.close()
-            return []
-        placeholders = ",".join(["?"] * len(viewer_friends_ids))
-        query += f" AND g.host_user_id IN ({placeholders})"
-        params.extend(viewer_friends_ids)
+        sql, extra = visible
+        query += sql
+        params.extend(extra)
 
     query += " ORDER BY g.id DESC"
     c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    return c.fetchall()
+
+
+def get_groups_today(*, meal: str = "lunch", viewer_friends_ids: list[int] | None = None, private_viewer_id: int | None = None):
+    """Return today's hosting groups for a meal.
+    If viewer_friends_ids is provided, only show groups hosted by those friends.
+    If private_viewer_id is provided, only show groups hosted by that viewer or their friends.
+    """
+    today = kst_today_iso()
+    meal = _norm_meal(meal)
+    conn = get_connection()
+    try:
+        return _query_groups_today(conn.cursor(), today, meal, viewer_friends_ids, private_viewer_id)
+    finally:
+        conn.close()
 
 
 def get_group_by_host_on_date(host_user_id: int, date_str: str, *, meal: str = "lunch"):
@@ -980,133 +1834,151 @@ def add_member_fixed_group(host_user_id: int, member_user_id: int, member_name:
     return True, None
 
 
-def accept_group_join(host_user_id: int, member_user_id: int, member_name: str, *, meal: str = "lunch") -> tuple[bool, str | None]:
-    """Accept a join by ensuring membership + decrementing seats_left + syncing display fields."""
-    today = kst_today_iso()
+def reserve_group_seat(
+    host_user_id: int,
+    member_user_id: int,
+    *,
+    meal: str = "lunch",
+    date_str: str | None = None,
+) -> tuple[bool, str | None]:
+    """Atomically take one seat in the host's group for member_user_id.
+
+    Seat check, decrement, membership insert and legacy display fields happen in one
+    BEGIN IMMEDIATE transaction, so concurrent accepts can never overbook a group.
+    Re-joining an existing member succeeds without consuming a seat.
+    """
+    date_str = date_str or kst_today_iso()
     meal = _norm_meal(meal)
-    member_name = (member_name or "").strip()
-    if not member_name:
-        return False, "member_name이 비어있습니다."
+    key = (date_str, meal, host_user_id)
 
-    conn = get_connection()
-    c = conn.cursor()
-    try:
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
         c.execute(
-            "SELECT seats_left FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?",
-            (today, meal, host_user_id),
+            "SELECT 1 FROM group_members WHERE date=? AND meal=? AND host_user_id=? AND user_id=?",
+            key + (member_user_id,),
         )
-        row = c.fetchone()
-        if not row:
+        if c.fetchone():
+            c.execute("SELECT 1 FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?", key)
+            if c.fetchone():
+                return True, None
             return False, "모집글을 찾지 못했어요."
 
-        c.execute(
-            "INSERT OR IGNORE INTO group_members(date, meal, host_user_id, user_id) VALUES (?,?,?,?)",
-            (today, meal, host_user_id, host_user_id),
-        )
-        c.execute(
-            "INSERT OR IGNORE INTO group_members(date, meal, host_user_id, user_id) VALUES (?,?,?,?)",
-            (today, meal, host_user_id, member_user_id),
-        )
-
         c.execute(
             "UPDATE lunch_groups SET seats_left = seats_left - 1 WHERE date=? AND meal=? AND host_user_id=? AND seats_left > 0",
-            (today, meal, host_user_id),
+            key,
         )
         if c.rowcount == 0:
-            return False, "남은 자리가 없어요."
-
-        conn.commit()
-    finally:
-        conn.close()
+            c.execute("SELECT 1 FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?", key)
+            if c.fetchone():
+                return False, "남은 자리가 없어요."
+            return False, "모집글을 찾지 못했어요."
 
-    try:
-        _rebuild_group_legacy_fields(host_user_id, today, meal=meal)
-    except Exception:
-        pass
+        c.executemany(
+            "INSERT OR IGNORE INTO group_members(date, meal, host_user_id, user_id) VALUES (?,?,?,?)",
+            [key + (host_user_id,), key + (member_user_id,)],
+        )
+        _sync_group_legacy_fields(c, host_user_id, date_str, meal)
 
     return True, None
 
 
-def add_member_to_group(host_user_id: int, member_user_id: int, member_name: str) -> tuple[bool, str | None]:
-    """Append member to today's host group and decrement seats_left (atomic-ish).
-
-    Uses normalized group_members + keeps legacy CSV fields in sync for display.
-    """
-    today = kst_today_iso()
+def accept_group_join(
+    host_user_id: int,
+    member_user_id: int,
+    member_name: str,
+    *,
+    meal: str = "lunch",
+    request_id: int | None = None,
+    notify_user_id: int | None = None,
+    notify_text: str | None = None,
+) -> tuple[bool, str | None]:
+    """Accept a join by reserving a seat in the host's group (see reserve_group_seat)."""
     member_name = (member_name or "").strip()
     if not member_name:
         return False, "member_name이 비어있습니다."
+    return reserve_group_seat(
+        host_user_id, member_user_id, meal=meal,
+        request_id=request_id, notify_user_id=notify_user_id, notify_text=notify_text,
+    )
 
-    conn = get_connection()
-    c = conn.cursor()
-    try:
-        # Ensure group exists
-        c.execute(
-            "SELECT member_names, member_user_ids, seats_left FROM lunch_groups WHERE date=? AND host_user_id=?",
-            (today, host_user_id),
-        )
-        row = c.fetchone()
-        if not row:
-            return False, "모집글을 찾지 못했어요."
 
-        member_names, member_user_ids, seats_left = row
-        seats_left = int(seats_left) if seats_left is not None else 0
+def reserve_group_seat(
+    host_user_id: int,
+    member_user_id: int,
+    *,
+    meal: str = "lunch",
+    date_str: str | None = None,
+    request_id: int | None = None,
+    notify_user_id: int | None = None,
+    notify_text: str | None = None,
+) -> tuple[bool, str | None]:
+    """Atomically take one seat in the host's group for member_user_id.
 
-        # Already member?
-        c.execute(
-            "SELECT 1 FROM group_members WHERE date=? AND host_user_id=? AND user_id=?",
-            (today, host_user_id, member_user_id),
-        )
-        if c.fetchone():
-            return True, None
+    Seat check, decrement, membership insert and legacy display fields happen in one
+    BEGIN IMMEDIATE transaction, so concurrent accepts can never overbook a group.
+    Re-joining an existing member succeeds without consuming a seat.
 
-        if seats_left <= 0:
-            return False, "남은 자리가 없어요."
+    With request_id, the invite being accepted must still be pending; it flips to
+    'accepted' (and notify_text is queued for notify_user_id) in the same transaction,
+    only once the seat is taken. A full or missing group leaves it pending.
+    """
+    date_str = date_str or kst_today_iso()
+    meal = _norm_meal(meal)
+    key = (date_str, meal, host_user_id)
 
-        # Ensure host is in normalized members
-        try:
-            c.execute(
-                "INSERT OR IGNORE INTO group_members(date, host_user_id, user_id) VALUES (?,?,?)",
-                (today, host_user_id, host_user_id),
-            )
-        except Exception:
-            pass
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        if request_id is not None:
+            c.execute("SELECT status FROM requests WHERE id=?", (request_id,))
+            row = c.fetchone()
+            if not row or row[0] != "pending":
+                return False, "이미 처리된 초대예요."
 
-        # Insert membership
-        try:
-            c.execute(
-                "INSERT INTO group_members(date, host_user_id, user_id) VALUES (?,?,?)",
-                (today, host_user_id, member_user_id),
-            )
-        except sqlite3.IntegrityError:
+        ok, err = _take_group_seat(c, key, member_user_id)
+        if ok and request_id is not None:
+            c.execute("UPDATE requests SET status='accepted' WHERE id=?", (request_id,))
+            if notify_user_id is not None and notify_text:
+                _enqueue_notification(c, int(notify_user_id), notify_text)
+
+    return ok, err
+
+
+def _take_group_seat(c, key: tuple, member_user_id: int) -> tuple[bool, str | None]:
+    date_str, meal, host_user_id = key
+    c.execute(
+        "SELECT 1 FROM group_members WHERE date=? AND meal=? AND host_user_id=? AND user_id=?",
+        key + (member_user_id,),
+    )
+    if c.fetchone():
+        c.execute("SELECT 1 FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?", key)
+        if c.fetchone():
             return True, None
+        return False, "모집글을 찾지 못했어요."
 
-        # Decrement seats
-        c.execute(
-            "UPDATE lunch_groups SET seats_left = seats_left - 1 WHERE date=? AND host_user_id=? AND seats_left > 0",
-            (today, host_user_id),
-        )
-        if c.rowcount == 0:
+    c.execute(
+        "UPDATE lunch_groups SET seats_left = seats_left - 1 WHERE date=? AND meal=? AND host_user_id=? AND seats_left > 0",
+        key,
+    )
+    if c.rowcount == 0:
+        c.execute("SELECT 1 FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?", key)
+        if c.fetchone():
             return False, "남은 자리가 없어요."
+        return False, "모집글을 찾지 못했어요."
 
-        # Sync legacy display fields
-        ids = [x.strip() for x in (member_user_ids or "").split(",") if x.strip()]
-        names = [n.strip() for n in (member_names or "").split(",") if n.strip()]
-        if str(member_user_id) not in ids:
-            ids.append(str(member_user_id))
-            names.append(member_name)
+    c.executemany(
+        "INSERT OR IGNORE INTO group_members(date, meal, host_user_id, user_id) VALUES (?,?,?,?)",
+        [key + (host_user_id,), key + (member_user_id,)],
+    )
+    _sync_group_legacy_fields(c, host_user_id, date_str, meal)
+    return True, None
 
-        new_member_names = ", ".join(names)
-        new_member_user_ids = ",".join(ids)
-        c.execute(
-            "UPDATE lunch_groups SET member_names=?, member_user_ids=? WHERE date=? AND host_user_id=?",
-            (new_member_names, new_member_user_ids, today, host_user_id),
-        )
 
-        conn.commit()
-        return True, None
-    finally:
-        conn.close()
+def add_member_to_group(host_user_id: int, member_user_id: int, member_name: str, *, meal: str = "lunch") -> tuple[bool, str | None]:
+    """Append member to today's host group and decrement seats_left (legacy entry point)."""
+    member_name = (member_name or "").strip()
+    if not member_name:
+        return False, "member_name이 비어있습니다."
+    return reserve_group_seat(host_user_id, member_user_id, meal=meal)
 
 
 def set_booked_for_group(host_user_id: int, *, meal: str = "lunch"):
@@ -1187,21 +2059,43 @@ def list_group_members(host_user_id: int, date_str: str, *, meal: str = "lunch")
     return rows
 
 
+# Legacy display fields rebuilt in SQL so they can share the caller's transaction.
+# The name format mirrors format_name(); order matches list_group_members().
+_SYNC_GROUP_LEGACY_FIELDS_SQL = """
+UPDATE lunch_groups SET
+    member_names = COALESCE((
+        SELECT group_concat(name, ', ') FROM (
+            SELECT CASE WHEN TRIM(COALESCE(u.english_name, '')) != ''
+                        THEN TRIM(COALESCE(u.username, '')) || ' (' || TRIM(u.english_name) || ')'
+                        ELSE TRIM(COALESCE(u.username, '')) END AS name
+            FROM group_members gm
+            JOIN users u ON u.user_id = gm.user_id
+            WHERE gm.date=:date AND gm.meal=:meal AND gm.host_user_id=:host
+            ORDER BY u.username
+        )
+    ), ''),
+    member_user_ids = COALESCE((
+        SELECT group_concat(user_id, ',') FROM (
+            SELECT gm.user_id AS user_id
+            FROM group_members gm
+            JOIN users u ON u.user_id = gm.user_id
+            WHERE gm.date=:date AND gm.meal=:meal AND gm.host_user_id=:host
+            ORDER BY u.username
+        )
+    ), '')
+WHERE date=:date AND meal=:meal AND host_user_id=:host
+"""
+
+
+def _sync_group_legacy_fields(c, host_user_id: int, date_str: str, meal: str):
+    c.execute(_SYNC_GROUP_LEGACY_FIELDS_SQL, {"date": date_str, "meal": meal, "host": host_user_id})
+
+
 def _rebuild_group_legacy_fields(host_user_id: int, date_str: str, *, meal: str = "lunch"):
     """Keep lunch_groups.member_names/member_user_ids in sync from normalized members."""
     meal = _norm_meal(meal)
-    members = list_group_members(host_user_id, date_str, meal=meal)
-    member_names = ", ".join([format_name(name, en) for _uid, name, en in members])
-    member_user_ids = ",".join([str(uid) for uid, _name, _en in members])
-
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        "UPDATE lunch_groups SET member_names=?, member_user_ids=? WHERE date=? AND meal=? AND host_user_id=?",
-        (member_names, member_user_ids, date_str, meal, host_user_id),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        _sync_group_legacy_fields(conn.cursor(), host_user_id, date_str, meal)
 
 
 def _auto_cancel_group_if_single(host_user_id: int, date_str: str, *, meal: str = "lunch"):
@@ -1501,32 +2395,10 @@ def clear_group_chat(host_user_id: int, date_str: str, *, meal: str = "lunch"):
     conn.close()
 
 
-def _ensure_group_chat_meal_column(conn):
-    """Runtime guard: older DBs may not have group_chat.meal."""
-    try:
-        c = conn.cursor()
-        c.execute("PRAGMA table_info(group_chat)")
-        cols = {r[1] for r in c.fetchall()}
-        if "meal" not in cols:
-            c.execute("ALTER TABLE group_chat ADD COLUMN meal TEXT")
-            # backfill
-            c.execute("UPDATE group_chat SET meal='lunch' WHERE meal IS NULL OR meal='' ")
-            try:
-                c.execute(
-                    "CREATE INDEX IF NOT EXISTS idx_group_chat_day_host ON group_chat(date, meal, host_user_id, timestamp)"
-                )
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        pass
-
-
 def list_group_chat(host_user_id: int, date_str: str, *, meal: str = "lunch", limit: int = 200):
     meal = _norm_meal(meal)
     conn = get_connection()
     try:
-        _ensure_group_chat_meal_column(conn)
         c = conn.cursor()
         c.execute(
             """
@@ -1538,57 +2410,83 @@ def list_group_chat(host_user_id: int, date_str: str, *, meal: str = "lunch", li
             """,
             (date_str, meal, host_user_id, int(limit)),
         )
-        rows = c.fetchall()
-        return rows
-    except sqlite3.OperationalError as e:
-        # fallback for legacy schema
-        if "meal" in str(e).lower():
-            c = conn.cursor()
-            c.execute(
-                """
-                SELECT user_id, username, message, timestamp
-                FROM group_chat
-                WHERE date=? AND host_user_id=?
-                ORDER BY timestamp ASC
-                LIMIT ?
-                """,
-                (date_str, host_user_id, int(limit)),
-            )
-            return c.fetchall()
-        raise
+        return c.fetchall()
     finally:
         conn.close()
 
 
-def add_group_chat(host_user_id: int, user_id: int, username: str, message: str, date_str: str, *, meal: str = "lunch") -> tuple[bool, str | None]:
-    meal = _norm_meal(meal)
-    message = (message or "").strip()
-    if not message:
-        return False, "메시지를 입력해주세요."
-
-    if not is_member_of_group(host_user_id, user_id, date_str, meal=meal):
-        return False, "그룹 멤버만 채팅을 사용할 수 있어요."
+def list_group_chat_since(host_user_id: int, date_str: str, *, meal: str = "lunch", after_id: int = 0, limit: int = 500):
+    """Messages newer than after_id (id cursor), oldest first.
 
+    Rows: (id, user_id, username, message, timestamp). Cost is proportional to the
+    number of new messages, not to the chat history.
+    """
+    meal = _norm_meal(meal)
     conn = get_connection()
     try:
-        _ensure_group_chat_meal_column(conn)
         c = conn.cursor()
-        try:
-            c.execute(
-                "INSERT INTO group_chat(date, meal, host_user_id, user_id, username, message, timestamp) VALUES (?,?,?,?,?,?,?)",
-                (date_str, meal, host_user_id, user_id, username, message, kst_now_str()),
-            )
-        except sqlite3.OperationalError as e:
-            # legacy fallback
-            if "meal" in str(e).lower():
-                c.execute(
-                    "INSERT INTO group_chat(date, host_user_id, user_id, username, message, timestamp) VALUES (?,?,?,?,?,?)",
-                    (date_str, host_user_id, user_id, username, message, kst_now_str()),
-                )
-            else:
-                raise
-        conn.commit()
-        return True, None
+        c.execute(
+            """
+            SELECT id, user_id, username, message, timestamp
+            FROM group_chat
+            WHERE date=? AND meal=? AND host_user_id=? AND id > ?
+            ORDER BY id ASC
+            LIMIT ?
+            """,
+            (date_str, meal, host_user_id, int(after_id or 0), int(limit)),
+        )
+        return c.fetchall()
+    finally:
+        conn.close()
+
+
+def list_group_chat_before(host_user_id: int, date_str: str, *, meal: str = "lunch", before_id: int | None = None, limit: int = 80):
+    """One page of history: the `limit` newest messages older than before_id
+    (or the latest page when before_id is None), oldest first. Same rows as
+    list_group_chat_since()."""
+    meal = _norm_meal(meal)
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT id, user_id, username, message, timestamp
+            FROM group_chat
+            WHERE date=? AND meal=? AND host_user_id=? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (date_str, meal, host_user_id, int(before_id) if before_id is not None else 2**63 - 1, int(limit)),
+        )
+        rows = c.fetchall()
+    finally:
+        conn.close()
+    rows.reverse()
+    return rows
+
+
+def add_group_chat(host_user_id: int, user_id: int, username: str, message: str, date_str: str, *, meal: str = "lunch") -> tuple[bool, str | None]:
+    meal = _norm_meal(meal)
+    message = (message or "").strip()
+    if not message:
+        return False, "메시지를 입력해주세요."
+
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        # Membership check and insert in one statement: nothing is written for non-members.
+        c.execute(
+            """
+            INSERT INTO group_chat(date, meal, host_user_id, user_id, username, message, timestamp)
+            SELECT ?, ?, ?, ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM group_members WHERE date=? AND meal=? AND host_user_id=? AND user_id=?)
+            """,
+            (date_str, meal, host_user_id, user_id, username, message, kst_now_str(), date_str, meal, host_user_id, user_id),
+        )
+        if c.rowcount == 0:
+            return False, "그룹 멤버만 채팅을 사용할 수 있어요."
+        conn.commit()
+        return True, None
     finally:
         conn.close()
 
@@ -1683,104 +2581,577 @@ def list_my_group_dates(user_id: int, *, meal: str = "lunch", limit: int = 30):
     return rows
 
 
+# --- App state (key/value) ---
+
+
+def get_app_state(key: str, default: str | None = None) -> str | None:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT value FROM app_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+    finally:
+        conn.close()
+
+
+def set_app_state(key: str, value: str | None):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO app_state(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        (key, value),
+    )
+    conn.commit()
+    conn.close()
+
+
+def acquire_lease(name: str, owner: str, ttl_seconds: float) -> bool:
+    """Take or renew a named lease for owner; False while another owner's lease is live.
+
+    Used so exactly one process runs a singleton job (e.g. the Telegram update poller).
+    """
+    key = f"lease:{name}"
+    now = time.time()
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute("SELECT value FROM app_state WHERE key=?", (key,))
+        row = c.fetchone()
+        if row and row[0]:
+            holder, _sep, expires = row[0].rpartition("|")
+            try:
+                live = float(expires) > now
+            except ValueError:
+                live = False
+            if live and holder != owner:
+                return False
+        c.execute(
+            "INSERT INTO app_state(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, f"{owner}|{now + ttl_seconds}"),
+        )
+        return True
+
+
+# --- Notification outbox ---
+# Writers queue Telegram messages with _enqueue_notification inside their own
+# transaction, so a message exists iff the change it announces committed. A worker
+# (lunch_bot.NotificationWorker) claims due rows, sends them and records the outcome.
+# 'sending' rows carry a lease in next_attempt_at; a worker that dies mid-send leaves
+# them to be claimed again once the lease runs out (at-least-once delivery).
+
+NOTIFICATION_LEASE_SECONDS = 60
+NOTIFICATION_KEEP_SECONDS = 7 * 24 * 3600
+
+
+def _enqueue_notification(c, user_id: int, text: str) -> int:
+    """Queue text for user_id's linked Telegram chat. Returns 0 when the user has none."""
+    now = time.time()
+    c.execute(
+        """
+        INSERT INTO notification_outbox(user_id, chat_id, text, next_attempt_at, created_at)
+        SELECT user_id, telegram_chat_id, ?, ?, ? FROM users
+        WHERE user_id=? AND COALESCE(telegram_chat_id, '') != ''
+        """,
+        (text, now, now, user_id),
+    )
+    return c.rowcount
+
+
+def enqueue_notification(user_id: int, text: str) -> bool:
+    with transaction() as conn:
+        return _enqueue_notification(conn.cursor(), int(user_id), text) > 0
+
+
+def claim_notifications(limit: int = 20) -> list[tuple]:
+    """Lease up to `limit` due messages. Returns [(id, chat_id, text, attempts_so_far)]."""
+    now = time.time()
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT id, chat_id, text, attempts FROM notification_outbox
+            WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+            ORDER BY next_attempt_at, id
+            LIMIT ?
+            """,
+            (now, int(limit)),
+        )
+        rows = c.fetchall()
+        c.executemany(
+            "UPDATE notification_outbox SET status='sending', next_attempt_at=? WHERE id=?",
+            [(now + NOTIFICATION_LEASE_SECONDS, r[0]) for r in rows],
+        )
+    return rows
+
+
+def mark_notification_sent(notification_id: int):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE notification_outbox SET status='sent', attempts=attempts+1, sent_at=?, last_error=NULL WHERE id=?",
+        (time.time(), notification_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def reschedule_notification(notification_id: int, delay_seconds: float, error: str | None = None, *, attempted: bool = True):
+    """Put a claimed message back in the queue, due after delay_seconds.
+
+    attempted=False returns a message that was never sent (e.g. rate limit pause)
+    without counting an attempt.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE notification_outbox SET status='pending', attempts=attempts+?, next_attempt_at=?, last_error=COALESCE(?, last_error) WHERE id=?",
+        (1 if attempted else 0, time.time() + max(0.0, delay_seconds), error, notification_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def mark_notification_failed(notification_id: int, error: str | None = None):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE notification_outbox SET status='failed', attempts=attempts+1, last_error=? WHERE id=?",
+        (error, notification_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def purge_notifications(*, older_than_seconds: float = NOTIFICATION_KEEP_SECONDS) -> int:
+    """Delete sent/failed messages older than the retention window."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "DELETE FROM notification_outbox WHERE status IN ('sent', 'failed') AND created_at < ?",
+        (time.time() - older_than_seconds,),
+    )
+    n = c.rowcount
+    conn.commit()
+    conn.close()
+    return n
+
+
+def get_notification_counts() -> dict[str, int]:
+    conn = get_connection()
+    try:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM notification_outbox GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+
+# --- Auth sessions ---
+# Only sha256(token) is stored. Lookups are served from an in-process LRU cache; an
+# entry is reused for SESSION_CACHE_TTL_SECONDS and dropped earlier by a local
+# delete_auth_session or a 'users' version change, so a session revoked by another
+# process stays usable here for at most that long. Expiry slides forward on use, with
+# the write throttled to once per SESSION_TOUCH_INTERVAL_SECONDS.
+
+
+class _CachedSession:
+    __slots__ = ("row", "users_version", "expires_at", "cached_at", "seen_at")
+
+    def __init__(self, row, users_version: int, expires_at: float, seen_at: float):
+        self.row = row
+        self.users_version = users_version
+        self.expires_at = expires_at
+        self.cached_at = time.monotonic()
+        self.seen_at = seen_at
+
+
+_session_cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+_session_cache_lock = threading.Lock()
+_sessions_cleaned_at = 0.0
+
+
+def _hash_session_token(token: str) -> str:
+    return _sha256_hex(f"session:{token}".encode("utf-8"))
+
+
+def _clear_session_cache():
+    with _session_cache_lock:
+        _session_cache.clear()
+
+
+def cleanup_expired_sessions(*, batch_size: int = SESSION_CLEANUP_BATCH) -> int:
+    """Delete expired sessions in small batches (short write locks). Returns rows deleted."""
+    global _sessions_cleaned_at
+    _sessions_cleaned_at = time.monotonic()
+    now = int(time.time())
+    deleted = 0
+    while True:
+        with transaction(immediate=True) as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                DELETE FROM auth_sessions WHERE token_hash IN (
+                    SELECT token_hash FROM auth_sessions WHERE expires_at <= ? LIMIT ?
+                )
+                """,
+                (now, batch_size),
+            )
+            n = c.rowcount
+        deleted += n
+        if n < batch_size:
+            return deleted
+
+
+def _maybe_cleanup_sessions():
+    if time.monotonic() - _sessions_cleaned_at >= SESSION_CLEANUP_INTERVAL_SECONDS:
+        try:
+            cleanup_expired_sessions()
+        except sqlite3.OperationalError:
+            pass
+
+
 def create_auth_session(user_id: int) -> str:
+    _maybe_cleanup_sessions()
     token = secrets.token_hex(24)
+    now = int(time.time())
     conn = get_connection()
     c = conn.cursor()
-    c.execute("INSERT INTO auth_sessions (token, user_id) VALUES (?, ?)", (token, user_id))
+    c.execute(
+        "INSERT INTO auth_sessions (token_hash, user_id, created_at, last_seen_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+        (_hash_session_token(token), user_id, now, now, now + SESSION_TTL_SECONDS),
+    )
     conn.commit()
     conn.close()
     return token
 
 
+def _touch_auth_session(token_hash: str, now: int):
+    conn = get_connection()
+    try:
+        conn.execute(
+            "UPDATE auth_sessions SET last_seen_at=?, expires_at=? WHERE token_hash=? AND expires_at > ?",
+            (now, now + SESSION_TTL_SECONDS, token_hash, now),
+        )
+        conn.commit()
+    except sqlite3.OperationalError:
+        # Best-effort: a busy database only delays the sliding expiry.
+        pass
+    finally:
+        conn.close()
+
+
 def get_user_by_session_token(token: str):
+    if not token:
+        return None
+    key = _hash_session_token(token)
+    now = time.time()
+    users_version = _user_directory().version
+
+    with _session_cache_lock:
+        hit = _session_cache.get(key)
+        if (
+            hit is not None
+            and hit.users_version == users_version
+            and now < hit.expires_at
+            and time.monotonic() - hit.cached_at < SESSION_CACHE_TTL_SECONDS
+        ):
+            _session_cache.move_to_end(key)
+            if now - hit.seen_at < SESSION_TOUCH_INTERVAL_SECONDS:
+                return hit.row
+            hit.seen_at = now
+            hit.expires_at = now + SESSION_TTL_SECONDS
+            touch = True
+        else:
+            _session_cache.pop(key, None)
+            touch = False
+    if touch:
+        _touch_auth_session(key, int(now))
+        return hit.row
+
+    _maybe_cleanup_sessions()
     conn = get_connection()
     c = conn.cursor()
     c.execute(
         """
-        SELECT u.user_id, u.username, u.telegram_chat_id, u.team, u.mbti, u.age, u.years, u.employee_id
+        SELECT u.user_id, u.username, u.telegram_chat_id, u.team, u.mbti, u.age, u.years, u.employee_id,
+               s.last_seen_at, s.expires_at
         FROM auth_sessions s
         JOIN users u ON u.user_id = s.user_id
-        WHERE s.token=?
+        WHERE s.token_hash=? AND s.expires_at > ?
         """,
-        (token,),
+        (key, int(now)),
     )
-    row = c.fetchone()
+    found = c.fetchone()
     conn.close()
+    if not found:
+        return None
+
+    row, (seen_at, expires_at) = found[:8], found[8:]
+    if now - seen_at >= SESSION_TOUCH_INTERVAL_SECONDS:
+        _touch_auth_session(key, int(now))
+        seen_at, expires_at = now, now + SESSION_TTL_SECONDS
+    with _session_cache_lock:
+        _session_cache[key] = _CachedSession(row, users_version, expires_at, seen_at)
+        _session_cache.move_to_end(key)
+        while len(_session_cache) > SESSION_CACHE_MAX_ENTRIES:
+            _session_cache.popitem(last=False)
     return row
 
 
 def delete_auth_session(token: str):
+    key = _hash_session_token(token or "")
+    with _session_cache_lock:
+        _session_cache.pop(key, None)
     conn = get_connection()
     c = conn.cursor()
-    c.execute("DELETE FROM auth_sessions WHERE token=?", (token,))
+    c.execute("DELETE FROM auth_sessions WHERE token_hash=?", (key,))
     conn.commit()
     conn.close()
 
-def _has_host_group_today(user_id: int, *, meal: str = "lunch") -> bool:
-    today = kst_today_iso()
-    meal = _norm_meal(meal)
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        "SELECT 1 FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=? LIMIT 1",
-        (today, meal, user_id),
-    )
-    row = c.fetchone()
-    conn.close()
-    return bool(row)
 
+# Booked without an accepted invite, or Hosting without a group row, shows as 'Not Set'.
+# Two EXISTS probes (from/to) so each side can use its own requests index.
+_BOARD_STATUS_SQL = """
+    SELECT u.user_id, u.username,
+           CASE
+             WHEN ds.status='Booked'
+                  AND NOT EXISTS (SELECT 1 FROM requests r
+                                  WHERE r.date=ds.date AND r.meal=ds.meal AND r.from_user_id=ds.user_id AND r.status='accepted')
+                  AND NOT EXISTS (SELECT 1 FROM requests r
+                                  WHERE r.date=ds.date AND r.meal=ds.meal AND r.to_user_id=ds.user_id AND r.status='accepted')
+               THEN 'Not Set'
+             WHEN ds.status='Hosting'
+                  AND NOT EXISTS (SELECT 1 FROM lunch_groups g
+                                  WHERE g.date=ds.date AND g.meal=ds.meal AND g.host_user_id=ds.user_id)
+               THEN 'Not Set'
+             ELSE ds.status
+           END AS status,
+           u.telegram_chat_id, ds.kind
+    FROM daily_status ds
+    JOIN users u ON u.user_id = ds.user_id
+    WHERE ds.date=? AND ds.meal=? AND ds.status IS NOT NULL AND ds.status != 'Not Set'
+"""
+
+
+def _private_filter_sql(column: str, viewer_friends_ids: list[int] | None, private_viewer_id: int | None):
+    """SQL condition restricting column to the private-mode audience, or None for no filter.
+
+    private_viewer_id: the viewer plus their accepted friends, resolved in SQL via friend_edges.
+    viewer_friends_ids: an explicit id list, passed as one JSON parameter (no IN (?,?,...)).
+    """
+    if private_viewer_id is not None:
+        # Probe friend_edges per board row (today's rows are bounded by active users,
+        # friend lists are not), so cost does not grow with the viewer's friend count.
+        return (
+            f""" AND ({column}=? OR EXISTS (
+                SELECT 1 FROM friend_edges fe
+                WHERE fe.user_id=? AND fe.friend_id={column} AND fe.status='accepted'
+            ))""",
+            [private_viewer_id, private_viewer_id],
+        )
+    if viewer_friends_ids is not None:
+        return f" AND {column} IN (SELECT value FROM json_each(?))", [json.dumps([int(x) for x in viewer_friends_ids])]
+    return None
+
+
+def _query_statuses(c, today: str, meal: str, viewer_friends_ids: list[int] | None, private_viewer_id: int | None = None):
+    query = _BOARD_STATUS_SQL
+    params = [today, meal]
+
+    visible = _private_filter_sql("u.user_id", viewer_friends_ids, private_viewer_id)
+    if visible is not None:
+        sql, extra = visible
+        query += sql
+        params.extend(extra)
 
-def get_all_statuses(*, meal: str = "lunch", viewer_friends_ids: list[int] | None = None):
+    c.execute(query, params)
+    return c.fetchall()
+
+
+def get_all_statuses(*, meal: str = "lunch", viewer_friends_ids: list[int] | None = None, private_viewer_id: int | None = None):
     """Return all users + computed-safe status for today (per meal).
     If viewer_friends_ids is provided (private mode), filter the user list.
+    If private_viewer_id is provided, show only that viewer and their friends.
     """
     today = kst_today_iso()
     meal = _norm_meal(meal)
     conn = get_connection()
-    c = conn.cursor()
+    try:
+        return _query_statuses(conn.cursor(), today, meal, viewer_friends_ids, private_viewer_id)
+    finally:
+        conn.close()
 
-    query = """
-        SELECT u.user_id, u.username, COALESCE(ds.status, 'Not Set') as status, u.telegram_chat_id, ds.kind
-        FROM users u
-        LEFT JOIN daily_status ds ON u.user_id = ds.user_id AND ds.date = ? AND ds.meal = ?
-        WHERE (ds.status IS NOT NULL AND ds.status != 'Not Set')
+
+def get_board_snapshot(
+    viewer_user_id: int,
+    *,
+    meal: str = "lunch",
+    viewer_friends_ids: list[int] | None = None,
+    private: bool = False,
+) -> dict:
+    """Everything the board tab renders, read in one transaction (consistent snapshot).
+
+    private=True limits statuses/groups to the viewer and their friends (filtered in SQL).
+
+    Keys:
+    - statuses: rows as get_all_statuses()
+    - groups: rows as get_groups_today()
+    - my_status / my_kind: viewer's own row as get_status_row_today()
+    - host_group: viewer's hosting group as get_group_by_host_today() (or None)
     """
-    params = [today, meal]
+    today = kst_today_iso()
+    meal = _norm_meal(meal)
+    with transaction() as conn:
+        c = conn.cursor()
+        private_viewer_id = viewer_user_id if private else None
+        statuses = _query_statuses(c, today, meal, viewer_friends_ids, private_viewer_id)
+        groups = _query_groups_today(c, today, meal, viewer_friends_ids, private_viewer_id)
+        # The viewer's own status and hosting group in one row (both sides optional).
+        c.execute(
+            """
+            SELECT COALESCE(ds.status,'Not Set'), ds.kind,
+                   g.id, g.date, g.host_user_id, u.username, g.member_names, g.seats_left, g.menu, g.payer_name, g.kind
+            FROM (SELECT 1)
+            LEFT JOIN daily_status ds ON ds.date=:today AND ds.meal=:meal AND ds.user_id=:viewer
+            LEFT JOIN lunch_groups g ON g.date=:today AND g.meal=:meal AND g.host_user_id=:viewer
+            LEFT JOIN users u ON u.user_id = g.host_user_id
+            """,
+            {"today": today, "meal": meal, "viewer": viewer_user_id},
+        )
+        mine = c.fetchone()
+
+    return {
+        "statuses": statuses,
+        "groups": groups,
+        "my_status": mine[0],
+        "my_kind": mine[1],
+        "host_group": mine[2:] if mine[2] is not None and mine[5] is not None else None,
+    }
 
-    if viewer_friends_ids is not None:
-        if not viewer_friends_ids:
-            conn.close()
-            return []
-        placeholders = ",".join(["?"] * len(viewer_friends_ids))
-        query += f" AND u.user_id IN ({placeholders})"
-        params.extend(viewer_friends_ids)
 
-    c.execute(query, params)
-    results = c.fetchall()
-    conn.close()
+# --- People search (FTS5) ---
+# users_search holds every 1- and 2-character gram of each word (Korean names are
+# mostly 2-3 syllables, so any substring query maps to exact tokens), for username,
+# English name, team and the initial consonants (초성) of username/team. Rows are rewritten by register_user and
+# update_user_profile; rowid = user_id.
+
+_CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_SEARCH_WORD_SPLIT_RE = re.compile(r"[\W_]+")
+_CHOSUNG_QUERY_RE = re.compile(r"[ㄱ-ㅎ]+")
+SEARCH_RESULT_LIMIT = 20
+
+
+def _chosung(text: str | None) -> str:
+    """'김희준 개발팀' -> 'ㄱㅎㅈ ㄱㅂㅌ' (only Hangul syllables are kept)."""
+    words = []
+    for word in (text or "").split():
+        initials = "".join(
+            _CHOSUNG[(ord(ch) - 0xAC00) // 588] for ch in word if 0xAC00 <= ord(ch) <= 0xD7A3
+        )
+        if initials:
+            words.append(initials)
+    return " ".join(words)
 
-    fixed = []
-    for user_id, username, status, chat_id, kind in results:
-        if status == "Booked" and not has_accepted_today(int(user_id), meal=meal):
-            status = "Not Set"
-        if status == "Hosting" and not _has_host_group_today(int(user_id), meal=meal):
-            status = "Not Set"
-        fixed.append((user_id, username, status, chat_id, kind))
-    return fixed
+
+def _search_words(text: str | None) -> list[str]:
+    return [w for w in _SEARCH_WORD_SPLIT_RE.split((text or "").lower()) if w]
+
+
+def _search_grams(text: str | None) -> str:
+    grams: dict[str, None] = {}
+    for word in _search_words(text):
+        for i in range(len(word)):
+            grams[word[i]] = None
+            if i + 1 < len(word):
+                grams[word[i:i + 2]] = None
+    return " ".join(grams)
+
+
+def _user_search_row(user_id, username, english_name, team) -> tuple:
+    chosung = " ".join(p for p in (_chosung(username), _chosung(team)) if p)
+    return (user_id, _search_grams(username), _search_grams(english_name), _search_grams(team), _search_grams(chosung))
+
+
+def _sync_user_search(c, user_id: int):
+    c.execute("SELECT user_id, username, english_name, team FROM users WHERE user_id=?", (user_id,))
+    row = c.fetchone()
+    c.execute("DELETE FROM users_search WHERE rowid=?", (user_id,))
+    if row:
+        c.execute(
+            "INSERT INTO users_search(rowid, name, english, team, chosung) VALUES (?,?,?,?,?)",
+            _user_search_row(*row),
+        )
+
+
+def _search_term_expr(term: str, column: str, *, prefix: bool = False) -> str:
+    grams = [term] if len(term) == 1 else [term[i:i + 2] for i in range(len(term) - 1)]
+    parts = ['"' + g.replace('"', '""') + '"' for g in dict.fromkeys(grams)]
+    if prefix:
+        # The first token of a column is the first character of its first word.
+        parts.insert(0, '^"' + term[0].replace('"', '""') + '"')
+    return f"{column} : ({' AND '.join(parts)})"
+
+
+def _search_tiers(terms: list[str], column_chars: dict[str, frozenset[str]] | None = None) -> list[tuple[str, int]]:
+    """MATCH expressions from most to least relevant, each with the field it ranks on.
+
+    Tiers replace bm25 ordering: scoring every match of a common syllable costs ~10ms
+    at 50k users, while a tier query stops after LIMIT rows. With column_chars, tiers
+    whose column can't contain the first term are dropped (an English name is never
+    looked up in the Hangul name column).
+    """
+    first, rest = terms[0], terms[1:]
+    if _CHOSUNG_QUERY_RE.fullmatch(first):
+        tiers = [("chosung", True, 3), ("chosung", False, 3)]
+    else:
+        tiers = [("name", True, 0), ("name", False, 0), ("english", True, 1), ("english", False, 1), ("team", False, 2)]
+    if column_chars is not None:
+        tiers = [t for t in tiers if t[0] not in column_chars or set(first) <= column_chars[t[0]]]
+    tail = [
+        _search_term_expr(t, "chosung" if _CHOSUNG_QUERY_RE.fullmatch(t) else "{name english team}")
+        for t in rest
+    ]
+    return [
+        (" AND ".join([_search_term_expr(first, column, prefix=prefix)] + tail), field)
+        for column, prefix, field in tiers
+    ]
 
 
 def search_users(query: str, exclude_id: int):
+    """Ranked people search by name / English name / team, or by 초성 ('ㄱㅎㅈ').
+
+    Returns up to 20 (user_id, username, english_name, team) rows, best first:
+    name prefix, name, English name prefix, English name, team; shorter values first
+    within a tier.
+    """
+    terms = _search_words(query)
+    if not terms:
+        return []
+
+    directory = _user_directory()
+    users = directory.by_id
+    by_chosung = any(_CHOSUNG_QUERY_RE.fullmatch(t) for t in terms)
+    seen = {exclude_id}
+    hits = []
     conn = get_connection()
-    c = conn.cursor()
-    q = f"%{query}%"
-    c.execute(
-        "SELECT user_id, username, english_name, team FROM users WHERE (username LIKE ? OR english_name LIKE ? OR team LIKE ?) AND user_id != ? LIMIT 20",
-        (q, q, q, exclude_id),
-    )
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    try:
+        c = conn.cursor()
+        for expr, field in _search_tiers(terms, directory.search_chars()):
+            c.execute("SELECT rowid FROM users_search WHERE users_search MATCH ? LIMIT ?", (expr, SEARCH_RESULT_LIMIT * 5))
+            tier = []
+            for (uid,) in c.fetchall():
+                rec = users.get(uid)
+                if rec is None or uid in seen:
+                    continue
+                fields = [(rec.username or "").lower(), (rec.english_name or "").lower(), (rec.team or "").lower()]
+                if by_chosung:
+                    fields.append(_chosung(rec.username) + " " + _chosung(rec.team))
+                # 2-gram AND matching can over-match longer terms; keep true substrings only.
+                if all(any(t in f for f in fields) for t in terms):
+                    seen.add(uid)
+                    tier.append((len(fields[field]), fields[field], rec))
+            hits.extend(rec for _n, _f, rec in sorted(tier, key=lambda x: x[:2]))
+            if len(hits) >= SEARCH_RESULT_LIMIT:
+                break
+    finally:
+        conn.close()
+    return [(r.user_id, r.username, r.english_name, r.team) for r in hits[:SEARCH_RESULT_LIMIT]]
 
 
 def _norm_meal(meal: str | None) -> str:
@@ -1790,48 +3161,53 @@ def _norm_meal(meal: str | None) -> str:
     return m if m in valid else ("dinner" if "dinner" in m else "lunch")
 
 
-def refresh_match_events_today():
-    """Rebuild today's match_events snapshot from current groups + members.
+# Set-based repair for match_events. Normal writes keep the table current through the
+# migration-6 triggers; this only fixes drift. One variant per shape, so the per-date
+# repair searches group_members/lunch_groups by date instead of planning for
+# ":date IS NULL OR date = :date".
+def _rebuild_match_events_sql(*, per_date: bool) -> str:
+    members_where = "WHERE date = :date" if per_date else ""
+    groups_where = "g.date = :date AND" if per_date else ""
+    return f"""
+INSERT INTO match_events(date, meal, host_user_id, member_user_ids, member_count, kind, updated_at)
+SELECT g.date, g.meal, g.host_user_id, m.ids, m.n, g.kind, CURRENT_TIMESTAMP
+FROM lunch_groups g
+JOIN (
+    SELECT date, meal, host_user_id, group_concat(user_id, ',') AS ids, COUNT(*) AS n
+    FROM (
+        SELECT date, meal, host_user_id, user_id FROM group_members
+        {members_where}
+        ORDER BY date, meal, host_user_id, user_id
+    )
+    GROUP BY date, meal, host_user_id
+) m ON m.date = g.date AND m.meal = g.meal AND m.host_user_id = g.host_user_id
+WHERE {groups_where} m.n >= 2
+{_MATCH_EVENT_CONFLICT_SQL}
+"""
 
-    Rule: a 'match' is a group with >=2 members (including host).
-    Includes private meals (lunch_p/dinner_p).
-    """
-    today = kst_today_iso()
-    conn = get_connection()
-    c = conn.cursor()
 
-    meals = ["lunch", "dinner", "lunch_p", "dinner_p"]
-    for meal in meals:
-        # Find hosts that have a group today for this meal
-        c.execute(
-            "SELECT host_user_id, kind FROM lunch_groups WHERE date=? AND meal=?",
-            (today, meal),
-        )
-        hosts = c.fetchall()  # (host_user_id, kind)
+_REBUILD_MATCH_EVENTS_SQL = _rebuild_match_events_sql(per_date=False)
+_REBUILD_MATCH_EVENTS_FOR_DATE_SQL = _rebuild_match_events_sql(per_date=True)
 
-        for host_user_id, kind in hosts:
-            # Get normalized member ids
-            c.execute(
-                "SELECT user_id FROM group_members WHERE date=? AND meal=? AND host_user_id=? ORDER BY user_id",
-                (today, meal, int(host_user_id)),
-            )
-            member_ids = [int(r[0]) for r in c.fetchall()]
-            if len(member_ids) < 2:
-                continue
 
-            member_user_ids = ",".join(map(str, member_ids))
-            member_count = len(member_ids)
+def rebuild_match_events(date_str: str | None = None) -> int:
+    """Repair match_events from current groups + members in one statement.
 
-            c.execute(
-                """
-                INSERT OR REPLACE INTO match_events (id, date, meal, host_user_id, member_user_ids, member_count, kind, updated_at)
-                VALUES ((SELECT id FROM match_events WHERE date=? AND meal=? AND host_user_id=?), ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """,
-                (today, meal, int(host_user_id), today, meal, int(host_user_id), member_user_ids, int(member_count), kind),
-            )
+    Rule: a 'match' is a group with >=2 members (including host), private meals included.
+    date_str=None rebuilds every day. Returns the number of rows inserted or changed.
+    """
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        if date_str is None:
+            c.execute(_REBUILD_MATCH_EVENTS_SQL)
+        else:
+            c.execute(_REBUILD_MATCH_EVENTS_FOR_DATE_SQL, {"date": date_str})
+        return c.rowcount
 
-    conn.commit()
-    conn.close()
+
+def refresh_match_events_today():
+    """Repair today's match_events snapshot (see rebuild_match_events)."""
+    return rebuild_match_events(kst_today_iso())
 
 
 def list_match_events(date_str: str | None = None, *, meal: str | None = None, limit: int = 200):
@@ -1853,6 +3229,174 @@ def list_match_events(date_str: str | None = None, *, meal: str | None = None, l
     return rows
 
 
+# --- Match analytics rollups ---
+
+MATCH_STATS_GRANULARITIES = ("day", "week", "month", "quarter")
+
+# Bucket label per granularity; weeks start on Monday and are labelled by that Monday.
+_PERIOD_SQL = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+    "month": "substr(date, 1, 7)",
+    "quarter": "substr(date, 1, 4) || '-Q' || ((CAST(substr(date, 6, 2) AS INTEGER) + 2) / 3)",
+}
+
+
+def _day_match_rollup(c, date_str: str) -> dict[tuple[str, str], list[int]]:
+    """(meal, kind) -> [groups, participants, cross_team_pairs] for one day's match_events."""
+    users = _user_directory().by_id
+    out: dict[tuple[str, str], list[int]] = {}
+    c.execute("SELECT meal, kind, member_user_ids, member_count FROM match_events WHERE date=?", (date_str,))
+    for meal, kind, member_ids, member_count in c.fetchall():
+        teams = []
+        for x in (member_ids or "").split(","):
+            rec = users.get(int(x)) if x.strip().isdigit() else None
+            teams.append(_strip_leading_number(rec.team) if rec else "")
+        cross = sum(
+            1
+            for i in range(len(teams))
+            for j in range(i + 1, len(teams))
+            if teams[i] and teams[j] and teams[i] != teams[j]
+        )
+        acc = out.setdefault((meal or "lunch", kind or ""), [0, 0, 0])
+        acc[0] += 1
+        acc[1] += int(member_count or 0)
+        acc[2] += cross
+    return out
+
+
+def close_match_days(today: str | None = None) -> int:
+    """Roll up every queued day before today into match_daily_stats. Returns days closed."""
+    today = today or kst_today_iso()
+    conn = get_connection()
+    try:
+        pending = conn.execute("SELECT 1 FROM match_rollup_pending WHERE date < ? LIMIT 1", (today,)).fetchone()
+    finally:
+        conn.close()
+    if not pending:
+        return 0
+
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute("SELECT date FROM match_rollup_pending WHERE date < ? ORDER BY date", (today,))
+        days = [r[0] for r in c.fetchall()]
+        for day in days:
+            c.execute("DELETE FROM match_daily_stats WHERE date=?", (day,))
+            c.executemany(
+                "INSERT INTO match_daily_stats(date, meal, kind, groups, participants, cross_team_pairs) VALUES (?,?,?,?,?,?)",
+                [(day, meal, kind, *acc) for (meal, kind), acc in _day_match_rollup(c, day).items()],
+            )
+        for month in sorted({day[:7] for day in days}):
+            c.execute("DELETE FROM match_monthly_stats WHERE month=?", (month,))
+            c.execute(
+                """
+                INSERT INTO match_monthly_stats(month, meal, kind, groups, participants, cross_team_pairs)
+                SELECT ?, meal, kind, SUM(groups), SUM(participants), SUM(cross_team_pairs)
+                FROM match_daily_stats WHERE date BETWEEN ? AND ?
+                GROUP BY meal, kind
+                """,
+                (month, f"{month}-01", f"{month}-31"),
+            )
+        c.execute("DELETE FROM match_rollup_pending WHERE date < ?", (today,))
+    return len(days)
+
+
+def _next_month_start(month: str) -> str:
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+
+def _whole_months(start: str, end: str) -> tuple[str, str] | None:
+    """First and last 'YYYY-MM' fully inside [start, end], or None."""
+    first = start[:7] if start.endswith("-01") else _next_month_start(start[:7])[:7]
+    last = end[:7]
+    if _next_month_start(last) != (datetime.date.fromisoformat(end) + datetime.timedelta(days=1)).isoformat():
+        y, m = int(last[:4]), int(last[5:7])
+        last = f"{y - (m == 1):04d}-{(m - 2) % 12 + 1:02d}"
+    return (first, last) if first <= last else None
+
+
+def get_match_stats(start, end, granularity: str = "day") -> list[dict]:
+    """Match totals per period between start and end (inclusive ISO dates).
+
+    granularity: 'day' | 'week' | 'month' | 'quarter'. Closed days come from
+    match_daily_stats; today (still open) is summed live from match_events.
+    Each item: period, groups, participants, cross_team_pairs, public_groups,
+    private_groups, by_meal {meal: groups}, by_kind {'meal'|'drink'|'': groups}.
+    """
+    if granularity not in _PERIOD_SQL:
+        raise ValueError(f"granularity must be one of {MATCH_STATS_GRANULARITIES}")
+    start, end = str(start), str(end)
+    today = kst_today_iso()
+    close_match_days(today)
+
+    # Whole closed months inside the range are read from match_monthly_stats (week
+    # buckets cross months, so weeks and days stay on the daily table).
+    closed_end = min(end, (datetime.date.fromisoformat(today) - datetime.timedelta(days=1)).isoformat())
+    months = _whole_months(start, closed_end) if granularity in ("month", "quarter") else None
+    if months:
+        first_month, last_month = months
+        head_end = (datetime.date.fromisoformat(f"{first_month}-01") - datetime.timedelta(days=1)).isoformat()
+        tail_start = _next_month_start(last_month)
+    else:
+        first_month, last_month = "9999-99", "0000-00"
+        head_end, tail_start = closed_end, "9999-99-99"
+
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            f"""
+            SELECT {_PERIOD_SQL[granularity]} AS period, meal, kind,
+                   SUM(groups), SUM(participants), SUM(cross_team_pairs)
+            FROM (
+                SELECT date, meal, kind, groups, participants, cross_team_pairs
+                FROM match_daily_stats WHERE date BETWEEN ? AND ?
+                UNION ALL
+                SELECT date, meal, kind, groups, participants, cross_team_pairs
+                FROM match_daily_stats WHERE date BETWEEN ? AND ?
+                UNION ALL
+                SELECT month || '-01', meal, kind, groups, participants, cross_team_pairs
+                FROM match_monthly_stats WHERE month BETWEEN ? AND ?
+            )
+            GROUP BY period, meal, kind
+            """,
+            (start, head_end, tail_start, closed_end, first_month, last_month),
+        )
+        rows = c.fetchall()
+        if start <= today <= end:
+            c.execute(f"SELECT {_PERIOD_SQL[granularity]} FROM (SELECT ? AS date)", (today,))
+            today_period = c.fetchone()[0]
+            rows += [
+                (today_period, meal, kind, *acc) for (meal, kind), acc in _day_match_rollup(c, today).items()
+            ]
+    finally:
+        conn.close()
+
+    buckets: dict[str, dict] = {}
+    for period, meal, kind, groups, participants, cross in rows:
+        b = buckets.setdefault(
+            period,
+            {
+                "period": period,
+                "groups": 0,
+                "participants": 0,
+                "cross_team_pairs": 0,
+                "public_groups": 0,
+                "private_groups": 0,
+                "by_meal": {},
+                "by_kind": {},
+            },
+        )
+        b["groups"] += groups
+        b["participants"] += participants
+        b["cross_team_pairs"] += cross
+        b["private_groups" if meal.endswith("_p") else "public_groups"] += groups
+        b["by_meal"][meal] = b["by_meal"].get(meal, 0) + groups
+        b["by_kind"][kind] = b["by_kind"].get(kind, 0) + groups
+    return [buckets[p] for p in sorted(buckets)]
+
+
 def _norm_kind(kind: str | None) -> str | None:
     k = (kind or "").strip().lower()
     if not k:
@@ -1896,6 +3440,9 @@ def create_request(
 
     kind: (dinner only) 'meal' | 'drink'
 
+    Validation, dedupe, insert and the sender's move to Planning happen in one
+    BEGIN IMMEDIATE transaction, so concurrent invites cannot both pass the checks.
+
     Returns: (request_id, error_message)
     """
     meal = _norm_meal(meal)
@@ -1906,41 +3453,31 @@ def create_request(
         label = "점심" if meal == "lunch" else "저녁"
         return None, f"{label} 타임아웃(마감) 이후에는 새 초대를 보낼 수 없어요."
 
-    # one-meal rule
-    # If I'm inviting someone into my own hosting group (group_host_user_id == from_user_id),
-    # allow even if I'm already Booked/Planning.
-    if get_status_today(from_user_id, meal=meal) in ("Booked", "Planning"):
-        if not (group_host_user_id and int(group_host_user_id) == int(from_user_id)):
-            return None, "이미 점심약속이 있는것 같아요!"
+    from_user_id = int(from_user_id)
+    to_user_id = int(to_user_id)
+    # Host inviting someone into their own group / join request to the receiver's group
+    into_own_group = bool(group_host_user_id) and int(group_host_user_id) == from_user_id
+    into_their_group = bool(group_host_user_id) and int(group_host_user_id) == to_user_id
 
-    # Allow inviting a Booked user in two cases:
-    # - join request to that booked host's group (group_host_user_id == to_user_id)
-    # - host inviting someone into their own group while booked (group_host_user_id == from_user_id)
-    if get_status_today(to_user_id, meal=meal) == "Booked":
-        ok = False
-        if group_host_user_id and int(group_host_user_id) == int(to_user_id):
-            ok = True
-        if group_host_user_id and int(group_host_user_id) == int(from_user_id):
-            ok = True
-        if not ok:
+    today = kst_today_iso()
+    with transaction(immediate=True) as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT user_id, COALESCE(status,'Not Set') FROM daily_status WHERE date=? AND meal=? AND user_id IN (?, ?)",
+            (today, meal, from_user_id, to_user_id),
+        )
+        statuses = dict(c.fetchall())
+        from_status = statuses.get(from_user_id, "Not Set")
+        to_status = statuses.get(to_user_id, "Not Set")
+
+        # one-meal rule
+        # If I'm inviting someone into my own hosting group, allow even if I'm already Booked/Planning.
+        if from_status in ("Booked", "Planning") and not into_own_group:
             return None, "이미 점심약속이 있는것 같아요!"
 
-    today = kst_today_iso()
-    conn = get_connection()
-    c = conn.cursor()
-    try:
-        # Double-check latest status right before insert (reduce race issues)
-        if get_status_today(from_user_id, meal=meal) in ("Booked",):
-            return None, "이미 약속이 있는것 같아요!"
-        if get_status_today(to_user_id, meal=meal) in ("Booked",):
-            # allow only join-to-group exceptions (same logic as above)
-            ok = False
-            if group_host_user_id and int(group_host_user_id) == int(to_user_id):
-                ok = True
-            if group_host_user_id and int(group_host_user_id) == int(from_user_id):
-                ok = True
-            if not ok:
-                return None, "이미 약속이 있는것 같아요!"
+        # Allow inviting a Booked user only for join-to-group exceptions.
+        if to_status == "Booked" and not (into_their_group or into_own_group):
+            return None, "이미 점심약속이 있는것 같아요!"
 
         # If there is already a pending invite from->to today, don't spam.
         c.execute(
@@ -1959,24 +3496,33 @@ def create_request(
             "INSERT INTO requests (from_user_id, to_user_id, group_host_user_id, date, meal, status, kind) VALUES (?, ?, ?, ?, ?, 'pending', ?)",
             (from_user_id, to_user_id, group_host_user_id, today, meal, kind),
         )
-        conn.commit()
         req_id = c.lastrowid
-    finally:
-        conn.close()
 
-    # Pending request behavior:
-    # - Sender becomes Planning (prevent spamming/duplicate actions)
-    # - Receiver stays as-is (so they remain Free/Not Set until they accept)
-    set_planning(from_user_id, meal=meal)
+        # Pending request behavior:
+        # - Sender becomes Planning (prevent spamming/duplicate actions) and drops any
+        #   hosting listing, as update_status(..., "Planning") does.
+        # - A host inviting into their own group keeps hosting; Booked stays Booked.
+        # - Receiver stays as-is (so they remain Free/Not Set until they accept)
+        if not into_own_group and from_status != "Booked":
+            c.execute(
+                """
+                INSERT OR REPLACE INTO daily_status (id, date, meal, user_id, status, kind)
+                VALUES ((SELECT id FROM daily_status WHERE date=? AND meal=? AND user_id=?), ?, ?, ?, 'Planning', NULL)
+                """,
+                (today, meal, from_user_id, today, meal, from_user_id),
+            )
+            c.execute("DELETE FROM lunch_groups WHERE date=? AND meal=? AND host_user_id=?", (today, meal, from_user_id))
+
     return req_id, None
 
 
-def update_request_status(request_id, status):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE requests SET status=? WHERE id=?", (status, request_id))
-    conn.commit()
-    conn.close()
+def update_request_status(request_id, status, *, notify_user_id: int | None = None, notify_text: str | None = None):
+    """Set a request's status; optionally queue a Telegram message in the same transaction."""
+    with transaction() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE requests SET status=? WHERE id=?", (status, request_id))
+        if c.rowcount and notify_user_id is not None and notify_text:
+            _enqueue_notification(c, int(notify_user_id), notify_text)
 
 
 def cancel_pending_requests_for_user(user_id: int, *, meal: str = "lunch"):
@@ -2078,32 +3624,80 @@ def list_outgoing_requests(user_id, *, meal: str = "lunch"):
     return rows
 
 # --- Friend Management Logic ---
+# Reads go through friend_edges (see _migration_8_friend_edges). Accepted-friend sets
+# are cached per process and dropped when the 'friends' data version moves.
+
+
+class _FriendCache:
+    __slots__ = ("path", "version", "checked_at", "sets")
+
+    def __init__(self, path: str, version: int):
+        self.path = path
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.sets: dict[int, frozenset[int]] = {}
+
+
+_friend_cache: _FriendCache | None = None
+_friend_cache_lock = threading.Lock()
+
+
+def _invalidate_friend_cache():
+    global _friend_cache
+    _friend_cache = None
+
+
+def _current_friend_cache(c) -> _FriendCache:
+    global _friend_cache
+    fc = _friend_cache
+    if fc is not None and fc.path == DB_NAME and time.monotonic() - fc.checked_at < VERSION_RECHECK_SECONDS:
+        return fc
+    with _friend_cache_lock:
+        fc = _friend_cache
+        version = _read_data_version(c, "friends")
+        if fc is not None and fc.path == DB_NAME and fc.version == version:
+            fc.checked_at = time.monotonic()
+            return fc
+        fc = _FriendCache(DB_NAME, version)
+        _friend_cache = fc
+        return fc
+
+
+def get_friend_set(user_id: int) -> frozenset[int]:
+    """user_ids who are 'accepted' friends of user_id (cached per process)."""
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        fc = _current_friend_cache(c)
+        friends = fc.sets.get(user_id)
+        if friends is None:
+            c.execute("SELECT friend_id FROM friend_edges WHERE user_id=? AND status='accepted'", (user_id,))
+            friends = frozenset(r[0] for r in c.fetchall())
+            fc.sets[user_id] = friends
+        return friends
+    finally:
+        conn.close()
+
 
 def send_friend_request(from_uid: int, to_uid: int) -> tuple[bool, str | None]:
     if from_uid == to_uid:
         return False, "나 자신에게는 신청할 수 없어요."
-    conn = get_connection()
-    c = conn.cursor()
     try:
-        # Check existing (either direction)
-        c.execute(
-            "SELECT status FROM friends WHERE (requester_id=? AND target_id=?) OR (requester_id=? AND target_id=?)",
-            (from_uid, to_uid, to_uid, from_uid),
-        )
-        row = c.fetchone()
-        if row:
-            return False, f"이미 신청 중이거나 친구 상태입니다. (상태: {row[0]})"
+        with transaction(immediate=True) as conn:
+            c = conn.cursor()
+            # Existing relation in either direction: one lookup on the symmetric edge
+            c.execute("SELECT status FROM friend_edges WHERE user_id=? AND friend_id=?", (from_uid, to_uid))
+            row = c.fetchone()
+            if row:
+                return False, f"이미 신청 중이거나 친구 상태입니다. (상태: {row[0]})"
 
-        c.execute(
-            "INSERT INTO friends (requester_id, target_id, status) VALUES (?, ?, 'pending')",
-            (from_uid, to_uid),
-        )
-        conn.commit()
+            c.execute(
+                "INSERT INTO friends (requester_id, target_id, status) VALUES (?, ?, 'pending')",
+                (from_uid, to_uid),
+            )
         return True, None
     except Exception as e:
         return False, str(e)
-    finally:
-        conn.close()
 
 
 def accept_friend_request(target_uid: int, requester_uid: int) -> bool:
@@ -2116,39 +3710,26 @@ def accept_friend_request(target_uid: int, requester_uid: int) -> bool:
     ok = c.rowcount > 0
     conn.commit()
     conn.close()
+    _invalidate_friend_cache()
     return ok
 
 
 def remove_friend(uid1: int, uid2: int):
     conn = get_connection()
     c = conn.cursor()
-    c.execute(
-        "DELETE FROM friends WHERE (requester_id=? AND target_id=?) OR (requester_id=? AND target_id=?)",
-        (uid1, uid2, uid2, uid1),
-    )
+    c.execute("DELETE FROM friends WHERE requester_id=? AND target_id=?", (uid1, uid2))
+    c.execute("DELETE FROM friends WHERE requester_id=? AND target_id=?", (uid2, uid1))
     conn.commit()
     conn.close()
+    _invalidate_friend_cache()
 
 
 def list_friends(user_id: int) -> list[int]:
     """Return list of user_ids who are 'accepted' friends."""
-    conn = get_connection()
-    c = conn.cursor()
     try:
-        c.execute(
-            """
-            SELECT requester_id FROM friends WHERE target_id=? AND status='accepted'
-            UNION
-            SELECT target_id FROM friends WHERE requester_id=? AND status='accepted'
-            """,
-            (user_id, user_id),
-        )
-        ids = [r[0] for r in c.fetchall()]
-        return ids
+        return list(get_friend_set(user_id))
     except Exception:
         return []
-    finally:
-        conn.close()
 
 
 def list_pending_requests(user_id: int) -> list[dict]:
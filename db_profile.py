@@ -0,0 +1,221 @@
+"""Opt-in per-rerun profiling of db calls (LUNCH_DB_PROFILE=1).
+
+enable() replaces every public function in the db module with a timing wrapper and
+routes each pooled connection's execute()/cursor() through a counting cursor, so calls
+made between start_rerun() and finish_rerun() on the same thread are counted: calls,
+time, SQL statements (including ones issued by nested db calls) and rows returned.
+Statements are counted where they are issued - one per execute(), one per
+executemany() - so N identical reads count N times and trigger bodies don't count. Each
+finished rerun is kept in a small process-wide ring (for the admin panel) and printed
+as one JSON log line.
+
+Nothing is patched until enable() runs, so a disabled app pays nothing. Once enabled,
+db calls outside a profiled rerun (background workers) cost one thread-local lookup.
+"""
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+
+import db
+
+RECENT_RERUNS = 200
+# Connection plumbing: counted as statements/connections, not as calls.
+_SKIP = {"get_connection", "connection", "transaction", "release_connection", "close_all_connections"}
+
+_enable_lock = threading.Lock()
+_originals: dict[str, object] = {}
+_counted: weakref.WeakSet = weakref.WeakSet()  # pooled connections handing out counting cursors
+_tls = threading.local()
+_recent: deque = deque(maxlen=RECENT_RERUNS)
+_recent_lock = threading.Lock()
+
+
+class _Rerun:
+    __slots__ = ("label", "started", "stack", "functions", "calls", "db_s", "statements", "connections")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.stack: list[list] = []  # [name, statements at entry]
+        self.functions: dict[str, list] = {}  # name -> [calls, seconds, statements, rows]
+        self.calls = 0
+        self.db_s = 0.0
+        self.statements = 0
+        self.connections = 0
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def _row_count(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(len(v) for v in result.values() if isinstance(v, list))
+    return 1
+
+
+def _wrap(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        prof = getattr(_tls, "rerun", None)
+        if prof is None:
+            return fn(*args, **kwargs)
+        frame = [name, prof.statements]
+        prof.stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            prof.stack.pop()
+            stats = prof.functions.get(name)
+            if stats is None:
+                stats = prof.functions[name] = [0, 0.0, 0, 0]
+            stats[0] += 1
+            stats[1] += dt
+            stats[2] += prof.statements - frame[1]
+            if not prof.stack:
+                # Top-level call: nested db calls are already inside this time.
+                prof.calls += 1
+                prof.db_s += dt
+        stats[3] += _row_count(result)
+        return result
+
+    wrapper.__db_profile_original__ = fn
+    return wrapper
+
+
+def _count_statement():
+    prof = getattr(_tls, "rerun", None)
+    if prof is not None:
+        prof.statements += 1
+
+
+class _CountingCursor(sqlite3.Cursor):
+    def execute(self, *args, **kwargs):
+        _count_statement()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        _count_statement()
+        return super().executemany(*args, **kwargs)
+
+
+# Connection.execute() & co. don't go through an overridden cursor(), so all four
+# entry points are replaced on the instance (pooled connections are db._Connection,
+# a Python subclass, and take instance attributes).
+_CONNECTION_METHODS = ("cursor", "execute", "executemany", "executescript")
+
+
+def _install_counting_cursor(conn):
+    conn.cursor = functools.partial(sqlite3.Connection.cursor, conn, _CountingCursor)
+    conn.execute = lambda *args: conn.cursor().execute(*args)
+    conn.executemany = lambda *args: conn.cursor().executemany(*args)
+    conn.executescript = lambda script: conn.cursor().executescript(script)
+
+
+def _counted_lease():
+    lease = _originals["_lease"]()
+    conn = lease.conn
+    if conn not in _counted:
+        _install_counting_cursor(conn)
+        _counted.add(conn)
+    return lease
+
+
+def _counted_open_connection(path: str):
+    prof = getattr(_tls, "rerun", None)
+    if prof is not None:
+        prof.connections += 1
+    return _originals["_open_connection"](path)
+
+
+def enable():
+    """Patch the db module (idempotent)."""
+    with _enable_lock:
+        if _originals:
+            return
+        for name, obj in list(vars(db).items()):
+            if name.startswith("_") or name in _SKIP or not inspect.isfunction(obj) or obj.__module__ != db.__name__:
+                continue
+            _originals[name] = obj
+            setattr(db, name, _wrap(name, obj))
+        for name, replacement in (("_lease", _counted_lease), ("_open_connection", _counted_open_connection)):
+            _originals[name] = getattr(db, name)
+            setattr(db, name, replacement)
+
+
+def disable():
+    """Restore the db module and plain cursors on pooled connections."""
+    with _enable_lock:
+        for name, fn in _originals.items():
+            setattr(db, name, fn)
+        _originals.clear()
+        for conn in list(_counted):
+            for name in _CONNECTION_METHODS:
+                conn.__dict__.pop(name, None)
+        _counted.clear()
+
+
+def start_rerun(label: str = "rerun"):
+    """Begin collecting for this thread (drops an unfinished earlier rerun)."""
+    if _originals:
+        _tls.rerun = _Rerun(label)
+
+
+def finish_rerun(*, log: bool = True) -> dict | None:
+    """Stop collecting for this thread; record and (by default) log the summary."""
+    prof = getattr(_tls, "rerun", None)
+    _tls.rerun = None
+    if prof is None:
+        return None
+    functions = {
+        name: {"calls": c, "ms": round(s * 1000, 3), "statements": n, "rows": r}
+        for name, (c, s, n, r) in sorted(prof.functions.items(), key=lambda kv: -kv[1][1])
+    }
+    record = {
+        "event": "db_rerun",
+        "label": prof.label,
+        "ts": round(time.time(), 3),
+        "wall_ms": round((time.perf_counter() - prof.started) * 1000, 3),
+        "db_ms": round(prof.db_s * 1000, 3),
+        "calls": prof.calls,
+        "statements": prof.statements,
+        "connections_opened": prof.connections,
+        "functions": functions,
+    }
+    with _recent_lock:
+        _recent.append(record)
+    if log:
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    return record
+
+
+def recent_reruns(limit: int | None = None) -> list[dict]:
+    """Finished reruns in this process, newest first."""
+    with _recent_lock:
+        records = list(_recent)
+    records.reverse()
+    return records[:limit] if limit else records
+
+
+def summarize_functions(records: list[dict]) -> list[dict]:
+    """Per-function totals over several reruns, most expensive first."""
+    totals: dict[str, dict] = {}
+    for rec in records:
+        for name, f in rec["functions"].items():
+            t = totals.setdefault(name, {"function": name, "calls": 0, "ms": 0.0, "statements": 0, "rows": 0})
+            t["calls"] += f["calls"]
+            t["ms"] += f["ms"]
+            t["statements"] += f["statements"]
+            t["rows"] += f["rows"]
+    return sorted(totals.values(), key=lambda t: -t["ms"])
@@ -1,58 +1,138 @@
 import os
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 
+import db
 
-def _get_bot_token() -> str | None:
+# Default Bot API endpoint; override with the TELEGRAM_API_BASE setting (e.g. a local
+# Bot API server, or bench/fake_telegram.py for load tests).
+TELEGRAM_API_BASE = "https://api.telegram.org"
+
+# (connect, read) timeouts in seconds. Connect fails fast; read allows for a slow API.
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+# Keep-alive connections held open to the Bot API host
+HTTP_POOL_MAXSIZE = 8
+# How long token/username lookups (Streamlit secrets, env, getMe) are reused
+CONFIG_TTL_SECONDS = 300
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+_config_cache: dict[str, tuple[float, str | None]] = {}
+_config_lock = threading.Lock()
+
+
+def _http() -> requests.Session:
+    """Module-wide Session so consecutive calls reuse one TCP+TLS connection."""
+    global _session
+    s = _session
+    if s is None:
+        with _session_lock:
+            s = _session
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return s
+
+
+def _memoized(key: str, loader, *, cache_none: bool = True) -> str | None:
+    now = time.monotonic()
+    hit = _config_cache.get(key)
+    if hit is not None and now < hit[0]:
+        return hit[1]
+    value = loader()
+    if value is not None or cache_none:
+        with _config_lock:
+            _config_cache[key] = (now + CONFIG_TTL_SECONDS, value)
+    return value
+
+
+def clear_config_cache():
+    """Forget memoized token/username/API base (e.g. after rotating secrets)."""
+    with _config_lock:
+        _config_cache.clear()
+
+
+def _read_setting(name: str) -> str | None:
     # Prefer Streamlit secrets, then environment variable.
     try:
         import streamlit as st  # optional
 
-        token = st.secrets.get("TELEGRAM_BOT_TOKEN")
-        if token:
-            return str(token)
+        value = st.secrets.get(name)
+        if value:
+            return str(value)
     except Exception:
         pass
 
-    return os.environ.get("TELEGRAM_BOT_TOKEN")
+    return os.environ.get(name)
 
 
-def send_telegram_msg(chat_id: str | None, text: str) -> bool:
-    token = _get_bot_token()
-    if not token or not chat_id:
-        print("Telegram bot not configured or chat_id missing.")
-        return False
+def _get_bot_token() -> str | None:
+    return _memoized("token", lambda: _read_setting("TELEGRAM_BOT_TOKEN"))
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
 
-    try:
-        r = requests.post(url, json=payload, timeout=15)
-        return r.status_code == 200
-    except Exception as e:
-        print(f"Error sending telegram: {e}")
-        return False
+def _api_base() -> str:
+    return _memoized("api_base", lambda: (_read_setting("TELEGRAM_API_BASE") or TELEGRAM_API_BASE).rstrip("/"))
 
 
-def get_bot_username() -> str | None:
-    """Return bot username.
+def _api_url(token: str, method: str) -> str:
+    return f"{_api_base()}/bot{token}/{method}"
 
-    Priority:
-    1) Streamlit secrets/env TELEGRAM_BOT_USERNAME
-    2) Telegram getMe API using TELEGRAM_BOT_TOKEN (auto-detect)
 
-    This reduces ops burden: you can deploy with only TELEGRAM_BOT_TOKEN.
+def _send_message(chat_id: str, text: str) -> tuple[str, float | None, str | None]:
+    """POST sendMessage and classify the outcome.
+
+    Returns (outcome, retry_after, error) where outcome is 'sent', 'retry' (network,
+    5xx, 429, bad token) or 'fatal' (the message itself can never be delivered, e.g.
+    chat not found / bot blocked).
     """
-    # 1) explicit config
+    token = _get_bot_token()
+    if not token:
+        return "retry", None, "bot token not configured"
+    payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
     try:
-        import streamlit as st
-        u = st.secrets.get("TELEGRAM_BOT_USERNAME")
-        if u:
-            return str(u).lstrip("@").strip()
-    except Exception:
-        pass
+        r = _http().post(_api_url(token, "sendMessage"), json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except requests.RequestException as e:
+        return "retry", None, f"{type(e).__name__}: {e}"
+
+    if r.status_code == 200:
+        return "sent", None, None
+    try:
+        data = r.json()
+    except ValueError:
+        data = {}
+    error = f"{r.status_code} {data.get('description') or ''}".strip()
+    if r.status_code == 429:
+        retry_after = (data.get("parameters") or {}).get("retry_after")
+        return "retry", float(retry_after) if retry_after is not None else None, error
+    if r.status_code >= 500 or r.status_code == 401:
+        return "retry", None, error
+    return "fatal", None, error
+
 
-    u = os.environ.get("TELEGRAM_BOT_USERNAME")
-    u = (u or "").lstrip("@").strip()
+def send_telegram_msg(chat_id: str | None, text: str) -> bool:
+    token = _get_bot_token()
+    if not token or not chat_id:
+        print("Telegram bot not configured or chat_id missing.")
+        return False
+
+    outcome, _retry_after, error = _send_message(str(chat_id), text)
+    if error and outcome != "sent":
+        print(f"Error sending telegram: {error}")
+    return outcome == "sent"
+
+
+def _load_bot_username() -> str | None:
+    # 1) explicit config
+    u = (_read_setting("TELEGRAM_BOT_USERNAME") or "").lstrip("@").strip()
     if u:
         return u
 
@@ -61,7 +141,7 @@ def get_bot_username() -> str | None:
     if not token:
         return None
     try:
-        r = requests.get(f"https://api.telegram.org/bot{token}/getMe", timeout=10)
+        r = _http().get(_api_url(token, "getMe"), timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
         if r.status_code != 200:
             return None
         data = r.json()
@@ -73,16 +153,31 @@ def get_bot_username() -> str | None:
         return None
 
 
+def get_bot_username() -> str | None:
+    """Return bot username.
+
+    Priority:
+    1) Streamlit secrets/env TELEGRAM_BOT_USERNAME
+    2) Telegram getMe API using TELEGRAM_BOT_TOKEN (auto-detect)
+
+    This reduces ops burden: you can deploy with only TELEGRAM_BOT_TOKEN.
+    A found username is reused for CONFIG_TTL_SECONDS; failures are retried next call.
+    """
+    return _memoized("username", _load_bot_username, cache_none=False)
+
+
 def get_updates(offset: int | None = None, timeout: int = 0):
     token = _get_bot_token()
     if not token:
         return None
-    url = f"https://api.telegram.org/bot{token}/getUpdates"
     params = {"timeout": int(timeout)}
     if offset is not None:
         params["offset"] = int(offset)
     try:
-        r = requests.get(url, params=params, timeout=15)
+        # Long polls hold the request open for `timeout` seconds before answering.
+        r = _http().get(
+            _api_url(token, "getUpdates"), params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT + int(timeout))
+        )
         if r.status_code != 200:
             return None
         return r.json()
@@ -101,37 +196,261 @@ def _extract_start_payload(text: str) -> str | None:
     return None
 
 
-def try_register_chat_id_for_employee(employee_id: str, *, max_scan: int = 200) -> tuple[bool, str | None, str | None]:
-    """Scan recent getUpdates and find /start <employee_id>.
+def _start_registration(update: dict) -> tuple[str, str] | None:
+    """(link code, chat_id) from a '/start <code>' update, else None.
+
+    The code comes from db.create_telegram_link_code in the logged-in app, so the
+    chat can only be linked to the account that asked for it.
+    """
+    msg = update.get("message") or update.get("edited_message")
+    if not msg:
+        return None
+    payload = _extract_start_payload(msg.get("text") or "")
+    if not payload:
+        return None
+    chat_id = (msg.get("chat") or {}).get("id")
+    if chat_id is None:
+        return None
+    return payload.strip(), str(chat_id)
+
+
+def try_register_chat_id_for_employee(employee_id: str) -> tuple[bool, str | None, str | None]:
+    """Check whether this employee's /start <code> has been linked yet.
 
+    UpdateConsumer writes chat IDs as updates arrive, so this is a local DB read.
     Returns: (ok, err, chat_id)
     """
     employee_id = (employee_id or "").strip().lower()
     if not employee_id:
         return False, "사번이 비어있습니다.", None
 
-    data = get_updates()
-    if not data or not data.get("ok"):
-        return False, "봇 업데이트를 불러오지 못했어요(토큰/권한 확인 필요).", None
-
-    updates = data.get("result") or []
-    updates = updates[-max_scan:]
-
-    # Search from newest
-    for u in reversed(updates):
-        msg = u.get("message") or u.get("edited_message")
-        if not msg:
-            continue
-        text = msg.get("text") or ""
-        payload = _extract_start_payload(text)
-        if not payload:
-            continue
-        if payload.strip().lower() != employee_id:
-            continue
-        chat = msg.get("chat") or {}
-        chat_id = chat.get("id")
-        if chat_id is None:
-            continue
+    row = db.get_user_by_employee_id(employee_id)
+    chat_id = row[3] if row else None
+    if chat_id:
         return True, None, str(chat_id)
-
     return False, "텔레그램에서 봇을 열고 '시작(Start)'을 눌러주세요. (연동 확인이 아직 안 됐어요)", None
+
+
+# --- Notification outbox worker ---
+# Drains db.notification_outbox in the background so UI actions never wait on the
+# Bot API. One worker per process is enough; several processes may run one each
+# (claims are leased in the DB).
+
+SEND_RATE_PER_SECOND = 25          # Telegram allows ~30 msg/s per bot
+PER_CHAT_INTERVAL_SECONDS = 1.0    # and ~1 msg/s per chat
+POLL_INTERVAL_SECONDS = 0.5
+CLAIM_BATCH = 20
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+PURGE_INTERVAL_SECONDS = 3600.0
+
+
+class NotificationWorker(threading.Thread):
+    """Send queued notifications with rate limiting, retry/backoff and a circuit breaker.
+
+    - 429 honours retry_after and pauses all sending for that long.
+    - Transient failures (network, 5xx) back off exponentially with jitter, up to
+      MAX_ATTEMPTS; undeliverable messages (400/403) are marked failed at once.
+    - BREAKER_FAILURE_THRESHOLD consecutive transient failures open the breaker:
+      nothing is sent for BREAKER_COOLDOWN_SECONDS, then a single probe decides
+      whether to close it again.
+    """
+
+    def __init__(self, *, send=None, rate_per_second: float = SEND_RATE_PER_SECOND, poll_interval: float = POLL_INTERVAL_SECONDS):
+        super().__init__(name="lunch-bot-notifications", daemon=True)
+        self._send = send or _send_message
+        self._min_gap = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._last_send_at = 0.0
+        self._last_chat_send: dict[str, float] = {}
+        self._paused_until = 0.0
+        self._consecutive_failures = 0
+        self._breaker_open_until = 0.0
+        self._purged_at = 0.0
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "rate_limited": 0, "breaker_opened": 0}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:  # keep the worker alive across DB hiccups
+                print(f"Notification worker error: {e}")
+                handled = 0
+            if not handled:
+                self._stop_event.wait(self._poll_interval)
+        db.release_connection()
+
+    def _wait(self, until: float):
+        delay = until - time.monotonic()
+        if delay > 0:
+            self._stop_event.wait(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        base = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, attempt - 1)))
+        return base * (0.5 + random.random())
+
+    def run_once(self) -> int:
+        """Claim and process one batch. Returns the number of messages handled."""
+        now = time.monotonic()
+        if now < self._paused_until or now < self._breaker_open_until:
+            return 0
+        if self._send is _send_message and not _get_bot_token():
+            # Bot not configured: leave the queue alone instead of burning attempts.
+            return 0
+        if now - self._purged_at >= PURGE_INTERVAL_SECONDS:
+            self._purged_at = now
+            db.purge_notifications()
+
+        half_open = self._breaker_open_until > 0
+        batch = db.claim_notifications(1 if half_open else CLAIM_BATCH)
+        for i, (nid, chat_id, text, attempts) in enumerate(batch):
+            if self._stop_event.is_set() or time.monotonic() < self._paused_until or time.monotonic() < self._breaker_open_until:
+                # Paused mid-batch: hand the rest back untouched.
+                for rest_id, *_ in batch[i:]:
+                    db.reschedule_notification(rest_id, max(0.0, self._paused_until - time.monotonic()), attempted=False)
+                break
+
+            chat_wait = self._last_chat_send.get(chat_id, 0.0) + PER_CHAT_INTERVAL_SECONDS - time.monotonic()
+            if chat_wait > 0:
+                db.reschedule_notification(nid, chat_wait, attempted=False)
+                continue
+            self._wait(self._last_send_at + self._min_gap)
+
+            self._last_send_at = time.monotonic()
+            self._last_chat_send[chat_id] = self._last_send_at
+            outcome, retry_after, error = self._send(chat_id, text)
+            attempt = attempts + 1
+
+            if outcome == "sent":
+                db.mark_notification_sent(nid)
+                self.stats["sent"] += 1
+                self._consecutive_failures = 0
+                self._breaker_open_until = 0.0
+            elif outcome == "fatal" or attempt >= MAX_ATTEMPTS:
+                db.mark_notification_failed(nid, error)
+                self.stats["failed"] += 1
+                if outcome == "fatal":
+                    # The API answered; only this message is bad.
+                    self._consecutive_failures = 0
+                    self._breaker_open_until = 0.0
+            elif retry_after is not None:
+                # Rate limited: not the API failing, so the breaker is left alone.
+                self._paused_until = time.monotonic() + retry_after
+                db.reschedule_notification(nid, retry_after, error)
+                self.stats["rate_limited"] += 1
+            else:
+                db.reschedule_notification(nid, self._backoff(attempt), error)
+                self.stats["retried"] += 1
+                self._consecutive_failures += 1
+                if half_open or self._consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                    self._breaker_open_until = time.monotonic() + BREAKER_COOLDOWN_SECONDS
+                    self.stats["breaker_opened"] += 1
+        if len(self._last_chat_send) > 10_000:
+            cutoff = time.monotonic() - PER_CHAT_INTERVAL_SECONDS
+            self._last_chat_send = {k: v for k, v in self._last_chat_send.items() if v > cutoff}
+        return len(batch)
+
+
+_worker: NotificationWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def start_notification_worker() -> NotificationWorker:
+    """Start this process's background sender once (idempotent)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = NotificationWorker()
+            _worker.start()
+        return _worker
+
+
+# --- Update consumer (chat-ID registration) ---
+# Long-polls getUpdates from the last persisted offset and links chat IDs for
+# '/start <link code>' deep links as they arrive. A DB lease keeps a single poller
+# across processes (Telegram rejects concurrent getUpdates calls).
+
+UPDATE_OFFSET_KEY = "telegram_update_offset"
+UPDATE_LEASE_NAME = "telegram_update_consumer"
+LONG_POLL_SECONDS = 25
+UPDATE_LEASE_SECONDS = LONG_POLL_SECONDS + READ_TIMEOUT + 15
+UPDATE_ERROR_BACKOFF_SECONDS = 5.0
+
+
+class UpdateConsumer(threading.Thread):
+    def __init__(self, *, long_poll_seconds: int = LONG_POLL_SECONDS):
+        super().__init__(name="lunch-bot-updates", daemon=True)
+        self._long_poll = long_poll_seconds
+        self._owner = f"{os.getpid()}:{id(self)}"
+        self._stop_event = threading.Event()
+        self.stats = {"updates": 0, "registered": 0, "errors": 0}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if not _get_bot_token() or not db.acquire_lease(UPDATE_LEASE_NAME, self._owner, UPDATE_LEASE_SECONDS):
+                    # Not configured, or another process is polling: check back later.
+                    self._stop_event.wait(UPDATE_LEASE_SECONDS / 2)
+                    continue
+                if not self.poll_once():
+                    self._stop_event.wait(UPDATE_ERROR_BACKOFF_SECONDS)
+            except Exception as e:
+                print(f"Telegram update consumer error: {e}")
+                self.stats["errors"] += 1
+                self._stop_event.wait(UPDATE_ERROR_BACKOFF_SECONDS)
+        db.release_connection()
+
+    def poll_once(self) -> bool:
+        """One getUpdates long poll from the stored offset. False on API errors."""
+        offset = int(db.get_app_state(UPDATE_OFFSET_KEY) or 0)
+        data = get_updates(offset=offset or None, timeout=self._long_poll)
+        if not data or not data.get("ok"):
+            self.stats["errors"] += 1
+            return False
+
+        updates = data.get("result") or []
+        for update in updates:
+            reg = _start_registration(update)
+            if reg:
+                ok, _err = db.link_telegram_chat(*reg)
+                self.stats["registered"] += int(ok)
+        if updates:
+            # Persist after applying: a crash replays the batch, and a used code links nothing.
+            db.set_app_state(UPDATE_OFFSET_KEY, str(max(int(u.get("update_id", 0)) for u in updates) + 1))
+            self.stats["updates"] += len(updates)
+        return True
+
+
+_consumer: UpdateConsumer | None = None
+
+
+def start_update_consumer() -> UpdateConsumer:
+    """Start this process's update poller once (idempotent; only the lease holder polls)."""
+    global _consumer
+    with _worker_lock:
+        if _consumer is None or not _consumer.is_alive():
+            _consumer = UpdateConsumer()
+            _consumer.start()
+        return _consumer
+
+
+if __name__ == "__main__":
+    # Standalone bot process: `python lunch_bot.py` polls updates in the background
+    # and drains the outbox in the foreground.
+    db.init_db()
+    start_update_consumer()
+    worker = NotificationWorker()
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
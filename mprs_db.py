@@ -118,7 +118,14 @@ def init_db():
     c.execute("CREATE INDEX IF NOT EXISTS idx_action_items_feedback_id ON action_items(feedback_id)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_action_items_author_id ON action_items(author_id)")
     c.execute("CREATE UNIQUE INDEX IF NOT EXISTS uidx_action_items_feedback_author ON action_items(feedback_id, author_id)")
-    
+
+    # Read orders of the polled list views, so they come back without a sort step
+    c.execute("CREATE INDEX IF NOT EXISTS idx_feedback_rank ON feedback(likes DESC, created_at DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_suggestions_rank ON ai_suggestions(votes DESC, created_at DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_todo_items_order ON todo_items(order_index)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_action_items_rank ON action_items(votes DESC, created_at DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_action_items_author_rank ON action_items(author_id, votes DESC, created_at DESC)")
+
     conn.commit()
     conn.close()
 